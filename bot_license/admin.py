@@ -1,12 +1,48 @@
 from django.contrib import admin
-from .models import BotLicense, Product
+from .models import BotLicense, LicenseActivation, Product, ValidationEvent
+from .pagination import ApproximateCountPaginator
+from .search import EXACT, PREFIX, search_licenses
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     list_display = ('name', 'version', 'created_at')
 
+class LicenseActivationInline(admin.TabularInline):
+    # Seats are claimed and released through bot_license.seats, which keeps
+    # BotLicense.seats_used in step; the admin only shows them.
+    model = LicenseActivation
+    fields = readonly_fields = ('account_id', 'activated_at', 'heartbeat_at')
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+
 @admin.register(BotLicense)
 class LicenseAdmin(admin.ModelAdmin):
-    list_display = ('license_key', 'product', 'account_id', 'is_active', 'expires_at')
+    list_display = ('license_key', 'product', 'account_id', 'is_active', 'expires_at', 'max_seats', 'seats_used')
+    readonly_fields = ('seats_used',)
+    inlines = [LicenseActivationInline]
     list_filter = ('is_active', 'product')
+    list_select_related = ('product',)
     search_fields = ('license_key', 'account_id')
+    search_help_text = 'Key or account prefix; start with "=" for an exact match.'
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed exact/prefix lookups instead of the default icontains scan.
+        if not search_term.strip():
+            return queryset, False
+        match = EXACT if search_term.startswith('=') else PREFIX
+        return search_licenses(search_term.lstrip('='), match=match, queryset=queryset), False
+
+
+@admin.register(ValidationEvent)
+class ValidationEventAdmin(admin.ModelAdmin):
+    list_display = ('license_key', 'account_id', 'ip_address', 'endpoint', 'status_code', 'created_at')
+    list_filter = ('endpoint', 'status_code')
+    search_fields = ('=license_key', '=account_id')
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class BotLicenseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bot_license'
+
+    def ready(self):
+        from . import metrics, signals  # noqa: F401
@@ -0,0 +1,198 @@
+"""
+Async versions of the hot read endpoints, served under ASGI.
+
+They answer with the same status codes and JSON bodies as their DRF
+counterparts in ``views.py`` but await the async ORM, so a slow database
+round trip parks a coroutine instead of blocking a worker. ``urls.py``
+routes to them when ``settings.ASYNC_VIEWS`` is on.
+"""
+import io
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.decorators import method_decorator
+from django.utils.http import quote_etag
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import ParseError, Throttled
+from rest_framework.parsers import JSONParser
+
+from .cache import license_cache
+from .changes import last_seq, sse_stream
+from .events import event_buffer, record_validation
+from .keyfilter import key_filter
+from .licensetable import license_table
+from .leases import aissue_lease
+from .metrics import check_database, pool_stats
+from .models import BotLicense
+from .routers import replica_health, use_replicas
+from .projections import LICENSE_FIELDS, license_etag, license_rows, products_version
+from .renderers import FastJSONRenderer
+from .throttling import client_ip, validation_throttle
+from .validation import LICENSE_KEY_REQUIRED, acheck_license
+from .views import change_poll
+
+
+def render(data, code=status.HTTP_200_OK):
+    return HttpResponse(FastJSONRenderer().render(data), status=code, content_type='application/json')
+
+
+def request_data(request):
+    """Mimic DRF's ``request.data`` for JSON and form bodies; raises DRF's ``ParseError`` on bad JSON."""
+    if request.content_type == 'application/json':
+        data = JSONParser().parse(io.BytesIO(request.body)) if request.body else {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+def malformed(exc):
+    """400 response with the same detail DRF gives for ``exc``."""
+    return render({'detail': exc.detail}, exc.status_code)
+
+
+def throttled(request, license_key):
+    """429 response matching DRF's throttling, or ``None`` if the request may proceed."""
+    wait = validation_throttle.check(client_ip(request) or '', license_key)
+    if wait is None:
+        return None
+    exc = Throttled(wait)
+    response = render({'detail': exc.detail}, exc.status_code)
+    response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+@method_decorator(use_replicas, name='post')
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncVerifyLicenseView(View):
+
+    async def post(self, request):
+        try:
+            data = request_data(request)
+        except ParseError as exc:
+            return malformed(exc)
+
+        rejected = throttled(request, data.get('license_key'))
+        if rejected:
+            return rejected
+
+        license = await license_cache.aget(data.get('license_key'))
+        if license is None:
+            response = render({'detail': 'Invalid license key.'}, status.HTTP_404_NOT_FOUND)
+        elif license.expired():
+            response = render({'detail': 'License has expired.'}, status.HTTP_403_FORBIDDEN)
+        else:
+            response = render({'detail': 'License is valid.'})
+
+        record_validation(request, data.get('license_key'), data.get('account_id'), 'license-verify', response.status_code)
+        return response
+
+
+@method_decorator(use_replicas, name='post')
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncEAValidate(View):
+
+    async def post(self, request):
+        try:
+            data = request_data(request)
+        except ParseError as exc:
+            return malformed(exc)
+
+        license_key = data.get('license_key')
+        account = data.get('account_id')
+
+        rejected = throttled(request, license_key)
+        if rejected:
+            return rejected
+
+        if not license_key:
+            return render({'valid': LICENSE_KEY_REQUIRED[0]}, LICENSE_KEY_REQUIRED[1])
+
+        license = await license_cache.aget(license_key)
+        message, code = await acheck_license(license, account)
+        record_validation(request, license_key, account, 'ea-validate', code)
+        body = {'valid': message}
+
+        if code == status.HTTP_200_OK and str(data.get('lease')).lower() in ('1', 'true', 'yes'):
+            lease = await aissue_lease(license, account)
+            body['lease'], body['lease_expires_at'] = lease if lease else (None, None)
+
+        return render(body, code)
+
+
+@method_decorator(use_replicas, name='get')
+class AsyncLicenseDetailsView(View):
+
+    async def get(self, request, license_key):
+        rejected = throttled(request, license_key)
+        if rejected:
+            return rejected
+
+        try:
+            if not await key_filter.amight_exist(license_key):
+                raise BotLicense.DoesNotExist
+            row = await BotLicense.objects.values(*LICENSE_FIELDS).aget(license_key=license_key)
+        except BotLicense.DoesNotExist:
+            return render({'detail': 'Invalid license key.'}, status.HTTP_404_NOT_FOUND)
+
+        # The same per-license ETag as LicenseDetailsView.
+        etag = quote_etag(license_etag(row, await sync_to_async(products_version)(request)))
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = render((await sync_to_async(license_rows)([row], request))[0])
+        response.headers.setdefault('ETag', etag)
+        patch_cache_control(response, no_cache=True)
+        return response
+
+
+class AsyncHealthCheckView(View):
+
+    async def get(self, request):
+        database = await sync_to_async(check_database)()
+        healthy = database['status'] == 'ok'
+        return JsonResponse({
+            'status': 'healthy' if healthy else 'unhealthy',
+            'service': 'TxxCrypt License Manager',
+            'version': '1.0.0',
+            'database': database,
+            'database_pools': await sync_to_async(pool_stats)(),
+            'license_cache': license_cache.stats(),
+            'validation_events': event_buffer.stats(),
+            'key_filter': key_filter.stats(),
+            'license_table': license_table.stats(),
+            'throttled_requests': validation_throttle.throttled,
+            'read_replicas': replica_health.stats(),
+        }, status=200 if healthy else 503)
+
+
+class AsyncChangeFeedView(View):
+    """
+    ``ChangeFeedView`` plus server-sent events.
+
+    With ``Accept: text/event-stream`` the response is a stream that ends
+    after ``CHANGE_LOG['STREAM_DURATION']`` seconds, and ``EventSource``
+    reconnects and resumes by itself. Other requests get the same short poll
+    as under WSGI.
+    """
+
+    async def get(self, request):
+        after = request.GET.get('after') or request.headers.get('Last-Event-ID')
+        if after is not None and not after.isdigit():
+            return JsonResponse({'detail': 'after must be a sequence number.'}, status=400)
+
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            if after is None:
+                after = await sync_to_async(last_seq)()
+            response = StreamingHttpResponse(
+                sse_stream(int(after), settings.CHANGE_LOG['STREAM_DURATION']), content_type='text/event-stream',
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        if after is None:
+            return JsonResponse({'events': [], 'last_seq': await sync_to_async(last_seq)()})
+        return await sync_to_async(change_poll)(int(after))
@@ -0,0 +1,265 @@
+"""
+Load and micro-benchmarks for the licensing endpoints.
+
+``seed`` fills the database with synthetic products and licenses and
+``run_benchmarks`` drives each scenario through the Django test client, first
+serially to count queries and CPU time per request and then from a thread
+pool to measure throughput and latency percentiles.
+``run_serialization_benchmark`` times the serializer layer on its own: rows
+per second through ``LicenseSerializer`` and ``JSONRenderer`` against the
+``values()`` projections and ``FastJSONRenderer``. The ``benchmark``
+management command wraps these around a throwaway test database.
+"""
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection
+from rest_framework.renderers import JSONRenderer
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from .cache import license_cache
+from .keyfilter import key_filter
+from .models import BotLicense, Product
+from .projections import license_rows, license_values, product_table
+from .renderers import FastJSONRenderer
+from .serializers import LicenseSerializer
+from .stats import reconcile_stats
+from .utils import mint_license_keys
+
+
+SEED_BATCH_SIZE = 1000
+
+
+def seed(products=10, licenses=10000, rng=None):
+    """Create synthetic products and licenses; returns ``(product_ids, [(key, account), ...])``."""
+    rng = rng or random.Random(0)
+    now = timezone.now()
+    created = Product.objects.bulk_create([
+        Product(name=f'Bench product {i}', version='1.0', description='benchmark') for i in range(products)
+    ])
+    product_ids = [product.id for product in created]
+
+    pairs = []
+    for start in range(0, licenses, SEED_BATCH_SIZE):
+        keys = mint_license_keys(min(SEED_BATCH_SIZE, licenses - start))
+        batch = []
+        for key in keys:
+            account = str(rng.randrange(10 ** 6, 10 ** 8))
+            roll = rng.random()
+            expires_at = None if roll < 0.5 else now + timedelta(days=rng.randrange(-60, 365))
+            batch.append(BotLicense(
+                license_key=key, product_id=rng.choice(product_ids), account_id=account,
+                is_active=rng.random() > 0.1, expires_at=expires_at,
+            ))
+            pairs.append((key, account))
+        BotLicense.objects.bulk_create(batch)
+
+    reconcile_stats()
+    key_filter.reset()
+    key_filter.refresh()
+    return product_ids, pairs
+
+
+def _scenarios(product_ids, pairs):
+    def pick(rng):
+        return pairs[rng.randrange(len(pairs))]
+
+    def ea_validate(client, rng):
+        key, account = pick(rng)
+        return client.post('/ea/validate/', {'license_key': key, 'account_id': account})
+
+    def ea_validate_full(client, rng):
+        key, account = pick(rng)
+        return client.post('/ea/validate/', {'license_key': key, 'account_id': account})
+
+    # The same request through the full middleware stack and DRF view, to
+    # show what bot_license.fastpath saves per request.
+    ea_validate_full.settings = {'EA_FAST_PATH': False}
+
+    def ea_validate_batch(client, rng):
+        items = [{'license_key': key, 'account_id': account} for key, account in (pick(rng) for _ in range(50))]
+        return client.post('/ea/validate/batch/', {'licenses': items}, content_type='application/json')
+
+    def license_verify(client, rng):
+        key, account = pick(rng)
+        return client.post('/license/verify/', {'license_key': key, 'account_id': account})
+
+    def license_details(client, rng):
+        return client.get(f'/license/{pick(rng)[0]}/')
+
+    def licenses(client, rng):
+        return client.get('/licenses/', {'page_size': 100})
+
+    def dashboard(client, rng):
+        return client.get('/dashboard/')
+
+    def license_create(client, rng):
+        return client.post('/license/create/', {
+            'product_id': rng.choice(product_ids), 'account_id': str(rng.randrange(10 ** 6, 10 ** 8)),
+        })
+
+    return {
+        'ea_validate': ea_validate,
+        'ea_validate_full': ea_validate_full,
+        'ea_validate_batch': ea_validate_batch,
+        'license_verify': license_verify,
+        'license_details': license_details,
+        'licenses': licenses,
+        'dashboard': dashboard,
+        'license_create': license_create,
+    }
+
+
+SCENARIOS = (
+    'ea_validate', 'ea_validate_full', 'ea_validate_batch', 'license_verify', 'license_details',
+    'licenses', 'dashboard', 'license_create',
+)
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[rank]
+
+
+def _worker(scenario, count, seed_value):
+    client = Client(raise_request_exception=False)
+    rng = random.Random(seed_value)
+    latencies = []
+    errors = 0
+    try:
+        for _ in range(count):
+            started = time.perf_counter()
+            response = scenario(client, rng)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 500:
+                errors += 1
+    finally:
+        if seed_value:
+            # Worker threads own their connection; the calling thread keeps its own.
+            connection.close()
+    return latencies, errors
+
+
+def run_scenario(scenario, requests=1000, concurrency=8, query_samples=20, cold_cache=True):
+    """Benchmark one scenario callable and return its metrics as a dict."""
+    if cold_cache:
+        license_cache.clear()
+
+    client = Client()
+    rng = random.Random(1)
+    cpu_started = time.process_time()
+    with CaptureQueriesContext(connection) as captured:
+        for _ in range(query_samples):
+            scenario(client, rng)
+    cpu_seconds = time.process_time() - cpu_started
+    queries_per_request = len(captured) / query_samples if query_samples else 0.0
+    cpu_per_request = cpu_seconds / query_samples if query_samples else 0.0
+
+    if cold_cache:
+        license_cache.clear()
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        latencies, errors = _worker(scenario, requests, 0)
+    else:
+        share, extra = divmod(requests, concurrency)
+        counts = [share + (i < extra) for i in range(concurrency)]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(_worker, [scenario] * concurrency, counts, range(1, concurrency + 1)))
+        latencies = [latency for result in results for latency in result[0]]
+        errors = sum(result[1] for result in results)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'queries_per_request': round(queries_per_request, 2),
+        'cpu_ms_per_request': round(cpu_per_request * 1000, 3),
+    }
+
+
+def run_benchmarks(product_ids, pairs, scenarios=SCENARIOS, requests=1000, concurrency=8, query_samples=20):
+    """Run the named scenarios against seeded data; returns ``{name: metrics}``."""
+    available = _scenarios(product_ids, pairs)
+    results = {}
+    for name in scenarios:
+        scenario = available[name]
+        with override_settings(**getattr(scenario, 'settings', {})):
+            results[name] = run_scenario(
+                scenario, requests=requests, concurrency=concurrency, query_samples=query_samples
+            )
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """
+    Compare ``results`` with a previous run.
+
+    Returns a list of ``(scenario, metric, baseline, current, change_pct)``
+    for every p95 latency or throughput that got worse by more than
+    ``max_regression`` percent.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        for metric, higher_is_worse in (('p95_ms', True), ('throughput_rps', False)):
+            before, after = previous[metric], current[metric]
+            if not before:
+                continue
+            change = (after - before) / before * 100
+            if (change if higher_is_worse else -change) > max_regression:
+                regressions.append((name, metric, before, after, round(change, 1)))
+    return regressions
+
+
+def run_serialization_benchmark(rows=1000, repeat=5):
+    """
+    Rows per second for rendering ``rows`` licenses with and without DRF serializers.
+
+    Each path runs its own query, as the views do, and the best of ``repeat``
+    runs is reported. The fast path reads products from a warm
+    ``product_table``, as it does in a running worker.
+    """
+    queryset = BotLicense.objects.order_by('-id')[:rows]
+
+    def drf():
+        return JSONRenderer().render(LicenseSerializer(queryset.select_related('product'), many=True).data)
+
+    def fast():
+        return FastJSONRenderer().render(license_rows(license_values(queryset)))
+
+    product_table.reset()
+    body = fast()
+    if drf() != body:
+        raise AssertionError('Fast serialization differs from LicenseSerializer output.')
+    count = queryset.count()
+    results = {}
+    for name, render in (('drf', drf), ('fast', fast)):
+        best = float('inf')
+        for _ in range(max(repeat, 1)):
+            started = time.perf_counter()
+            render()
+            best = min(best, time.perf_counter() - started)
+        results[name] = {
+            'rows': count,
+            'bytes': len(body),
+            'ms': round(best * 1000, 3),
+            'rows_per_second': round(count / best, 1) if best else 0.0,
+        }
+    return results
@@ -0,0 +1,214 @@
+"""
+Bulk license operations for reseller workflows.
+
+``run_operations`` takes a list of operations such as::
+
+    {"op": "create", "product_id": 1, "account_id": "1234", "expires_at": "2026-01-01T00:00:00Z"}
+    {"op": "revoke", "license_key": "TXCT-ABCD"}
+    {"op": "activate", "license_key": "TXCT-ABCD"}
+    {"op": "extend", "license_key": "TXCT-ABCD", "days": 30}
+    {"op": "reassign", "license_key": "TXCT-ABCD", "account_id": "5678"}
+
+It applies every valid one in a single transaction and returns one result per
+operation. Licenses are loaded with one locked ``license_key__in`` query per
+chunk. New keys come from ``mint_license_keys``, and writes go through
+``bulk_create`` and ``bulk_update``, so a batch costs a few queries per chunk
+rather than a few per license. Bulk writes do not send model signals.
+``licenses_bulk_changed`` is sent instead, and updates the cache, the key
+filter and the dashboard counters.
+
+``extend`` only moves the expiry. A license the expiry sweep deactivated
+also needs an ``activate``.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import BotLicense, Product
+from .signals import licenses_bulk_changed
+from .stats import license_state
+from .utils import CHECK_CHUNK_SIZE, mint_license_keys
+
+
+OPERATIONS = ('create', 'revoke', 'activate', 'extend', 'reassign')
+ACCOUNT_ID_MAX_LENGTH = BotLicense._meta.get_field('account_id').max_length
+
+
+class OperationError(Exception):
+
+    def __init__(self, detail, status_code=400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+def _expiry(value):
+    if value is None:
+        return None
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise OperationError('expires_at must be an ISO 8601 datetime or null.')
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _account(value):
+    if value is None or isinstance(value, (dict, list, bool)) or not str(value).strip():
+        raise OperationError('account_id is required.')
+    if len(str(value)) > ACCOUNT_ID_MAX_LENGTH:
+        raise OperationError(f'account_id must be at most {ACCOUNT_ID_MAX_LENGTH} characters.')
+    return str(value)
+
+
+def _clean(item):
+    """Validate one operation; returns a normalised dict or raises ``OperationError``."""
+    if not isinstance(item, dict):
+        raise OperationError('Each operation must be an object.')
+    op = item.get('op')
+    if op not in OPERATIONS:
+        raise OperationError(f'op must be one of: {", ".join(OPERATIONS)}.')
+
+    if op == 'create':
+        try:
+            product_id = int(item.get('product_id'))
+        except (TypeError, ValueError):
+            raise OperationError('product_id is required.')
+        return {
+            'op': op, 'product_id': product_id, 'account_id': _account(item.get('account_id')),
+            'expires_at': _expiry(item.get('expires_at')),
+        }
+
+    license_key = item.get('license_key')
+    if not license_key or not isinstance(license_key, str):
+        raise OperationError('license_key is required.')
+    cleaned = {'op': op, 'license_key': license_key}
+    if op == 'reassign':
+        cleaned['account_id'] = _account(item.get('account_id'))
+    elif op == 'extend':
+        if 'days' in item:
+            days = item['days']
+            if not isinstance(days, int) or isinstance(days, bool) or days < 1:
+                raise OperationError('days must be a positive integer.')
+            cleaned['days'] = days
+        elif 'expires_at' in item:
+            cleaned['expires_at'] = _expiry(item['expires_at'])
+        else:
+            raise OperationError('extend needs days or expires_at.')
+    return cleaned
+
+
+def _apply(license, operation, now):
+    """Apply an update operation to ``license``; returns the changed field and a message."""
+    op = operation['op']
+    if op == 'revoke':
+        license.is_active = False
+        return 'is_active', 'License has been revoked.'
+    if op == 'activate':
+        license.is_active = True
+        return 'is_active', 'License has been activated.'
+    if op == 'reassign':
+        license.account_id = operation['account_id']
+        return 'account_id', 'License has been reassigned.'
+    if 'days' in operation:
+        start = max(license.expires_at, now) if license.expires_at else now
+        license.expires_at = start + timedelta(days=operation['days'])
+    else:
+        license.expires_at = operation['expires_at']
+    return 'expires_at', 'License expiry has been updated.'
+
+
+def _result(index, op, status_code, detail, license=None):
+    result = {'index': index, 'op': op, 'status': status_code, 'detail': detail}
+    if license is not None:
+        result.update(
+            license_key=license.license_key, account_id=license.account_id, is_active=license.is_active,
+            expires_at=license.expires_at,
+        )
+    return result
+
+
+def run_operations(items, chunk_size=CHECK_CHUNK_SIZE):
+    """Apply ``items`` in one transaction; returns a result dict per item, in order."""
+    now = timezone.now()
+    results = [None] * len(items)
+    cleaned = []
+    for index, item in enumerate(items):
+        try:
+            cleaned.append((index, _clean(item)))
+        except OperationError as exc:
+            op = item.get('op') if isinstance(item, dict) else None
+            results[index] = _result(index, op, exc.status_code, exc.detail)
+
+    creates = [(index, operation) for index, operation in cleaned if operation['op'] == 'create']
+    updates = [(index, operation) for index, operation in cleaned if operation['op'] != 'create']
+
+    with transaction.atomic():
+        product_ids = {operation['product_id'] for _, operation in creates}
+        known_products = set(Product.objects.filter(id__in=product_ids).values_list('id', flat=True)) if product_ids else set()
+        creates_ok = []
+        for index, operation in creates:
+            if operation['product_id'] in known_products:
+                creates_ok.append((index, operation))
+            else:
+                results[index] = _result(index, 'create', 404, 'Invalid product.')
+
+        # Rows are locked in key order, across and within chunks, so
+        # overlapping batches queue behind each other instead of deadlocking.
+        keys = sorted({operation['license_key'] for _, operation in updates})
+        licenses = {}
+        for start in range(0, len(keys), chunk_size):
+            licenses.update(
+                (license.license_key, license)
+                for license in BotLicense.objects.select_for_update().filter(
+                    license_key__in=keys[start:start + chunk_size]
+                ).order_by('license_key')
+            )
+        before = {
+            key: license_state(license.product_id, license.is_active, license.expires_at, now)
+            for key, license in licenses.items()
+        }
+
+        changed_fields = set()
+        changed = {}
+        for index, operation in updates:
+            license = licenses.get(operation['license_key'])
+            if license is None:
+                results[index] = _result(index, operation['op'], 404, 'Invalid license key.')
+                continue
+            field, detail = _apply(license, operation, now)
+            changed_fields.add(field)
+            changed[license.license_key] = license
+            results[index] = (index, operation['op'], 200, detail, license)
+
+        created = [
+            BotLicense(
+                license_key=license_key, product_id=operation['product_id'],
+                account_id=operation['account_id'], expires_at=operation['expires_at'],
+            )
+            for license_key, (_, operation) in zip(mint_license_keys(len(creates_ok)), creates_ok)
+        ]
+        if created:
+            BotLicense.objects.bulk_create(created)
+        for license, (index, _) in zip(created, creates_ok):
+            results[index] = (index, 'create', 201, 'License has been created.', license)
+        if changed:
+            BotLicense.objects.bulk_update(list(changed.values()), sorted(changed_fields))
+
+        transitions = [
+            (before[key], license_state(license.product_id, license.is_active, license.expires_at, now))
+            for key, license in changed.items()
+        ]
+        transitions.extend(
+            (None, license_state(license.product_id, license.is_active, license.expires_at, now))
+            for license in created
+        )
+        licenses_bulk_changed.send(
+            sender=BotLicense,
+            license_keys=list(changed),
+            created_keys=[license.license_key for license in created],
+            transitions=transitions,
+        )
+
+    # Successful results are built last so they report each license's final state.
+    return [_result(*result) if isinstance(result, tuple) else result for result in results]
@@ -0,0 +1,361 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from datetime import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+
+from .keyfilter import key_filter
+from .licensetable import license_table
+from .models import BotLicense, TableVersion
+from .versions import LICENSES
+
+
+class LicenseSnapshot(NamedTuple):
+    """Compact, immutable view of the license fields the validation path needs."""
+    license_key: str
+    account_id: str
+    is_active: bool
+    expires_at: Optional[datetime]
+    product_id: int
+    max_seats: int = 0
+
+    @property
+    def seat_limited(self):
+        return self.max_seats > 0
+
+    def expired(self):
+        return self.expires_at is not None and self.expires_at < timezone.now()
+
+    def matches_account(self, account_id):
+        return self.account_id == account_id
+
+
+INVALIDATION_SEQ_KEY = 'bot_license:invalidation_seq'
+# A process further behind than this drops all its entries instead of reading the log.
+MAX_LOGGED_INVALIDATIONS = 1000
+
+SNAPSHOT_FIELDS = ('license_key', 'account_id', 'is_active', 'expires_at', 'product_id', 'max_seats')
+
+
+def load_snapshot(license_key):
+    row = BotLicense.objects.filter(license_key=license_key).values_list(*SNAPSHOT_FIELDS).first()
+    return LicenseSnapshot(*row) if row else None
+
+
+async def aload_snapshot(license_key):
+    row = await BotLicense.objects.filter(license_key=license_key).values_list(*SNAPSHOT_FIELDS).afirst()
+    return LicenseSnapshot(*row) if row else None
+
+
+def load_snapshots(license_keys):
+    rows = BotLicense.objects.filter(license_key__in=license_keys).values_list(*SNAPSHOT_FIELDS)
+    return {row[0]: LicenseSnapshot(*row) for row in rows}
+
+
+class LicenseCache:
+    """
+    Read-through LRU cache of license snapshots keyed by license key.
+
+    Entries live for ``ttl`` seconds and are evicted least-recently-used once
+    ``max_entries`` is reached. Keys that ``key_filter`` knows were never
+    issued are answered without a lookup, and keys in the shared
+    ``license_table`` generation are answered from it before the local
+    entries are consulted. When ``cache_alias`` names a Django cache the
+    snapshots are also stored there, so workers can share warm entries.
+    Unknown keys are never cached, so a freshly created license is visible
+    immediately.
+
+    ``invalidate`` only drops this process's entries, so other processes learn
+    about writes from an invalidation sequence, read at most every
+    ``check_interval`` seconds before local entries are trusted. With a shared
+    cache, ``invalidate`` appends the keys to a log there under the next
+    sequence number, and other processes drop exactly those keys, from both
+    their entries and ``license_table``. Without one, the sequence is the
+    ``licenses`` ``TableVersion``, and a process that sees it move drops all
+    its entries. Either way a revoked license stops validating everywhere
+    within about ``check_interval`` seconds rather than ``ttl``.
+    """
+
+    def __init__(self, max_entries=50000, ttl=30.0, cache_alias=None, check_interval=1.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache_alias = cache_alias
+        self.check_interval = check_interval
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._seen_seq = None
+        self._next_check = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.remote_invalidations = 0
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def _shared_key(self, license_key):
+        return f'bot_license:snapshot:{license_key}'
+
+    def _log_key(self, seq):
+        return f'bot_license:invalidated:{seq}'
+
+    def _check_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return False
+            self._next_check = now + self.check_interval
+            return True
+
+    def _catch_up(self, seq, logged=None):
+        """
+        Apply the invalidations between the last sequence seen and ``seq``.
+
+        ``logged`` maps log keys to the license keys invalidated under them.
+        Without it, with an entry missing, or on the first check after
+        ``clear``, every local entry is dropped and the license table is
+        bypassed until it catches up.
+        """
+        with self._lock:
+            seen, self._seen_seq = self._seen_seq, seq
+            if seq == seen:
+                return
+            if seen is None or logged is None or seq < seen or len(logged) < seq - seen:
+                self.remote_invalidations += len(self._entries)
+                self._entries.clear()
+                keys = None
+            else:
+                keys = [key for batch in logged.values() for key in batch]
+                for key in keys:
+                    if self._entries.pop(key, None) is not None:
+                        self.remote_invalidations += 1
+        if keys is None:
+            # Which keys changed is unknown, so any mapped table record may be stale.
+            license_table.mark_all_dirty(seq if logged is None else None)
+            return
+        license_table.mark_dirty(*keys)
+
+    def _pending_seqs(self, seq):
+        seen = self._seen_seq
+        if seen is None or not seen < seq <= seen + MAX_LOGGED_INVALIDATIONS:
+            return []
+        return range(seen + 1, seq + 1)
+
+    def _check_invalidations(self):
+        if not self._check_due():
+            return
+        shared = self.shared
+        if shared is None:
+            seq = TableVersion.objects.using(DEFAULT_DB_ALIAS).filter(name=LICENSES).values_list(
+                'version', flat=True,
+            ).first()
+            self._catch_up(seq or 0)
+            return
+        seq = shared.get(INVALIDATION_SEQ_KEY, 0)
+        seqs = self._pending_seqs(seq)
+        self._catch_up(seq, shared.get_many([self._log_key(n) for n in seqs]) if seqs else {})
+
+    async def _acheck_invalidations(self):
+        if not self._check_due():
+            return
+        shared = self.shared
+        if shared is None:
+            seq = await TableVersion.objects.using(DEFAULT_DB_ALIAS).filter(name=LICENSES).values_list(
+                'version', flat=True,
+            ).afirst()
+            self._catch_up(seq or 0)
+            return
+        seq = await shared.aget(INVALIDATION_SEQ_KEY, 0)
+        seqs = self._pending_seqs(seq)
+        self._catch_up(seq, await shared.aget_many([self._log_key(n) for n in seqs]) if seqs else {})
+
+    def _lookup_local(self, license_key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(license_key)
+            if entry is None:
+                return None
+            snapshot, expires = entry
+            if expires <= now:
+                del self._entries[license_key]
+                self.expirations += 1
+                return None
+            self._entries.move_to_end(license_key)
+            self.hits += 1
+            return snapshot
+
+    def _store_local(self, snapshot):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            self._entries[snapshot.license_key] = (snapshot, expires)
+            self._entries.move_to_end(snapshot.license_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, license_key):
+        """Return the snapshot for ``license_key`` or ``None`` if no such license exists or it is not a string."""
+        if not license_key or not isinstance(license_key, str):
+            return None
+        self._check_invalidations()
+        snapshot = license_table.lookup(license_key) or self._lookup_local(license_key)
+        if snapshot is not None:
+            return snapshot
+        if not key_filter.might_exist(license_key):
+            return None
+
+        with self._lock:
+            self.misses += 1
+
+        shared = self.shared
+        if shared is not None:
+            cached = shared.get(self._shared_key(license_key))
+            if cached is not None:
+                snapshot = LicenseSnapshot(*cached)
+                self._store_local(snapshot)
+                return snapshot
+
+        snapshot = load_snapshot(license_key)
+        if snapshot is not None:
+            self.put(snapshot)
+        return snapshot
+
+    async def aget(self, license_key):
+        """Async counterpart of ``get`` using the async ORM and cache APIs."""
+        if not license_key or not isinstance(license_key, str):
+            return None
+        await self._acheck_invalidations()
+        snapshot = license_table.lookup(license_key) or self._lookup_local(license_key)
+        if snapshot is not None:
+            return snapshot
+        if not await key_filter.amight_exist(license_key):
+            return None
+
+        with self._lock:
+            self.misses += 1
+
+        shared = self.shared
+        if shared is not None:
+            cached = await shared.aget(self._shared_key(license_key))
+            if cached is not None:
+                snapshot = LicenseSnapshot(*cached)
+                self._store_local(snapshot)
+                return snapshot
+
+        snapshot = await aload_snapshot(license_key)
+        if snapshot is not None:
+            self._store_local(snapshot)
+            if shared is not None:
+                await shared.aset(self._shared_key(license_key), tuple(snapshot), self.ttl)
+        return snapshot
+
+    def get_many(self, license_keys, chunk_size=1000):
+        """
+        Return ``{license_key: snapshot}`` for the keys that exist; keys
+        that are not strings are skipped.
+
+        Cache misses are resolved with one ``license_key__in`` query per
+        ``chunk_size`` keys instead of one query per key.
+        """
+        self._check_invalidations()
+        found = {}
+        missing = []
+        for key in dict.fromkeys(key for key in license_keys if isinstance(key, str)):
+            if not key:
+                continue
+            snapshot = license_table.lookup(key) or self._lookup_local(key)
+            if snapshot is not None:
+                found[key] = snapshot
+            elif key_filter.might_exist(key):
+                missing.append(key)
+
+        with self._lock:
+            self.misses += len(missing)
+
+        for start in range(0, len(missing), chunk_size):
+            chunk = missing[start:start + chunk_size]
+            shared = self.shared
+            if shared is not None:
+                cached = shared.get_many([self._shared_key(key) for key in chunk])
+                for value in cached.values():
+                    snapshot = LicenseSnapshot(*value)
+                    self._store_local(snapshot)
+                    found[snapshot.license_key] = snapshot
+                chunk = [key for key in chunk if key not in found]
+            if not chunk:
+                continue
+            for key, snapshot in load_snapshots(chunk).items():
+                self.put(snapshot)
+                found[key] = snapshot
+        return found
+
+    def put(self, snapshot):
+        self._store_local(snapshot)
+        shared = self.shared
+        if shared is not None:
+            shared.set(self._shared_key(snapshot.license_key), tuple(snapshot), self.ttl)
+
+    def invalidate(self, *license_keys):
+        keys = [key for key in license_keys if key]
+        license_table.mark_dirty(*keys)
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+        shared = self.shared
+        if shared is not None and keys:
+            shared.delete_many([self._shared_key(key) for key in keys])
+            shared.add(INVALIDATION_SEQ_KEY, 0, None)
+            seq = shared.incr(INVALIDATION_SEQ_KEY)
+            # Kept for a TTL: entries loaded before an invalidation are gone by then.
+            shared.set(self._log_key(seq), keys, self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            # Nothing cached can be stale yet; the next check sets a baseline.
+            self._seen_seq = None
+            self._next_check = time.monotonic() + self.check_interval
+
+    def reset_stats(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = self.expirations = self.invalidations = 0
+            self.remote_invalidations = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'remote_invalidations': self.remote_invalidations,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+                'shared_backend': self.cache_alias,
+            }
+
+
+def _build_cache():
+    config = getattr(settings, 'LICENSE_CACHE', {})
+    return LicenseCache(
+        max_entries=config.get('MAX_ENTRIES', 50000),
+        ttl=config.get('TTL', 30.0),
+        cache_alias=config.get('DJANGO_CACHE'),
+        check_interval=config.get('INVALIDATION_CHECK_INTERVAL', 1.0),
+    )
+
+
+license_cache = _build_cache()
@@ -0,0 +1,190 @@
+"""
+Change feed of license and product writes.
+
+Each committed create, update or delete of a ``BotLicense`` or ``Product``
+appends a ``ChangeEvent``. Its ``id`` is the sequence number clients resume
+from. The model signals in ``bot_license.signals`` record single-row saves,
+such as the create, revoke, activate and deactivate views. ``licenses_bulk_changed``
+records bulk operations and the expiry sweeper. Events are written in the
+transaction of the write they describe, after it, so a rolled-back write never
+shows up and a committed one always has its event.
+
+Sequence numbers are allocated on insert, just before the writer commits. Two
+writers committing at nearly the same moment may therefore make a higher
+number visible before a lower one. ``events_after`` only returns events older than
+``CHANGE_LOG['SETTLE_SECONDS']``, so a client that has read up to N will not
+later miss an event numbered below N.
+
+``compact`` deletes events older than ``RETENTION_DAYS`` and beyond the newest
+``MAX_EVENTS``, and always keeps the newest event. A client whose position
+is older than the oldest remaining event gets ``ChangeLogGap`` and must reload
+the full lists.
+
+Reads never wait for new events. Under WSGI ``/changes/`` only answers "what
+changed after N" and returns at once, and clients poll it on a timer. The
+server-sent event stream, which stays open for minutes, is served only by the
+async view under ASGI, where it holds a coroutine instead of a worker.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import BotLicense, ChangeEvent
+
+
+LICENSE = 'license'
+PRODUCT = 'product'
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+
+LICENSE_FIELDS = ('id', 'license_key', 'product_id', 'account_id', 'is_active', 'created_at', 'expires_at', 'max_seats')
+PRODUCT_FIELDS = ('id', 'name', 'description', 'version', 'created_at')
+CHUNK_SIZE = 900
+
+
+class ChangeLogGap(Exception):
+    """The requested position has been compacted away."""
+
+    def __init__(self, last_seq):
+        super().__init__(last_seq)
+        self.last_seq = last_seq
+
+
+def _config():
+    return getattr(settings, 'CHANGE_LOG', {})
+
+
+def license_data(instance):
+    return {field: getattr(instance, field) for field in LICENSE_FIELDS}
+
+
+def product_data(instance):
+    return {field: getattr(instance, field) for field in PRODUCT_FIELDS}
+
+
+def record(kind, action, rows):
+    """Append one event per ``(object_id, data)`` in ``rows`` in the current transaction."""
+    rows = list(rows)
+    if not rows:
+        return
+    ChangeEvent.objects.bulk_create(
+        [ChangeEvent(kind=kind, action=action, object_id=object_id, data=data) for object_id, data in rows],
+        batch_size=CHUNK_SIZE,
+    )
+
+
+def record_licenses(created_keys, updated_keys):
+    """Append events for licenses written with ``bulk_create``/``update``, read back in the same transaction."""
+    created_keys, updated_keys = set(created_keys), set(updated_keys) - set(created_keys)
+    if not created_keys and not updated_keys:
+        return
+    keys = list(created_keys | updated_keys)
+    events = []
+    for start in range(0, len(keys), CHUNK_SIZE):
+        for row in BotLicense.objects.filter(license_key__in=keys[start:start + CHUNK_SIZE]).values(*LICENSE_FIELDS):
+            action = CREATED if row['license_key'] in created_keys else UPDATED
+            events.append(ChangeEvent(kind=LICENSE, action=action, object_id=row['id'], data=row))
+    events.sort(key=lambda event: event.object_id)
+    ChangeEvent.objects.bulk_create(events, batch_size=CHUNK_SIZE)
+
+
+def serialize(event):
+    return {
+        'seq': event.id,
+        'kind': event.kind,
+        'action': event.action,
+        'id': event.object_id,
+        'data': event.data,
+        'created_at': event.created_at,
+    }
+
+
+def last_seq():
+    return ChangeEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def events_after(after, limit=500, now=None):
+    """Settled events with a sequence number above ``after``, oldest first."""
+    if after:
+        oldest = ChangeEvent.objects.order_by('id').values_list('id', flat=True).first()
+        if oldest is not None and after < oldest - 1:
+            raise ChangeLogGap(last_seq())
+    now = now or timezone.now()
+    settled = now - timedelta(seconds=_config().get('SETTLE_SECONDS', 1.0))
+    events = []
+    for event in ChangeEvent.objects.filter(id__gt=after).order_by('id')[:limit]:
+        # Stop at the first unsettled event rather than skipping it, so nothing
+        # below the position a client reaches can still appear later.
+        if event.created_at > settled:
+            break
+        events.append(event)
+    return events
+
+
+def compact(now=None):
+    """Delete events past the retention window or count; returns how many were deleted."""
+    config = _config()
+    now = now or timezone.now()
+    newest = last_seq()
+    # Compaction always removes a prefix of the log, so "older than the oldest
+    # remaining event" is exactly "compacted away" for events_after.
+    cutoff = ChangeEvent.objects.filter(
+        created_at__lt=now - timedelta(days=config.get('RETENTION_DAYS', 7))
+    ).order_by('-id').values_list('id', flat=True).first() or 0
+    max_events = config.get('MAX_EVENTS', 100000)
+    if max_events:
+        cutoff = max(cutoff, newest - max_events)
+    cutoff = min(cutoff, newest - 1)
+    if cutoff <= 0:
+        return 0
+    deleted, _ = ChangeEvent.objects.filter(id__lte=cutoff).delete()
+    return deleted
+
+
+def _sse(event_id, name, payload):
+    return f'id: {event_id}\nevent: {name}\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n'
+
+
+async def sse_stream(after, duration, limit=500):
+    """
+    Server-sent events from ``after`` for ``duration`` seconds, for ASGI only.
+
+    It waits with ``asyncio.sleep`` and reads through ``sync_to_async``, so an
+    open stream parks a coroutine rather than a worker. Each event's ``id`` is
+    its sequence number, so a reconnecting ``EventSource`` resumes with
+    ``Last-Event-ID``. A position that was compacted away produces a ``reset``
+    event carrying the current sequence number, after which the stream
+    continues from there.
+    """
+    config = _config()
+    interval = config.get('POLL_INTERVAL', 1.0)
+    heartbeat = config.get('HEARTBEAT_INTERVAL', 15.0)
+    read = sync_to_async(events_after)
+    deadline = time.monotonic() + duration
+    quiet_since = time.monotonic()
+    yield f'retry: {int(interval * 1000)}\n\n'
+    while time.monotonic() < deadline:
+        try:
+            events = await read(after, limit)
+        except ChangeLogGap as gap:
+            after = gap.last_seq
+            yield _sse(after, 'reset', {'last_seq': after})
+            continue
+        for event in events:
+            after = event.id
+            yield _sse(event.id, event.kind, serialize(event))
+        if events:
+            quiet_since = time.monotonic()
+            if len(events) == limit:
+                continue
+        elif time.monotonic() - quiet_since >= heartbeat:
+            quiet_since = time.monotonic()
+            yield ': keep-alive\n\n'
+        await asyncio.sleep(interval)
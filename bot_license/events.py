@@ -0,0 +1,189 @@
+"""
+Write-behind log of license validations.
+
+Validation views call ``record_validation``, which only appends to an
+in-memory buffer. A background thread writes the buffer to ``ValidationEvent``
+with ``bulk_create`` whenever ``BATCH_SIZE`` events are waiting or
+``FLUSH_INTERVAL`` seconds have passed. The buffer holds at most
+``MAX_BUFFERED`` events; anything beyond that is dropped and counted rather
+than slowing the validation path down. Pending events are flushed when the
+worker process exits.
+
+Attempts with keys that do not exist (404s, most of them turned away by
+``key_filter`` before any query) are counted as ``unknown`` rather than
+stored, so key guessing cannot fill the table. With ``UNKNOWN_SAMPLE_EVERY``
+set to N, every Nth of them is still stored.
+
+Events older than ``RETENTION_DAYS`` are removed by ``prune_events``
+(``manage.py prune_validation_events``), oldest first and in short
+transactions.
+"""
+import atexit
+import os
+import threading
+from collections import deque
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.utils import timezone
+
+from .models import ValidationEvent
+from .throttling import client_ip
+
+
+class EventBuffer:
+
+    def __init__(self, max_buffered=10000, batch_size=500, flush_interval=2.0, background=True, unknown_sample_every=0):
+        self.max_buffered = max_buffered
+        self.unknown_sample_every = unknown_sample_every
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.background = background
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+        self.recorded = 0
+        self.unknown = 0
+        self.dropped = 0
+        self.flushed = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def record(self, license_key, account_id, ip_address, endpoint, status_code):
+        if status_code == 404:
+            with self._lock:
+                self.unknown += 1
+                sampled = self.unknown_sample_every and self.unknown % self.unknown_sample_every == 0
+            if not sampled:
+                return
+        event = ValidationEvent(
+            license_key=str(license_key or '')[:9],
+            account_id=str(account_id or '')[:25],
+            ip_address=ip_address,
+            endpoint=endpoint,
+            status_code=status_code,
+            created_at=timezone.now(),
+        )
+        with self._lock:
+            if len(self._events) >= self.max_buffered:
+                self.dropped += 1
+                return
+            self._events.append(event)
+            self.recorded += 1
+            pending = len(self._events)
+
+        if self.background:
+            self._ensure_thread()
+            if pending >= self.batch_size:
+                self._wakeup.set()
+
+    def _ensure_thread(self):
+        # Threads do not survive fork, so a pre-forked worker starts its own.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='validation-event-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stopping:
+                self._wakeup.wait(self.flush_interval)
+                self._wakeup.clear()
+                self.flush()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Write every buffered event; returns how many were written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+                if not batch:
+                    break
+                try:
+                    ValidationEvent.objects.bulk_create(batch)
+                except DatabaseError:
+                    # Events are best effort; a failing batch must not block the rest.
+                    with self._lock:
+                        self.failed += len(batch)
+                    connection.close_if_unusable_or_obsolete()
+                    continue
+                written += len(batch)
+                with self._lock:
+                    self.flushed += len(batch)
+                    self.flushes += 1
+        return written
+
+    def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval + 5)
+        self._thread = None
+        self.flush()
+
+    def discard(self):
+        with self._lock:
+            self._events.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'buffered': len(self._events),
+                'max_buffered': self.max_buffered,
+                'recorded': self.recorded,
+                'unknown': self.unknown,
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'flushes': self.flushes,
+            }
+
+
+def _build_buffer():
+    config = getattr(settings, 'VALIDATION_EVENTS', {})
+    return EventBuffer(
+        max_buffered=config.get('MAX_BUFFERED', 10000),
+        batch_size=config.get('BATCH_SIZE', 500),
+        flush_interval=config.get('FLUSH_INTERVAL', 2.0),
+        background=config.get('BACKGROUND', True),
+        unknown_sample_every=config.get('UNKNOWN_SAMPLE_EVERY', 0),
+    )
+
+
+event_buffer = _build_buffer()
+atexit.register(event_buffer.stop)
+
+
+def record_validation(request, license_key, account_id, endpoint, status_code):
+    if getattr(settings, 'VALIDATION_EVENTS', {}).get('ENABLED', True):
+        event_buffer.record(license_key, account_id, client_ip(request), endpoint, status_code)
+
+
+def prune_events(now=None, chunk_size=5000):
+    """Delete validation events past ``RETENTION_DAYS``; returns how many were deleted."""
+    config = getattr(settings, 'VALIDATION_EVENTS', {})
+    cutoff = (now or timezone.now()) - timedelta(days=config.get('RETENTION_DAYS', 30))
+    deleted = 0
+    while True:
+        # Ids follow creation order closely enough that walking the primary
+        # key from the oldest row finds every expired event without an index
+        # on created_at, which would slow down the inserts.
+        rows = list(ValidationEvent.objects.order_by('id').values_list('id', 'created_at')[:chunk_size])
+        expired = [pk for pk, created_at in rows if created_at < cutoff]
+        if expired:
+            deleted += ValidationEvent.objects.filter(id__in=expired).delete()[0]
+        if len(expired) < chunk_size:
+            return deleted
@@ -0,0 +1,80 @@
+"""
+Expiry sweeping and renewal lists.
+
+``sweep_expired`` deactivates active licenses whose ``expires_at`` has
+passed. Each chunk reads ``is_active = true AND expires_at <= now`` from the
+``(is_active, expires_at)`` index, oldest expiry first, and deactivates it in
+one transaction. Deactivated rows drop out of that range, so the next chunk
+starts where the last one stopped and a crash resumes from the last committed
+chunk without a watermark. An expiry moved into the past, to any date, is
+swept on the next run. ``ExpirySweep`` records the last license swept and a
+running total.
+
+Renewing a license, through ``extend`` or an ``expires_at`` edit, does not
+reactivate it: a swept license looks the same as a revoked one, so
+reactivation is an explicit ``activate``, which resellers send alongside the
+``extend``.
+
+``expiring_soon`` lists active licenses expiring within a window, served by
+the ``(is_active, expires_at)`` index.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import BotLicense, ExpirySweep
+from .signals import licenses_bulk_changed
+from .stats import LicenseState
+
+
+SWEEP_NAME = 'expiry'
+SWEEP_CHUNK_SIZE = 1000
+
+
+def _sweep_chunk(now, chunk_size):
+    """Sweep one chunk; returns ``(rows_read, licenses_deactivated)``."""
+    with transaction.atomic():
+        sweep, _ = ExpirySweep.objects.select_for_update().get_or_create(name=SWEEP_NAME)
+        rows = list(
+            BotLicense.objects.filter(is_active=True, expires_at__lte=now)
+            .select_for_update().order_by('expires_at', 'id')
+            .values_list('id', 'license_key', 'product_id', 'expires_at')[:chunk_size]
+        )
+        if not rows:
+            return 0, 0
+
+        # Rows are locked and active, so every one of them is deactivated here.
+        deactivated = BotLicense.objects.filter(id__in=[row[0] for row in rows]).update(is_active=False)
+        licenses_bulk_changed.send(
+            sender=BotLicense,
+            license_keys=[row[1] for row in rows],
+            created_keys=[],
+            transitions=[(LicenseState(row[2], True, True), LicenseState(row[2], False, True)) for row in rows],
+        )
+
+        sweep.last_id, sweep.last_expires_at = rows[-1][0], rows[-1][3]
+        sweep.deactivated += deactivated
+        sweep.save(update_fields=['last_id', 'last_expires_at', 'deactivated', 'updated_at'])
+    return len(rows), deactivated
+
+
+def sweep_expired(now=None, chunk_size=SWEEP_CHUNK_SIZE, max_chunks=None):
+    """Deactivate active licenses whose expiry has passed; returns how many were deactivated."""
+    now = now or timezone.now()
+    deactivated = chunks = 0
+    while max_chunks is None or chunks < max_chunks:
+        read, changed = _sweep_chunk(now, chunk_size)
+        deactivated += changed
+        chunks += 1
+        if read < chunk_size:
+            break
+    return deactivated
+
+
+def expiring_soon(within=timedelta(days=7), now=None):
+    """Active licenses expiring in ``(now, now + within]``, soonest first."""
+    now = now or timezone.now()
+    return BotLicense.objects.filter(
+        is_active=True, expires_at__gt=now, expires_at__lte=now + within
+    ).order_by('expires_at', 'id')
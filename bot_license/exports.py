@@ -0,0 +1,89 @@
+import csv
+import io
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .expiry import expiring_soon
+from .models import BotLicense, Product
+
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORTS = {
+    'licenses': (
+        lambda: BotLicense.objects.order_by('id').values(
+            'id', 'license_key', 'product_id', 'account_id', 'is_active', 'created_at', 'expires_at',
+            product_name=F('product__name'),
+        ),
+        ('id', 'license_key', 'product_id', 'product_name', 'account_id', 'is_active', 'created_at', 'expires_at'),
+    ),
+    # Renewal reminders: active licenses expiring within EXPIRY_SWEEP['REMIND_WITHIN_DAYS'].
+    'expiring': (
+        lambda: expiring_soon(timedelta(days=settings.EXPIRY_SWEEP['REMIND_WITHIN_DAYS'])).values(
+            'id', 'license_key', 'product_id', 'account_id', 'expires_at', product_name=F('product__name'),
+        ),
+        ('id', 'license_key', 'product_id', 'product_name', 'account_id', 'expires_at'),
+    ),
+    'products': (
+        lambda: Product.objects.order_by('id').values('id', 'name', 'version', 'description', 'created_at'),
+        ('id', 'name', 'version', 'description', 'created_at'),
+    ),
+}
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def _chunked(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ndjson(rows, fields, chunk_size):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for chunk in _chunked(rows, chunk_size):
+        yield ''.join(encoder.encode({field: row[field] for field in fields}) + '\n' for row in chunk)
+
+
+def _csv(rows, fields, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for chunk in _chunked(rows, chunk_size):
+        for row in chunk:
+            writer.writerow([
+                row[field].isoformat() if hasattr(row[field], 'isoformat') else row[field]
+                for field in fields
+            ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream_export(name, fmt, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the ``name`` export (``licenses``, ``expiring`` or ``products``) as ``fmt`` text chunks.
+
+    Rows are read with a chunked ``.iterator()`` over a ``values()``
+    projection and written out one chunk at a time, so memory use does not
+    depend on the table size.
+    """
+    queryset, fields = EXPORTS[name]
+    rows = queryset().iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        return _csv(rows, fields, chunk_size)
+    return _ndjson(rows, fields, chunk_size)
@@ -0,0 +1,139 @@
+"""
+Plain-Django fast path for ``POST /ea/validate/``.
+
+``FastPathMiddleware`` sits right after the metrics middleware and answers EA
+validations itself, so they skip the rest of ``settings.MIDDLEWARE``
+(CORS, sessions, auth, messages, CSRF) and DRF's negotiation, parsing and
+rendering. The handler reads form, multipart or JSON bodies directly, looks the key up
+through the snapshot cache and returns prebuilt response bodies with the same
+status codes and ``valid`` messages as ``EAValidate``. Lease requests and
+anything it cannot parse fall through to the full stack.
+"""
+import json
+import math
+from urllib.parse import parse_qs
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.exceptions import Throttled
+from rest_framework.renderers import JSONRenderer
+
+from .cache import license_cache
+from .events import record_validation
+from .routers import replica_reads
+from .throttling import client_ip, validation_throttle
+from .validation import (
+    ACCOUNT_MISMATCH, INVALID_LICENSE_KEY, LICENSE_EXPIRED, LICENSE_KEY_REQUIRED, LICENSE_VALID, NO_SEAT,
+    acheck_license, check_license,
+)
+
+
+FAST_PATH = '/ea/validate/'
+ROUTE = 'ea/validate/'
+
+_BODIES = {
+    message: JSONRenderer().render({'valid': message})
+    for message, _ in (
+        LICENSE_KEY_REQUIRED, INVALID_LICENSE_KEY, ACCOUNT_MISMATCH, LICENSE_EXPIRED, NO_SEAT, LICENSE_VALID,
+    )
+}
+
+
+def _parse(request):
+    """Return ``(license_key, account_id)`` or ``None`` when the full stack should handle the body."""
+    content_type = request.content_type
+    if content_type == 'application/x-www-form-urlencoded':
+        data = parse_qs(request.body.decode('utf-8', 'replace'))
+        if 'lease' in data:
+            return None
+        return (data.get('license_key') or [None])[-1], (data.get('account_id') or [None])[-1]
+    if content_type == 'multipart/form-data':
+        data = request.POST
+        if 'lease' in data:
+            return None
+        return data.get('license_key'), data.get('account_id')
+    if content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        if not isinstance(data, dict) or 'lease' in data:
+            return None
+        return data.get('license_key'), data.get('account_id')
+    return None
+
+
+def _respond(request, license_key, account, result):
+    message, code = result
+    record_validation(request, license_key, account, 'ea-validate', code)
+    return HttpResponse(_BODIES[message], status=code, content_type='application/json')
+
+
+def _reject(request, license_key):
+    # Same order as the DRF view: throttles run before the handler.
+    wait = validation_throttle.check(client_ip(request) or '', license_key)
+    if wait is not None:
+        exc = Throttled(wait)
+        response = HttpResponse(
+            JSONRenderer().render({'detail': exc.detail}), status=exc.status_code, content_type='application/json'
+        )
+        response['Retry-After'] = str(math.ceil(wait))
+        return response
+    if not license_key:
+        message, code = LICENSE_KEY_REQUIRED
+        return HttpResponse(_BODIES[message], status=code, content_type='application/json')
+    return None
+
+
+def ea_validate_fast(request):
+    parsed = _parse(request)
+    if parsed is None:
+        return None
+    license_key, account = parsed
+    with replica_reads():
+        return _reject(request, license_key) or _respond(
+            request, license_key, account, check_license(license_cache.get(license_key), account)
+        )
+
+
+async def aea_validate_fast(request):
+    parsed = _parse(request)
+    if parsed is None:
+        return None
+    license_key, account = parsed
+    with replica_reads():
+        return _reject(request, license_key) or _respond(
+            request, license_key, account, await acheck_license(await license_cache.aget(license_key), account)
+        )
+
+
+class FastPathMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _applies(self, request):
+        return request.path_info == FAST_PATH and request.method == 'POST' and settings.EA_FAST_PATH
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self._applies(request):
+            response = ea_validate_fast(request)
+            if response is not None:
+                request.metrics_route = ROUTE
+                return response
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self._applies(request):
+            response = await aea_validate_fast(request)
+            if response is not None:
+                request.metrics_route = ROUTE
+                return response
+        return await self.get_response(request)
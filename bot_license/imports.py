@@ -0,0 +1,266 @@
+"""
+Background CSV import of licenses.
+
+An upload becomes a ``LicenseImport`` row holding the CSV itself. The CSV has
+a header row with ``account_id``, either ``product_id`` or ``product`` (the
+product name) and an optional ``expires_at`` (ISO 8601 date or datetime). The
+source is stored in the database rather than on local disk because web
+dynos do not share a filesystem and may be replaced mid-import.
+
+``process_import`` parses the source as a stream and works through it in
+chunks of ``LICENSE_IMPORT['CHUNK_SIZE']`` rows. Rows are checked against a
+product map loaded once per run. Each chunk is committed in one transaction
+that:
+
+* mints the keys,
+* ``bulk_create``s the licenses,
+* sends ``licenses_bulk_changed``,
+* advances ``processed_rows``.
+
+A run that dies therefore loses at most the chunk in flight, and a rerun
+continues from ``processed_rows`` without creating any row twice.
+
+Jobs are claimed with a conditional ``UPDATE`` that records the runner's
+token, and a runner only writes chunks or the final status while the token
+is still its own. A ``running`` job whose heartbeat is older than
+``STALE_AFTER`` seconds is taken to have lost its worker and can be claimed
+again. ``manage.py process_imports --loop`` (the ``imports`` process in the
+Procfile) runs pending jobs and resumes stale ones. With ``RUN_IN_WEB`` set,
+uploads also start on a thread in the web process; a worker restart then
+leaves the job for the ``imports`` process to resume.
+"""
+import csv
+import io
+import logging
+import threading
+import uuid
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .bulk import ACCOUNT_ID_MAX_LENGTH
+from .models import BotLicense, LicenseImport, Product
+from .signals import licenses_bulk_changed
+from .stats import license_state
+from .utils import mint_license_keys
+
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidImport(Exception):
+    """The upload as a whole cannot be imported (size, encoding or header)."""
+
+
+class RowError(Exception):
+    pass
+
+
+def _config():
+    return getattr(settings, 'LICENSE_IMPORT', {})
+
+
+def _reader(source):
+    return csv.DictReader(io.TextIOWrapper(io.BytesIO(bytes(source)), encoding='utf-8-sig', newline=''))
+
+
+def create_import(source, filename=''):
+    """Check the header, count the rows and store ``source`` as a pending ``LicenseImport``."""
+    max_bytes = _config().get('MAX_BYTES', 20 * 1024 * 1024)
+    if len(source) > max_bytes:
+        raise InvalidImport(f'File must be at most {max_bytes} bytes.')
+    try:
+        reader = _reader(source)
+        columns = set(reader.fieldnames or ())
+        total = sum(1 for _ in reader)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise InvalidImport(f'File is not a UTF-8 CSV: {exc}')
+    if 'account_id' not in columns or not columns & {'product_id', 'product'}:
+        raise InvalidImport('Header must include account_id and product_id or product.')
+    return LicenseImport.objects.create(filename=filename[:255], source=source, total_rows=total)
+
+
+def _product_map():
+    """``{lookup: product_id}`` by id and by unique lower-cased name."""
+    products = {}
+    names = {}
+    for product_id, name in Product.objects.values_list('id', 'name'):
+        products[str(product_id)] = product_id
+        if name:
+            names.setdefault(name.strip().lower(), []).append(product_id)
+    return products, {name: ids[0] for name, ids in names.items() if len(ids) == 1}
+
+
+def _expiry(value):
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        day = parse_date(value) if parsed is None else None
+    except ValueError:
+        parsed = day = None
+    if parsed is None:
+        if day is None:
+            raise RowError('expires_at must be an ISO 8601 date or datetime.')
+        parsed = datetime.combine(day, datetime.min.time())
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+def _clean_row(row, products):
+    by_id, by_name = products
+    if row.get('product_id'):
+        product_id = by_id.get(row['product_id'].strip())
+    elif row.get('product'):
+        product_id = by_name.get(row['product'].strip().lower())
+    else:
+        raise RowError('product_id or product is required.')
+    if product_id is None:
+        raise RowError('Unknown product.')
+    account_id = (row.get('account_id') or '').strip()
+    if not account_id:
+        raise RowError('account_id is required.')
+    if len(account_id) > ACCOUNT_ID_MAX_LENGTH:
+        raise RowError(f'account_id must be at most {ACCOUNT_ID_MAX_LENGTH} characters.')
+    return product_id, account_id, _expiry((row.get('expires_at') or '').strip())
+
+
+def claim(job_id, runner, now=None):
+    """Mark the job running for ``runner``; ``False`` if someone else is working on it."""
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=_config().get('STALE_AFTER', 60))
+    return bool(LicenseImport.objects.filter(
+        Q(status=LicenseImport.PENDING) | Q(status=LicenseImport.RUNNING, heartbeat_at__lt=stale), pk=job_id,
+    ).update(
+        status=LicenseImport.RUNNING, runner=runner, heartbeat_at=now, started_at=Coalesce('started_at', Value(now)),
+    ))
+
+
+def _import_chunk(job_id, runner, start, rows, products):
+    """Insert one chunk and advance the job in the same transaction."""
+    now = timezone.now()
+    max_errors = _config().get('MAX_ERRORS', 1000)
+    valid, errors = [], []
+    for number, row in enumerate(rows, start=start + 1):
+        try:
+            valid.append(_clean_row(row, products))
+        except RowError as exc:
+            errors.append({'row': number, 'detail': str(exc)})
+
+    with transaction.atomic():
+        job = LicenseImport.objects.select_for_update().only(
+            'runner', 'processed_rows', 'created_licenses', 'failed_rows', 'errors',
+        ).get(pk=job_id)
+        if job.runner != runner or job.processed_rows != start:
+            # Another runner claimed the job after our heartbeat went stale.
+            return False
+        created = [
+            BotLicense(license_key=key, product_id=product_id, account_id=account_id, expires_at=expires_at)
+            for key, (product_id, account_id, expires_at) in zip(mint_license_keys(len(valid)), valid)
+        ]
+        if created:
+            BotLicense.objects.bulk_create(created)
+            licenses_bulk_changed.send(
+                sender=BotLicense,
+                license_keys=[],
+                created_keys=[license.license_key for license in created],
+                transitions=[
+                    (None, license_state(license.product_id, license.is_active, license.expires_at, now))
+                    for license in created
+                ],
+            )
+        LicenseImport.objects.filter(pk=job_id).update(
+            processed_rows=start + len(rows),
+            created_licenses=job.created_licenses + len(created),
+            failed_rows=job.failed_rows + len(errors),
+            errors=(job.errors + errors)[:max_errors],
+            heartbeat_at=timezone.now(),
+        )
+    return True
+
+
+def process_import(job_id):
+    """Claim ``job_id`` and import it from its resume point; returns ``False`` if it could not be claimed."""
+    runner = uuid.uuid4().hex
+    if not claim(job_id, runner):
+        return False
+    chunk_size = _config().get('CHUNK_SIZE', 1000)
+    start = 0
+    try:
+        job = LicenseImport.objects.only('source', 'processed_rows').get(pk=job_id)
+        products = _product_map()
+        start = job.processed_rows
+        rows = islice(_reader(job.source), start, None)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            if not _import_chunk(job_id, runner, start, chunk, products):
+                return False
+            start += len(chunk)
+    except Exception as exc:
+        logger.exception('License import %s failed after row %s.', job_id, start)
+        # A runner that has lost the job leaves it to the one that took over.
+        LicenseImport.objects.filter(pk=job_id, runner=runner).update(
+            status=LicenseImport.FAILED, detail=f'{exc.__class__.__name__}: {exc}', finished_at=timezone.now(),
+        )
+        return True
+    LicenseImport.objects.filter(pk=job_id, runner=runner).update(
+        status=LicenseImport.COMPLETED, finished_at=timezone.now(),
+    )
+    return True
+
+
+def _run_in_thread(job_id):
+    try:
+        process_import(job_id)
+    finally:
+        connections.close_all()
+
+
+def start_import(job):
+    """Process ``job`` on a background thread once the current transaction commits."""
+    transaction.on_commit(lambda: threading.Thread(
+        target=_run_in_thread, args=(job.pk,), name=f'license-import-{job.pk}', daemon=True,
+    ).start())
+
+
+def resumable_jobs(now=None):
+    """Pending jobs and running jobs whose runner stopped sending heartbeats, oldest first."""
+    now = now or timezone.now()
+    stale = now - timedelta(seconds=_config().get('STALE_AFTER', 60))
+    return list(
+        LicenseImport.objects.filter(
+            Q(status=LicenseImport.PENDING) | Q(status=LicenseImport.RUNNING, heartbeat_at__lt=stale)
+        ).order_by('id').values_list('id', flat=True)
+    )
+
+
+def job_status(job, max_errors=100):
+    return {
+        'id': job.pk,
+        'filename': job.filename,
+        'status': job.status,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'progress': round(job.processed_rows / job.total_rows, 4) if job.total_rows else 1.0,
+        'created_licenses': job.created_licenses,
+        'failed_rows': job.failed_rows,
+        'errors': job.errors[:max_errors],
+        'detail': job.detail,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
+
+
+def retry_import(job_id):
+    """Put a failed job back in the queue; it resumes from its last committed chunk."""
+    return bool(LicenseImport.objects.filter(pk=job_id, status=LicenseImport.FAILED).update(
+        status=LicenseImport.PENDING, detail='', finished_at=None,
+    ))
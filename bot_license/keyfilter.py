@@ -0,0 +1,156 @@
+"""
+In-memory membership filter for issued license keys.
+
+Every ``TXCT-XXXX`` key maps to one bit of a bitmap over the whole
+36^4 key space (about 205 KiB), so membership is exact: an unset bit means
+the key was never issued and the lookup can be answered without the
+database. Keys in any other format are kept in a small set.
+
+The filter is loaded lazily from the licenses table and then kept current
+by ``add`` (called from the ``BotLicense`` save signal). Keys created by
+other worker processes are picked up by an incremental ``id > last_id``
+refresh, run at most once per ``REFRESH_INTERVAL`` seconds when a lookup
+misses, which bounds how long a brand-new key can be rejected by this worker.
+Each refresh re-reads the last ``REFRESH_OVERLAP`` ids as well, because ids
+are allocated before commit and can become visible out of order.
+"""
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import BotLicense
+from .utils import KEY_CHARS, KEY_LENGTH, KEY_PREFIX, KEY_SPACE
+
+
+_CHAR_VALUES = {char: value for value, char in enumerate(KEY_CHARS)}
+REFRESH_OVERLAP = 1000
+
+
+def key_index(license_key):
+    """Position of a ``TXCT-XXXX`` key in the key space, or ``None`` for other formats."""
+    if len(license_key) != len(KEY_PREFIX) + KEY_LENGTH or not license_key.startswith(KEY_PREFIX):
+        return None
+    index = 0
+    for char in license_key[len(KEY_PREFIX):]:
+        value = _CHAR_VALUES.get(char)
+        if value is None:
+            return None
+        index = index * len(KEY_CHARS) + value
+    return index
+
+
+class LicenseKeyFilter:
+
+    def __init__(self, refresh_interval=5.0, enabled=True):
+        self.refresh_interval = refresh_interval
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._bits = bytearray((KEY_SPACE + 7) // 8)
+            self._other_keys = set()
+            self._population = 0
+            self._last_id = 0
+            self._loaded = False
+            self._last_refresh = 0.0
+            self.rejected = 0
+            self.passed = 0
+            self.refreshes = 0
+
+    def _add(self, license_key):
+        index = key_index(license_key)
+        if index is None:
+            if license_key not in self._other_keys:
+                self._other_keys.add(license_key)
+                self._population += 1
+            return
+        byte, bit = divmod(index, 8)
+        if not self._bits[byte] & (1 << bit):
+            self._bits[byte] |= 1 << bit
+            self._population += 1
+
+    def _contains(self, license_key):
+        index = key_index(license_key)
+        if index is None:
+            return license_key in self._other_keys
+        byte, bit = divmod(index, 8)
+        return bool(self._bits[byte] & (1 << bit))
+
+    def add(self, license_key):
+        if license_key:
+            with self._lock:
+                self._add(license_key)
+
+    def refresh(self):
+        """Load keys created since the last load; the first call loads every key."""
+        since = max(0, self._last_id - REFRESH_OVERLAP) if self._loaded else 0
+        rows = BotLicense.objects.filter(id__gt=since).order_by('id').values_list('id', 'license_key')
+        with self._lock:
+            for license_id, license_key in rows.iterator(chunk_size=5000):
+                self._add(license_key)
+                self._last_id = max(self._last_id, license_id)
+            self._loaded = True
+            self._last_refresh = time.monotonic()
+            self.refreshes += 1
+
+    def might_exist(self, license_key):
+        """``False`` only if ``license_key`` has certainly never been issued."""
+        if not self.enabled:
+            return True
+        if not license_key or not isinstance(license_key, str):
+            return False
+        if not self._loaded:
+            self.refresh()
+        if self._contains(license_key):
+            self.passed += 1
+            return True
+        if time.monotonic() - self._last_refresh >= self.refresh_interval:
+            self.refresh()
+            if self._contains(license_key):
+                self.passed += 1
+                return True
+        self.rejected += 1
+        return False
+
+    async def amight_exist(self, license_key):
+        """Async ``might_exist``; only leaves the event loop when a refresh is due."""
+        if not self.enabled:
+            return True
+        if not license_key or not isinstance(license_key, str):
+            return False
+        if self._loaded:
+            if self._contains(license_key):
+                self.passed += 1
+                return True
+            if time.monotonic() - self._last_refresh < self.refresh_interval:
+                self.rejected += 1
+                return False
+        return await sync_to_async(self.might_exist)(license_key)
+
+    def stats(self):
+        return {
+            'loaded': self._loaded,
+            'population': self._population,
+            'memory_bytes': len(self._bits) + sum(len(key) for key in self._other_keys),
+            # The bitmap has one bit per possible key, so it never reports an
+            # unissued key as present.
+            'false_positive_rate': 0.0,
+            'passed': self.passed,
+            'rejected': self.rejected,
+            'refreshes': self.refreshes,
+        }
+
+
+def _build_filter():
+    config = getattr(settings, 'LICENSE_KEY_FILTER', {})
+    return LicenseKeyFilter(
+        refresh_interval=config.get('REFRESH_INTERVAL', 5.0),
+        enabled=config.get('ENABLED', True),
+    )
+
+
+key_filter = _build_filter()
@@ -0,0 +1,154 @@
+"""
+Signed offline validation leases.
+
+A lease is a short-lived token an EA can keep between live validations:
+
+    base64url(payload_json) + "." + base64url(ed25519_sign(private_key, payload))
+
+where the payload holds the license key (``k``), account (``a``), product id
+(``p``), issue time (``iat``) and lease expiry (``exp``) as epoch seconds.
+Leases are only issued to active licenses and never outlive
+``BotLicense.expires_at``, so a revocation takes effect once the outstanding
+leases run out, i.e. within ``LICENSE_LEASE['TTL']`` seconds.
+
+Leases are signed with Ed25519. Only the server holds the private key, and EA
+builds embed the public key from ``lease_public_key`` (or ``manage.py
+lease_keys``), so a key pulled out of an EA can check leases but not mint
+them.
+"""
+import base64
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import Encoding, PublicFormat
+from django.conf import settings
+
+from .cache import aload_snapshot, load_snapshot
+
+
+class LeaseError(ValueError):
+    pass
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+@lru_cache(maxsize=4)
+def _private_key(encoded):
+    """The signing key from a base64url 32-byte seed, or derived from ``SECRET_KEY`` when unset."""
+    if encoded:
+        seed = _b64decode(encoded)
+    else:
+        seed = hashlib.sha256(b'bot_license.lease:' + settings.SECRET_KEY.encode()).digest()
+    return Ed25519PrivateKey.from_private_bytes(seed)
+
+
+@lru_cache(maxsize=4)
+def _public_key(encoded):
+    return Ed25519PublicKey.from_public_bytes(_b64decode(encoded))
+
+
+def _lease_settings():
+    config = getattr(settings, 'LICENSE_LEASE', {})
+    return _private_key(config.get('PRIVATE_KEY')), config.get('TTL', 300)
+
+
+def generate_private_key():
+    """A new base64url signing key seed for ``LICENSE_LEASE['PRIVATE_KEY']``."""
+    return _b64encode(os.urandom(32))
+
+
+def lease_public_key():
+    """The base64url raw public key that EA builds verify leases with."""
+    private_key, _ = _lease_settings()
+    return _b64encode(private_key.public_key().public_bytes(Encoding.Raw, PublicFormat.Raw))
+
+
+def issue_lease(license, account_id=None, now=None):
+    """
+    Return ``(token, expires_at)`` for ``license`` or ``None`` if it may not get one.
+
+    ``license`` is anything with the ``LicenseSnapshot`` fields. Entries from
+    the shared license table only carry an account hash, so they are re-read
+    from the database when the caller does not name the account.
+    """
+    if not license.is_active or license.expired():
+        return None
+    if account_id is None and license.account_id is None:
+        license = load_snapshot(license.license_key)
+        if license is None:
+            return None
+    return _sign_lease(license, account_id, now)
+
+
+async def aissue_lease(license, account_id=None, now=None):
+    """Async counterpart of ``issue_lease``, re-reading table entries with the async ORM."""
+    if not license.is_active or license.expired():
+        return None
+    if account_id is None and license.account_id is None:
+        license = await aload_snapshot(license.license_key)
+        if license is None:
+            return None
+    return _sign_lease(license, account_id, now)
+
+
+def _sign_lease(license, account_id, now):
+    private_key, ttl = _lease_settings()
+    now = int(now if now is not None else time.time())
+    expires = now + int(ttl)
+    if license.expires_at is not None:
+        expires = min(expires, int(license.expires_at.timestamp()))
+
+    payload = json.dumps({
+        'k': license.license_key,
+        'a': account_id or license.account_id,
+        'p': license.product_id,
+        'iat': now,
+        'exp': expires,
+    }, separators=(',', ':')).encode()
+    token = f'{_b64encode(payload)}.{_b64encode(private_key.sign(payload))}'
+    return token, datetime.fromtimestamp(expires, tz=dt_timezone.utc)
+
+
+def verify_lease(token, license_key=None, account_id=None, now=None, public_key=None):
+    """
+    Check a lease token and return its payload.
+
+    ``public_key`` is a base64url public key as returned by
+    ``lease_public_key``; it defaults to this server's. Raises ``LeaseError``
+    if the token is malformed, forged, expired or issued for a different
+    license key or account.
+    """
+    key = _public_key(public_key) if public_key is not None else _lease_settings()[0].public_key()
+    try:
+        encoded_payload, encoded_signature = token.split('.')
+        payload = _b64decode(encoded_payload)
+        signature = _b64decode(encoded_signature)
+    except (AttributeError, ValueError):
+        raise LeaseError('Malformed lease.')
+
+    try:
+        key.verify(signature, payload)
+    except InvalidSignature:
+        raise LeaseError('Invalid lease signature.')
+
+    claims = json.loads(payload)
+    now = now if now is not None else time.time()
+    if claims['exp'] <= now:
+        raise LeaseError('Lease has expired.')
+    if license_key is not None and claims['k'] != license_key:
+        raise LeaseError('Lease was issued for another license.')
+    if account_id is not None and claims['a'] != account_id:
+        raise LeaseError('Lease was issued for another account.')
+    return claims
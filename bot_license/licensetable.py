@@ -0,0 +1,281 @@
+"""
+Memory-mapped license table shared by all worker processes on a host.
+
+``export_table`` writes every ``TXCT-XXXX`` license as a fixed-width record,
+sorted by key, to ``LICENSE_TABLE['PATH']``. It writes a temporary file and
+``os.replace``s it into place, so readers always see a complete generation.
+Each record holds the key index, a hash of the account id, the flags
+(active, has expiry, seat-limited), the expiry and the product id.
+
+Each worker ``mmap``s the file and binary-searches it in place with
+``struct.unpack_from``. The kernel page cache holds one copy for all workers
+and nothing is warmed per process. Every ``CHECK_INTERVAL`` seconds a worker
+re-stats the path and maps the new generation when the file has been
+replaced.
+
+A generation is only as fresh as its last export. Keys written by this
+process since the generation was built are marked dirty and skip the table,
+as do keys the table does not contain. At most ``MAX_DIRTY`` keys are
+tracked. Past that, for example while the exporter is down, every key skips
+the table until a generation built after the overflow is mapped. The same
+bypass applies when ``license_cache`` learns that another process wrote
+licenses without knowing which, until a generation exported at that
+``licenses`` version is mapped. Both fall back to the usual cache and
+database path. ``manage.py export_license_table --loop`` rewrites the file
+whenever the ``licenses`` table version moves.
+"""
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from .keyfilter import key_index
+from .models import BotLicense, TableVersion
+from .versions import LICENSES
+
+
+MAGIC = b'TXLT'
+FORMAT_VERSION = 2
+# Big-endian throughout so that packed records sort by key index as bytes.
+HEADER = struct.Struct('>4sHHQqq')   # magic, format, record size, count, built at (us), licenses version
+RECORD = struct.Struct('>IQBqQ')     # key index, account hash, flags, expires at (us), product id
+KEY = struct.Struct('>I')
+ACTIVE = 1
+HAS_EXPIRY = 2
+SEAT_LIMITED = 4
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def account_hash(account_id):
+    return int.from_bytes(hashlib.blake2b(str(account_id).encode(), digest_size=8).digest(), 'big')
+
+
+def _micros(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+class TableEntry(NamedTuple):
+    """A license as stored in the table; the account is only known by its hash."""
+    license_key: str
+    account_hash: int
+    is_active: bool
+    expires_at: Optional[datetime]
+    product_id: int
+    account_id: Optional[str] = None
+    seat_limited: bool = False
+
+    def expired(self):
+        return self.expires_at is not None and self.expires_at < timezone.now()
+
+    def matches_account(self, account_id):
+        return isinstance(account_id, str) and account_hash(account_id) == self.account_hash
+
+
+def export_table(path, chunk_size=5000):
+    """Write a new generation of the table to ``path``; returns the number of licenses written."""
+    built_at = timezone.now()
+    version = TableVersion.objects.filter(name=LICENSES).values_list('version', flat=True).first() or 0
+    records = []
+    rows = BotLicense.objects.values_list(
+        'license_key', 'account_id', 'is_active', 'expires_at', 'product_id', 'max_seats',
+    )
+    for license_key, account_id, is_active, expires_at, product_id, max_seats in rows.iterator(chunk_size=chunk_size):
+        index = key_index(license_key)
+        if index is None:
+            continue
+        flags = (
+            (ACTIVE if is_active else 0) | (HAS_EXPIRY if expires_at is not None else 0)
+            | (SEAT_LIMITED if max_seats else 0)
+        )
+        records.append(RECORD.pack(
+            index, account_hash(account_id), flags, _micros(expires_at) if expires_at else 0, product_id
+        ))
+    records.sort()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.license-table-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            out.write(HEADER.pack(MAGIC, FORMAT_VERSION, RECORD.size, len(records), _micros(built_at), version))
+            out.writelines(records)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+    return len(records)
+
+
+class _Generation:
+    __slots__ = ('mm', 'count', 'built_at', 'version', 'identity')
+
+    def __init__(self, path):
+        with open(path, 'rb') as source:
+            stat = os.fstat(source.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            self.mm = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, record_size, self.count, built_at, self.version = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION or record_size != RECORD.size:
+            raise ValueError(f'{path} is not a license table this version can read.')
+        if HEADER.size + self.count * RECORD.size > len(self.mm):
+            raise ValueError(f'{path} is truncated.')
+        self.built_at = EPOCH + timedelta(microseconds=built_at)
+
+
+class LicenseTable:
+
+    def __init__(self, path=None, check_interval=2.0, max_dirty=10000):
+        self.path = path
+        self.check_interval = check_interval
+        self.max_dirty = max_dirty
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._generation = None
+            self._checked = float('-inf')
+            self._dirty = {}
+            self._all_dirty_since = None
+            self._all_dirty_version = None
+            self.hits = 0
+            self.misses = 0
+            self.bypassed = 0
+            self.swaps = 0
+            self.errors = 0
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def _current(self):
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return self._generation
+        with self._lock:
+            if now - self._checked < self.check_interval:
+                return self._generation
+            self._checked = now
+            try:
+                stat = os.stat(self.path)
+                identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+                if self._generation is None or self._generation.identity != identity:
+                    generation = _Generation(self.path)
+                    # The old mapping is released once no reader holds it.
+                    self._generation = generation
+                    self.swaps += 1
+                    self._dirty = {
+                        key: changed for key, changed in self._dirty.items() if changed >= generation.built_at
+                    }
+                    if self._all_dirty_since is not None and (
+                        self._all_dirty_since < generation.built_at
+                        or self._all_dirty_version is not None and generation.version >= self._all_dirty_version
+                    ):
+                        self._all_dirty_since = self._all_dirty_version = None
+            except (OSError, ValueError):
+                self.errors += 1
+        return self._generation
+
+    def mark_dirty(self, *license_keys):
+        """Route ``license_keys`` past the table until a generation built after now is mapped."""
+        if not self.enabled:
+            return
+        now = timezone.now()
+        with self._lock:
+            for key in license_keys:
+                if key:
+                    self._dirty[key] = now
+            if len(self._dirty) > self.max_dirty:
+                # Too many to track: bypass the whole generation instead.
+                self._all_dirty_since = now
+                self._all_dirty_version = None
+                self._dirty = {}
+
+    def mark_all_dirty(self, version=None):
+        """
+        Route every key past the table until a generation built after now is mapped.
+
+        With ``version``, a generation exported at that ``licenses`` version
+        or later also ends the bypass, and one already mapped prevents it.
+        """
+        if not self.enabled:
+            return
+        now = timezone.now()
+        with self._lock:
+            generation = self._generation
+            if version is not None and generation is not None and generation.version >= version:
+                return
+            self._all_dirty_since = now
+            self._all_dirty_version = version
+            self._dirty = {}
+
+    def lookup(self, license_key):
+        """The ``TableEntry`` for ``license_key``, or ``None`` when the table cannot answer for it."""
+        if not self.enabled or not isinstance(license_key, str):
+            return None
+        generation = self._current()
+        index = key_index(license_key)
+        if generation is None or index is None:
+            return None
+        if self._all_dirty_since is not None or license_key in self._dirty:
+            self.bypassed += 1
+            return None
+
+        mm = generation.mm
+        low, high = 0, generation.count
+        while low < high:
+            middle = (low + high) // 2
+            found = KEY.unpack_from(mm, HEADER.size + middle * RECORD.size)[0]
+            if found < index:
+                low = middle + 1
+            elif found > index:
+                high = middle
+            else:
+                _, hashed, flags, expires, product_id = RECORD.unpack_from(mm, HEADER.size + middle * RECORD.size)
+                self.hits += 1
+                return TableEntry(
+                    license_key, hashed, bool(flags & ACTIVE),
+                    EPOCH + timedelta(microseconds=expires) if flags & HAS_EXPIRY else None,
+                    product_id, seat_limited=bool(flags & SEAT_LIMITED),
+                )
+        self.misses += 1
+        return None
+
+    def stats(self):
+        generation = self._generation
+        return {
+            'enabled': self.enabled,
+            'licenses': generation.count if generation else 0,
+            'generation_built_at': generation.built_at.isoformat() if generation else None,
+            'generation_version': generation.version if generation else None,
+            'dirty_keys': len(self._dirty),
+            'all_dirty': self._all_dirty_since is not None,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'swaps': self.swaps,
+            'errors': self.errors,
+        }
+
+
+def _build_table():
+    config = getattr(settings, 'LICENSE_TABLE', {})
+    return LicenseTable(
+        path=config.get('PATH'),
+        check_interval=config.get('CHECK_INTERVAL', 2.0),
+        max_dirty=config.get('MAX_DIRTY', 10000),
+    )
+
+
+license_table = _build_table()
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from bot_license.benchmarks import SCENARIOS, compare, run_benchmarks, run_serialization_benchmark, seed
+from bot_license.events import event_buffer
+from bot_license.throttling import validation_throttle
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and report throughput, latency percentiles, '
+        'queries and CPU time per request for the licensing endpoints.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10)
+        parser.add_argument('--licenses', type=int, default=10000)
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                            help=f'Comma-separated subset of: {", ".join(SCENARIOS)}.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--baseline', help='JSON results of a previous run to compare against.')
+        parser.add_argument('--max-regression', type=float, default=10.0,
+                            help='Fail when p95 or throughput is this many percent worse than the baseline.')
+        parser.add_argument('--serialization-rows', type=int, default=0,
+                            help='Also time rendering this many licenses through DRF serializers and the fast path.')
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        # Expected 4xx answers (expired licenses, account mismatches) would
+        # otherwise be logged for every request.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        if connection.vendor == 'sqlite':
+            # The default in-memory SQLite test database locks whole tables
+            # under concurrent writers; a file with immediate transactions
+            # makes writers queue up instead of failing.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+            connection.settings_dict['OPTIONS'].setdefault('transaction_mode', 'IMMEDIATE')
+            connection.settings_dict['OPTIONS'].setdefault('timeout', 30)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self.stdout.write(f'Seeding {options["products"]} products and {options["licenses"]} licenses...')
+            product_ids, pairs = seed(options['products'], options['licenses'])
+            # Every simulated EA comes from one address; measure the service, not the throttle.
+            validation_throttle.enabled = False
+            results = run_benchmarks(
+                product_ids, pairs, scenarios,
+                requests=options['requests'], concurrency=options['concurrency'],
+            )
+            serialization = (
+                run_serialization_benchmark(options['serialization_rows'])
+                if options['serialization_rows'] else None
+            )
+        finally:
+            # Write buffered validation events while the test database still exists.
+            event_buffer.stop()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        header = f'{"scenario":<20}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"queries":>9}{"cpu ms":>9}{"errors":>8}'
+        self.stdout.write(header)
+        for name, metrics in results.items():
+            self.stdout.write(
+                f'{name:<20}{metrics["throughput_rps"]:>10}{metrics["p50_ms"]:>10}{metrics["p95_ms"]:>10}'
+                f'{metrics["p99_ms"]:>10}{metrics["queries_per_request"]:>9}{metrics["cpu_ms_per_request"]:>9}{metrics["errors"]:>8}'
+            )
+
+        if serialization:
+            self.stdout.write('')
+            self.stdout.write(f'{"serialization":<20}{"rows":>10}{"ms":>10}{"rows/s":>12}{"bytes":>10}')
+            for name, metrics in serialization.items():
+                self.stdout.write(
+                    f'{name:<20}{metrics["rows"]:>10}{metrics["ms"]:>10}{metrics["rows_per_second"]:>12}{metrics["bytes"]:>10}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({**results, 'serialization': serialization} if serialization else results, output, indent=2)
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = compare(results, json.load(baseline), options['max_regression'])
+            for name, metric, before, after, change in regressions:
+                self.stderr.write(f'{name}: {metric} {before} -> {after} ({change:+}%)')
+            if regressions:
+                raise CommandError(f'{len(regressions)} benchmark regression(s) against the baseline.')
@@ -0,0 +1,40 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from bot_license.bulk import run_operations
+
+
+class Command(BaseCommand):
+    help = 'Run a JSON list of bulk license operations (create, revoke, activate, extend, reassign) in one transaction.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSON file with a list of operations, or - for stdin.')
+        parser.add_argument('--output', help='File to write the per-operation results to (defaults to stdout).')
+
+    def handle(self, *args, path, output, **options):
+        try:
+            if path == '-':
+                items = json.load(sys.stdin)
+            else:
+                with open(path) as source:
+                    items = json.load(source)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Could not read operations: {exc}')
+        if isinstance(items, dict):
+            items = items.get('operations')
+        if not isinstance(items, list):
+            raise CommandError('Expected a list of operations.')
+
+        results = run_operations(items)
+        body = json.dumps(results, cls=DjangoJSONEncoder, indent=2)
+        if output:
+            with open(output, 'w') as out:
+                out.write(body + '\n')
+        else:
+            self.stdout.write(body)
+
+        failed = sum(1 for result in results if result['status'] >= 400)
+        self.stderr.write(f'{len(results) - failed} operation(s) succeeded, {failed} failed.')
@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bot_license.changes import compact
+
+
+class Command(BaseCommand):
+    help = 'Delete change feed events past the retention window or the event cap.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=settings.CHANGE_LOG['COMPACT_INTERVAL'])
+
+    def handle(self, *args, loop, interval, **options):
+        while True:
+            deleted = compact()
+            self.stdout.write(f'Change log compaction: {deleted} event(s) deleted.')
+            if not loop:
+                return
+            time.sleep(interval)
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from bot_license.exports import EXPORTS, EXPORT_CHUNK_SIZE, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream licenses or products as NDJSON or CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(FORMATS), default='ndjson')
+        parser.add_argument('--output', help='File to write to (defaults to stdout).')
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, table, fmt, output, chunk_size, **options):
+        chunks = stream_export(table, fmt, chunk_size=chunk_size)
+        if not output:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(output, 'w', newline='') as out:
+            for chunk in chunks:
+                out.write(chunk)
@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bot_license.licensetable import export_table
+from bot_license.models import TableVersion
+from bot_license.versions import LICENSES
+
+
+class Command(BaseCommand):
+    help = 'Write the memory-mapped license table read by the web workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.LICENSE_TABLE['PATH'])
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep running, rewriting the table whenever licenses change.')
+        parser.add_argument('--interval', type=float, default=settings.LICENSE_TABLE['EXPORT_INTERVAL'])
+
+    def handle(self, *args, path, loop, interval, **options):
+        if not path:
+            raise CommandError('Set LICENSE_TABLE_PATH or pass --path.')
+        exported = None
+        while True:
+            version = TableVersion.objects.filter(name=LICENSES).values_list('version', flat=True).first() or 0
+            if exported is None or version != exported:
+                count = export_table(path)
+                exported = version
+                self.stdout.write(f'Wrote {count} license(s) to {path} (licenses version {version}).')
+            if not loop:
+                return
+            time.sleep(interval)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from bot_license.leases import generate_private_key, lease_public_key
+
+
+class Command(BaseCommand):
+    help = 'Print the public key EA builds verify leases with, or generate a new signing key.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--generate', action='store_true',
+            help='Print a new LICENSE_LEASE_PRIVATE_KEY instead. Keep it on the server only.',
+        )
+
+    def handle(self, *args, generate, **options):
+        if generate:
+            self.stdout.write(generate_private_key())
+        else:
+            self.stdout.write(lease_public_key())
@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from bot_license.imports import process_import, resumable_jobs, retry_import
+
+
+class Command(BaseCommand):
+    help = 'Run pending license CSV imports and resume ones whose worker stopped mid-import.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=settings.LICENSE_IMPORT['INTERVAL'])
+        parser.add_argument('--retry', type=int, metavar='ID', help='Requeue a failed import before running.')
+
+    def handle(self, *args, loop, interval, retry, **options):
+        if retry is not None and not retry_import(retry):
+            raise CommandError(f'Import {retry} does not exist or has not failed.')
+        while True:
+            for job_id in resumable_jobs():
+                if process_import(job_id):
+                    self.stdout.write(f'Import {job_id} processed.')
+            if not loop:
+                return
+            time.sleep(interval)
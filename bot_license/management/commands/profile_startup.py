@@ -0,0 +1,114 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter so that imports are measured from scratch.
+STARTUP_SCRIPT = r'''
+import json, sys, time
+
+with_database, warm, host = sys.argv[1] == '1', sys.argv[2] == '1', sys.argv[3]
+phases = {}
+last = time.perf_counter()
+
+def mark(name):
+    global last
+    now = time.perf_counter()
+    phases[name] = round((now - last) * 1000, 3)
+    last = now
+
+import django
+mark('import django')
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('settings')
+django.setup()
+mark('django.setup (apps, models, ready)')
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+mark('wsgi handler (middleware)')
+if warm:
+    from bot_license.warmup import warm_up_process
+    warm_up_process()
+    mark('process warmup (routes, DRF)')
+if with_database:
+    if warm:
+        from bot_license.warmup import warm_up_worker
+        warm_up_worker()
+        mark('worker warmup (databases, lookups)')
+    from django.test import RequestFactory
+    factory = RequestFactory(HTTP_HOST=host)
+    for attempt in ('first', 'second'):
+        for path in ('/health/', '/products/'):
+            application(factory.get(path).environ, lambda status, headers, exc_info=None: None)
+            mark(f'{attempt} request GET {path}')
+print(json.dumps(phases))
+'''
+
+
+def parse_import_times(stderr):
+    """Self import time in ms per top-level package, from ``python -X importtime`` output."""
+    packages = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, _, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        packages[name.split('.')[0]] += int(own) / 1000
+    return dict(packages)
+
+
+class Command(BaseCommand):
+    help = 'Report import-time and startup-time breakdowns for a fresh worker process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='Runs to take the median of.')
+        parser.add_argument('--top', type=int, default=15, help='Packages to list by import time.')
+        parser.add_argument('--no-database', action='store_true',
+                            help='Skip the database connection, worker warmup and requests.')
+        parser.add_argument('--no-warmup', action='store_true',
+                            help='Measure a cold worker: first requests pay for routes, DRF and connections.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+
+    def run_once(self, with_database, warm, host):
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE,
+            'PYTHONPATH': os.pathsep.join(filter(None, sys.path)),
+        }
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT,
+             '1' if with_database else '0', '1' if warm else '0', host],
+            capture_output=True, text=True, env=env, cwd=settings.BASE_DIR,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f'Startup run failed:\n{completed.stderr[-2000:]}')
+        return json.loads(completed.stdout.strip().splitlines()[-1]), parse_import_times(completed.stderr)
+
+    def handle(self, *args, repeat, top, no_database, no_warmup, output, **options):
+        host = next((host for host in settings.ALLOWED_HOSTS if not host.startswith('.') and host != '*'), 'localhost')
+        runs = [self.run_once(not no_database, not no_warmup, host) for _ in range(max(repeat, 1))]
+        phases = {name: round(statistics.median(run[0][name] for run in runs), 3) for name in runs[0][0]}
+        packages = {
+            name: round(statistics.median(run[1].get(name, 0.0) for run in runs), 3)
+            for name in runs[0][1]
+        }
+
+        self.stdout.write(f'{"startup phase":<44}{"ms":>10}')
+        for name, value in phases.items():
+            self.stdout.write(f'{name:<44}{value:>10}')
+        self.stdout.write(f'{"total":<44}{round(sum(phases.values()), 3):>10}')
+        self.stdout.write('')
+        self.stdout.write(f'{"package (self import time)":<44}{"ms":>10}')
+        for name, value in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f'{name:<44}{value:>10}')
+        self.stdout.write(f'{"all imports":<44}{round(sum(packages.values()), 3):>10}')
+
+        if output:
+            with open(output, 'w') as out:
+                json.dump({'phases': phases, 'imports': packages}, out, indent=2)
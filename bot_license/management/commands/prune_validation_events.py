@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bot_license.events import prune_events
+
+
+class Command(BaseCommand):
+    help = 'Delete validation events older than the retention window.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=settings.VALIDATION_EVENTS['PRUNE_INTERVAL'])
+
+    def handle(self, *args, loop, interval, **options):
+        while True:
+            deleted = prune_events()
+            self.stdout.write(f'Validation event pruning: {deleted} event(s) deleted.')
+            if not loop:
+                return
+            time.sleep(interval)
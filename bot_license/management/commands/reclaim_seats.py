@@ -0,0 +1,22 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bot_license.seats import reclaim_stale_seats
+
+
+class Command(BaseCommand):
+    help = 'Release license seats whose EAs stopped sending heartbeats.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=settings.LICENSE_SEATS['INTERVAL'])
+
+    def handle(self, *args, loop, interval, **options):
+        while True:
+            reclaimed = reclaim_stale_seats()
+            self.stdout.write(f'Seat reclaim: {reclaimed} stale seat(s) released.')
+            if not loop:
+                return
+            time.sleep(interval)
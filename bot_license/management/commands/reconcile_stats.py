@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bot_license.stats import reconcile_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard license counters, picking up licenses that expired since the last run.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=300)
+
+    def handle(self, *args, loop, interval, **options):
+        while True:
+            changed = reconcile_stats()
+            self.stdout.write(f'Reconciled license stats: {changed} product(s) updated.')
+            if not loop:
+                return
+            time.sleep(interval)
@@ -0,0 +1,23 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bot_license.expiry import sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Deactivate active licenses whose expiry has passed, in bounded chunks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep running every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=settings.EXPIRY_SWEEP['INTERVAL'])
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPIRY_SWEEP['CHUNK_SIZE'])
+
+    def handle(self, *args, loop, interval, chunk_size, **options):
+        while True:
+            deactivated = sweep_expired(chunk_size=chunk_size)
+            self.stdout.write(f'Expiry sweep: {deactivated} license(s) deactivated.')
+            if not loop:
+                return
+            time.sleep(interval)
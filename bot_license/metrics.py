@@ -0,0 +1,305 @@
+"""
+Per-route request metrics in Prometheus text format.
+
+``MetricsMiddleware`` times every request and tags it with the matched URL
+route. Database work is attributed through a query wrapper installed on each
+new connection, which reads the current request's counters from a context
+variable, so queries issued from ``sync_to_async`` threads under ASGI are
+counted as well.
+
+The registry lives in each worker process, and a scrape is answered by
+whichever worker accepts it, so one scrape covers one worker. Every scrape
+carries ``licenser_worker_info{pid=...}`` and the worker's start time, so
+scrape each worker (for example on a per-worker port or through service
+discovery) and sum the series across ``pid``. Restarted workers show up as new
+pids rather than as counter resets.
+
+``/metrics/`` is not public. ``scrape_allowed`` requires
+``Authorization: Bearer <METRICS['TOKEN']>`` when a token is configured, and
+otherwise only answers private and loopback client addresses.
+"""
+import hmac
+import ipaddress
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connection, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .cache import license_cache
+from .events import event_buffer
+from .keyfilter import key_filter
+from .licensetable import license_table
+from .throttling import client_ip, validation_throttle
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+_request_queries = ContextVar('bot_license_request_queries', default=None)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.latency = {}
+        self.query_counts = {}
+        self.query_seconds = defaultdict(float)
+        self.gauges = {}
+
+    def record(self, route, method, status, seconds, queries, query_seconds):
+        with self._lock:
+            self.requests[(route, method, status)] += 1
+            key = (route, method)
+            if key not in self.latency:
+                self.latency[key] = Histogram(LATENCY_BUCKETS)
+                self.query_counts[key] = Histogram(QUERY_COUNT_BUCKETS)
+            self.latency[key].observe(seconds)
+            self.query_counts[key].observe(queries)
+            self.query_seconds[key] += query_seconds
+
+    def register_gauges(self, name, collect):
+        """Register ``collect() -> {metric_name: value}`` to be sampled at scrape time."""
+        self.gauges[name] = collect
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+            self.latency.clear()
+            self.query_counts.clear()
+            self.query_seconds.clear()
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append('# TYPE licenser_http_requests_total counter')
+            for (route, method, status), value in sorted(self.requests.items()):
+                lines.append(f'licenser_http_requests_total{{route="{route}",method="{method}",status="{status}"}} {value}')
+
+            for name, histograms, help_type in (
+                ('licenser_http_request_duration_seconds', self.latency, 'histogram'),
+                ('licenser_db_queries_per_request', self.query_counts, 'histogram'),
+            ):
+                lines.append(f'# TYPE {name} {help_type}')
+                for (route, method), histogram in sorted(histograms.items()):
+                    labels = f'route="{route}",method="{method}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{labels}}} {round(histogram.total, 6)}')
+                    lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+
+            lines.append('# TYPE licenser_db_query_duration_seconds_total counter')
+            for (route, method), value in sorted(self.query_seconds.items()):
+                lines.append(f'licenser_db_query_duration_seconds_total{{route="{route}",method="{method}"}} {round(value, 6)}')
+
+        typed = set()
+        for collect in list(self.gauges.values()):
+            for metric, value in collect().items():
+                name = metric.split('{', 1)[0]
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{metric} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def scrape_allowed(request):
+    """Whether ``request`` may read ``/metrics/``: the configured bearer token, or a private address without one."""
+    token = getattr(settings, 'METRICS', {}).get('TOKEN')
+    if token:
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        return scheme.lower() == 'bearer' and hmac.compare_digest(credentials.encode(), token.encode())
+    address = client_ip(request)
+    if address is None:
+        return False
+    address = ipaddress.ip_address(address)
+    return address.is_private or address.is_loopback
+
+
+_worker_started = time.time()
+
+
+def _worker_forked():
+    # Preloaded workers import this module in the master; start from the fork.
+    global _worker_started
+    _worker_started = time.time()
+
+
+os.register_at_fork(after_in_child=_worker_forked)
+
+registry = MetricsRegistry()
+registry.register_gauges('worker', lambda: {
+    f'licenser_worker_info{{pid="{os.getpid()}"}}': 1,
+    'licenser_worker_start_time_seconds': round(_worker_started, 3),
+})
+registry.register_gauges('license_cache', lambda: {
+    f'licenser_license_cache_{name}': value
+    for name, value in license_cache.stats().items()
+    if isinstance(value, (int, float))
+})
+registry.register_gauges('validation_events', lambda: {
+    f'licenser_validation_events_{name}': value for name, value in event_buffer.stats().items()
+})
+registry.register_gauges('key_filter', lambda: {
+    f'licenser_key_filter_{name}': int(value) if isinstance(value, bool) else value
+    for name, value in key_filter.stats().items()
+})
+registry.register_gauges('license_table', lambda: {
+    f'licenser_license_table_{name}': int(value) if isinstance(value, bool) else value
+    for name, value in license_table.stats().items()
+    if isinstance(value, (int, float))
+})
+registry.register_gauges('db_pool', lambda: {
+    f'licenser_db_pool_{name}{{alias="{alias}"}}': value
+    for alias, stats in pool_stats().items()
+    for name, value in stats.items()
+})
+registry.register_gauges('throttle', lambda: {
+    'licenser_validation_throttled_total': validation_throttle.throttled,
+})
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _request_queries.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats[0] += 1
+        stats[1] += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+def _route(request):
+    # Requests answered by bot_license.fastpath never reach URL resolution.
+    route = getattr(request, 'metrics_route', None)
+    if route is not None:
+        return route
+    match = getattr(request, 'resolver_match', None)
+    return match.route if match is not None else 'unmatched'
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # Connections opened before this middleware was built (e.g. during
+        # startup checks) did not go through connection_created.
+        if connection.connection is not None:
+            install_query_recorder(None, connection)
+
+    def _finish(self, request, response, started, stats, token):
+        _request_queries.reset(token)
+        registry.record(
+            _route(request), request.method, response.status_code,
+            time.perf_counter() - started, stats[0], stats[1],
+        )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = [0, 0.0]
+        token = _request_queries.set(stats)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        return self._finish(request, response, started, stats, token)
+
+    async def __acall__(self, request):
+        stats = [0, 0.0]
+        token = _request_queries.set(stats)
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        return self._finish(request, response, started, stats, token)
+
+
+def pool_stats():
+    """
+    ``{alias: stats}`` for every alias with a connection pool in this process.
+
+    ``checkouts`` and ``wait_ms`` are totals since the pool opened;
+    ``saturation`` is the fraction of ``max_size`` currently checked out.
+    """
+    pools = {}
+    for alias in connections:
+        if 'pool' not in connections.settings[alias].get('OPTIONS', {}):
+            continue
+        pool = connections[alias].pool
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        size, available = stats.get('pool_size', 0), stats.get('pool_available', 0)
+        pools[alias] = {
+            'min_size': stats.get('pool_min', 0),
+            'max_size': stats.get('pool_max', 0),
+            'size': size,
+            'available': available,
+            'waiting': stats.get('requests_waiting', 0),
+            'checkouts': stats.get('requests_num', 0),
+            'queued': stats.get('requests_queued', 0),
+            'wait_ms': stats.get('requests_wait_ms', 0),
+            'timeouts': stats.get('requests_errors', 0),
+            'bad_returns': stats.get('returns_bad', 0),
+            'connections_opened': stats.get('connections_num', 0),
+            'connection_errors': stats.get('connections_errors', 0),
+            'saturation': round((size - available) / stats['pool_max'], 4) if stats.get('pool_max') else 0,
+        }
+    return pools
+
+
+def check_database(using='default'):
+    """Time acquiring a connection and running ``SELECT 1``; never raises."""
+    conn = connections[using]
+    started = time.perf_counter()
+    try:
+        conn.ensure_connection()
+        connected = time.perf_counter()
+        with conn.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+    except Exception as exc:
+        return {'status': 'unavailable', 'error': exc.__class__.__name__}
+    finished = time.perf_counter()
+    return {
+        'status': 'ok',
+        'connect_ms': round((connected - started) * 1000, 3),
+        'query_ms': round((finished - connected) * 1000, 3),
+    }
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.utils import timezone
+
+
+def backfill_license_stats(apps, schema_editor):
+    BotLicense = apps.get_model('bot_license', 'BotLicense')
+    LicenseStats = apps.get_model('bot_license', 'LicenseStats')
+    Product = apps.get_model('bot_license', 'Product')
+
+    counts = {
+        row['product_id']: row
+        for row in BotLicense.objects.values('product_id').annotate(
+            total=Count('id'),
+            active=Count('id', filter=Q(is_active=True)),
+            expired=Count('id', filter=Q(expires_at__lt=timezone.now())),
+        )
+    }
+    empty = {'total': 0, 'active': 0, 'expired': 0}
+    LicenseStats.objects.bulk_create([
+        LicenseStats(
+            product_id=product_id,
+            total_licenses=counts.get(product_id, empty)['total'],
+            active_licenses=counts.get(product_id, empty)['active'],
+            expired_licenses=counts.get(product_id, empty)['expired'],
+        )
+        for product_id in Product.objects.values_list('id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_license', '0006_keyallocator'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LicenseStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='license_stats', serialize=False, to='bot_license.product')),
+                ('total_licenses', models.IntegerField(default=0)),
+                ('active_licenses', models.IntegerField(default=0)),
+                ('expired_licenses', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(backfill_license_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_license', '0007_licensestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ValidationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('license_key', models.CharField(max_length=9)),
+                ('account_id', models.CharField(blank=True, default='', max_length=25)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('endpoint', models.CharField(max_length=30)),
+                ('status_code', models.PositiveSmallIntegerField()),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['license_key', 'created_at'], name='bot_license_license_ee961b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_license', '0008_validationevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirySweep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('deactivated', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='botlicense',
+            index=models.Index(fields=['expires_at'], name='bot_license_expires_78d8c7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='botlicense',
+            index=models.Index(fields=['is_active', 'expires_at'], name='bot_license_is_acti_bb5059_idx'),
+        ),
+    ]
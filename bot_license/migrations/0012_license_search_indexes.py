@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_license', '0011_changeevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='botlicense',
+            index=models.Index(fields=['license_key'], name='license_key_pattern_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='botlicense',
+            index=models.Index(fields=['account_id'], name='license_account_pattern_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:01
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_license', '0013_licenseimport'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='botlicense',
+            name='max_seats',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='botlicense',
+            name='seats_used',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='LicenseActivation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('account_id', models.CharField(max_length=25)),
+                ('activated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('heartbeat_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('license', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activations', to='bot_license.botlicense')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['heartbeat_at'], name='bot_license_heartbe_cd7528_idx')],
+                'constraints': [models.UniqueConstraint(fields=('license', 'account_id'), name='unique_license_activation')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_license', '0014_license_seats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='licenseimport',
+            name='runner',
+            field=models.CharField(blank=True, default='', max_length=32),
+        ),
+    ]
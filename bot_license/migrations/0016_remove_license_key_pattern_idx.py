@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:35
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bot_license', '0015_licenseimport_runner'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='botlicense',
+            name='license_key_pattern_idx',
+        ),
+    ]
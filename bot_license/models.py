@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 
@@ -11,6 +12,13 @@ class Product(models.Model):
     version = models.CharField(max_length=20, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True, null=True, blank=True)
 
+class KeyAllocator(models.Model):
+    """Position of the license key allocator in its permutation of the key space."""
+    name = models.CharField(max_length=50, unique=True)
+    next_index = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
 class BotLicense(models.Model):
     license_key = models.CharField(max_length=9, unique=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -18,9 +26,125 @@ class BotLicense(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     expires_at = models.DateTimeField(null=True, blank=True)
+    # 0 binds the license to account_id. A positive limit lets it run on that
+    # many accounts, each holding a LicenseActivation (see bot_license.seats).
+    max_seats = models.PositiveIntegerField(default=0)
+    seats_used = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at']),
+            models.Index(fields=['is_active', 'expires_at']),
+            # Prefix (LIKE 'x%') and exact lookups for bot_license.search. The
+            # unique license_key already gets a varchar_pattern_ops "_like"
+            # index from Django's PostgreSQL backend.
+            models.Index(fields=['account_id'], name='license_account_pattern_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the values as loaded so signal handlers can see what changed.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def expired(self):
         return self.expires_at and self.expires_at < timezone.now()
 
+    @property
+    def seat_limited(self):
+        return self.max_seats > 0
+
     def __str__(self):
-        return f"License {self.license_key} for Product {self.product.name}"
\ No newline at end of file
+        return f"License {self.license_key} for Product {self.product.name}"
+
+
+class LicenseActivation(models.Model):
+    """An account holding one seat of a seat-limited license; claimed and released by ``bot_license.seats``."""
+    license = models.ForeignKey(BotLicense, on_delete=models.CASCADE, related_name='activations')
+    account_id = models.CharField(max_length=25)
+    activated_at = models.DateTimeField(default=timezone.now)
+    heartbeat_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['license', 'account_id'], name='unique_license_activation'),
+        ]
+        indexes = [
+            models.Index(fields=['heartbeat_at']),
+        ]
+
+
+class ExpirySweep(models.Model):
+    """The last license ``bot_license.expiry.sweep_expired`` deactivated, and how many it has deactivated in total."""
+    name = models.CharField(max_length=50, unique=True)
+    last_expires_at = models.DateTimeField(null=True, blank=True)
+    last_id = models.BigIntegerField(default=0)
+    deactivated = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class TableVersion(models.Model):
+    """Change counter for a group of tables, bumped by ``bot_license.versions`` for conditional GETs."""
+    name = models.CharField(max_length=50, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+
+class LicenseStats(models.Model):
+    """Running license counters for one product, maintained by ``bot_license.stats``."""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='license_stats')
+    total_licenses = models.IntegerField(default=0)
+    active_licenses = models.IntegerField(default=0)
+    expired_licenses = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+
+class ValidationEvent(models.Model):
+    """One license validation, written in batches by ``bot_license.events``."""
+    license_key = models.CharField(max_length=9)
+    account_id = models.CharField(max_length=25, blank=True, default='')
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    endpoint = models.CharField(max_length=30)
+    status_code = models.PositiveSmallIntegerField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['license_key', 'created_at']),
+        ]
+
+
+class ChangeEvent(models.Model):
+    """One license or product change in the change feed; ``id`` is its sequence number."""
+    kind = models.CharField(max_length=10)
+    action = models.CharField(max_length=10)
+    object_id = models.BigIntegerField()
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+
+class LicenseImport(models.Model):
+    """A CSV of licenses being loaded by ``bot_license.imports``; ``processed_rows`` is the resume point."""
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (COMPLETED, 'Completed'), (FAILED, 'Failed')]
+
+    filename = models.CharField(max_length=255, blank=True, default='')
+    source = models.BinaryField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    created_licenses = models.IntegerField(default=0)
+    failed_rows = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    detail = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Token of the runner that last claimed the job; only it may advance or finish it.
+    runner = models.CharField(max_length=32, blank=True, default='')
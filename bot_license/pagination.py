@@ -0,0 +1,63 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination
+
+
+class LicenseCursorPagination(CursorPagination):
+    """
+    Keyset pagination for license listings.
+
+    Pages are addressed by an opaque cursor over the primary key (which grows
+    with ``created_at``), so fetching a page is a single indexed range scan no
+    matter how deep the client has paged and no ``COUNT(*)`` is issued.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    ordering = '-id'
+
+
+class ExpiryCursorPagination(LicenseCursorPagination):
+    """Keyset pagination in expiry order, for the expiring-soon listing."""
+    ordering = ('expires_at', 'id')
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Admin changelist paginator that avoids ``COUNT(*)`` over large tables.
+
+    An unfiltered changelist uses the planner's row estimate from
+    ``pg_class.reltuples`` once the table is larger than ``exact_below``.
+    Filtered or searched changelists count at most ``limit`` rows, so a broad
+    filter costs a bounded scan and the last pages beyond ``limit`` are simply
+    not offered. Other databases, and small tables, get an exact count.
+    """
+    exact_below = 100000
+    limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        if queryset.query.where:
+            return queryset.order_by()[:self.limit].count()
+        estimate = self.estimate(queryset)
+        if estimate is not None and estimate >= self.exact_below:
+            return estimate
+        return queryset.count()
+
+    @staticmethod
+    def estimate(queryset):
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        return row[0] if row and row[0] > 0 else None
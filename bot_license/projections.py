@@ -0,0 +1,128 @@
+"""
+Read-only fast path for the license and product read endpoints.
+
+``LicenseSerializer`` and ``ProductSerializer`` walk their fields for every
+row, resolve attributes through ``source`` lookups, and build a nested
+serializer for each license's product. The listing, details, products and
+dashboard views instead build the same dicts straight from ``values()``
+rows. Each license's product comes from ``product_table``, an in-process map
+of serialized products keyed by the ``products`` table version, which the
+conditional-GET decorator has usually read for the request already.
+
+The output has the same keys, order and values as the serializers. That
+includes DRF's ISO 8601 datetimes in the current timezone with ``Z`` for
+UTC. ``tests.ProjectionTests`` compares the two byte for byte.
+"""
+import hashlib
+import threading
+
+from django.utils import timezone
+
+from .models import BotLicense, Product
+from .versions import PRODUCTS, current
+
+
+PRODUCT_FIELDS = ('id', 'name', 'description', 'version', 'created_at')
+LICENSE_FIELDS = (
+    'id', 'license_key', 'product_id', 'account_id', 'is_active', 'created_at', 'expires_at', 'max_seats', 'seats_used',
+)
+
+
+def format_datetime(value):
+    """``serializers.DateTimeField().to_representation`` for the default ISO 8601 format."""
+    if not value:
+        return None
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def product_row(row):
+    """Serialized product from a ``values(*PRODUCT_FIELDS)`` dict or a ``Product`` instance."""
+    get = row.get if isinstance(row, dict) else (lambda name: getattr(row, name))
+    return {
+        'id': get('id'),
+        'name': get('name'),
+        'description': get('description'),
+        'version': get('version'),
+        'created_at': format_datetime(get('created_at')),
+    }
+
+
+def product_rows(queryset=None):
+    queryset = Product.objects.all() if queryset is None else queryset
+    return [product_row(row) for row in queryset.values(*PRODUCT_FIELDS)]
+
+
+class ProductTable:
+    """Serialized products by id, reloaded when the ``products`` version moves or an id is missing."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._version = None
+            self._products = {}
+            self.loads = 0
+
+    def _load(self, version):
+        products = {product['id']: product for product in product_rows()}
+        with self._lock:
+            self._version, self._products = version, products
+            self.loads += 1
+        return products
+
+    def products(self, version):
+        products = self._products
+        if version != self._version:
+            products = self._load(version)
+        return products
+
+    def lookup(self, version, product_ids):
+        """``{product_id: product}`` covering ``product_ids``; reloads once for ids created without a version bump."""
+        products = self.products(version)
+        if not products.keys() >= set(product_ids):
+            products = self._load(version)
+        return products
+
+
+product_table = ProductTable()
+
+
+def products_version(request):
+    """The ``products`` version for this request, reusing what ``conditional`` already read."""
+    return current(request, (PRODUCTS,))[PRODUCTS][0] if request is not None else None
+
+
+def license_rows(queryset, request=None):
+    """Serialized licenses from ``queryset`` (or a list of ``values(*LICENSE_FIELDS)`` dicts)."""
+    rows = list(queryset.values(*LICENSE_FIELDS)) if hasattr(queryset, 'values') else list(queryset)
+    products = product_table.lookup(products_version(request), {row['product_id'] for row in rows})
+    return [
+        {
+            'id': row['id'],
+            'license_key': row['license_key'],
+            'product': products.get(row['product_id']),
+            'account_id': row['account_id'],
+            'is_active': row['is_active'],
+            'created_at': format_datetime(row['created_at']),
+            'expires_at': format_datetime(row['expires_at']),
+            'max_seats': row['max_seats'],
+            'seats_used': row['seats_used'],
+        }
+        for row in rows
+    ]
+
+
+def license_etag(row, products_version):
+    """ETag for one license: a hash of its ``values(*LICENSE_FIELDS)`` row and the ``products`` version."""
+    digest = hashlib.blake2b(repr([row[field] for field in LICENSE_FIELDS]).encode(), digest_size=8).hexdigest()
+    return f'{digest}-{products_version}'
+
+
+def license_values(queryset=None):
+    """``queryset`` as the ``values()`` projection ``license_rows`` reads."""
+    return (BotLicense.objects.all() if queryset is None else queryset).values(*LICENSE_FIELDS)
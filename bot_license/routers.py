@@ -0,0 +1,130 @@
+"""
+Read-replica routing.
+
+Views that only read, such as validation, details, listings and the
+dashboard, opt in with ``use_replicas``. Inside them, ``ReplicaRouter`` sends
+reads to one healthy alias from ``settings.DATABASE_REPLICAS``, picked once
+per request. Everything else reads from the primary. The first write in an
+opted-in request pins the rest of that request to the primary, so it reads
+its own writes.
+
+Replica health is checked with ``SELECT 1`` at most once per
+``REPLICA_HEALTH['CHECK_INTERVAL']`` seconds per alias. An unreachable
+replica is skipped until a later check succeeds, and with no healthy replica
+reads fall back to the primary.
+
+Replicas lag the primary, so a snapshot loaded into ``license_cache`` right
+after a write may be the old row; it is bounded by the cache TTL like any
+other cross-worker staleness.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from .metrics import check_database
+
+
+_state = ContextVar('bot_license_replica_state', default=None)
+
+
+class ReplicaHealth:
+
+    def __init__(self, check_interval=10.0):
+        self.check_interval = check_interval
+        self._status = {}
+        self._lock = threading.Lock()
+        self.failovers = 0
+
+    def healthy(self, alias, now=None):
+        now = time.monotonic() if now is None else now
+        status = self._status.get(alias)
+        if status is None or now - status[1] >= self.check_interval:
+            try:
+                healthy = check_database(alias)['status'] == 'ok'
+            except Exception:
+                healthy = False
+            with self._lock:
+                self._status[alias] = (healthy, now)
+            return healthy
+        return status[0]
+
+    def mark(self, alias, healthy, now=None):
+        with self._lock:
+            self._status[alias] = (healthy, time.monotonic() if now is None else now)
+
+    def reset(self):
+        with self._lock:
+            self._status.clear()
+            self.failovers = 0
+
+    def stats(self):
+        return {
+            'replicas': {alias: self._status.get(alias, (None, None))[0] for alias in settings.DATABASE_REPLICAS},
+            'failovers': self.failovers,
+        }
+
+
+def _build_health():
+    config = getattr(settings, 'REPLICA_HEALTH', {})
+    return ReplicaHealth(check_interval=config.get('CHECK_INTERVAL', 10.0))
+
+
+replica_health = _build_health()
+
+
+@contextmanager
+def replica_reads():
+    """Let reads in this block go to a replica until the first write."""
+    token = _state.set({'alias': None, 'pinned': False})
+    try:
+        yield
+    finally:
+        _state.reset(token)
+
+
+def use_replicas(view):
+    """Decorator running a (sync or async) view inside ``replica_reads``."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            with replica_reads():
+                return await view(*args, **kwargs)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        with replica_reads():
+            return view(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state['pinned'] or not settings.DATABASE_REPLICAS:
+            return DEFAULT_DB_ALIAS
+        if state['alias'] is None:
+            healthy = [alias for alias in settings.DATABASE_REPLICAS if replica_health.healthy(alias)]
+            if healthy:
+                state['alias'] = random.choice(healthy)
+            else:
+                replica_health.failovers += 1
+                state['alias'] = DEFAULT_DB_ALIAS
+        return state['alias']
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state['pinned'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
@@ -0,0 +1,55 @@
+"""
+Exact and prefix license search on ``license_key`` and ``account_id``.
+
+Lookups are written so that an index can serve them:
+
+* keys are upper-cased here and matched case-sensitively, because
+  ``iexact``/``istartswith`` wrap the column in ``UPPER()`` and bypass the
+  index;
+* prefixes use ``startswith`` (``LIKE 'x%'``), which PostgreSQL can only
+  answer from a ``varchar_pattern_ops`` index when the database collation
+  is not ``C``. Both columns have such an index (for the unique
+  ``license_key``, the ``_like`` index Django's PostgreSQL backend adds),
+  and it serves equality too.
+
+Staff often type only the random part of a key, so ``AB`` is searched as
+``TXCT-AB``.
+"""
+from django.db.models import Q
+
+from .models import BotLicense
+from .utils import KEY_PREFIX
+
+
+LICENSE_KEY = 'license_key'
+ACCOUNT_ID = 'account_id'
+FIELDS = (LICENSE_KEY, ACCOUNT_ID)
+EXACT = 'exact'
+PREFIX = 'prefix'
+MATCHES = (EXACT, PREFIX)
+
+
+def normalize_key(query):
+    query = query.strip().upper()
+    if not query.startswith(KEY_PREFIX) and not KEY_PREFIX.startswith(query):
+        query = KEY_PREFIX + query
+    return query
+
+
+def search_filter(query, fields=FIELDS, match=PREFIX):
+    """A ``Q`` matching ``query`` against ``fields``; ``None`` for an empty query."""
+    query = query.strip()
+    if not query:
+        return None
+    lookup = 'exact' if match == EXACT else 'startswith'
+    condition = Q()
+    for field in fields:
+        value = normalize_key(query) if field == LICENSE_KEY else query
+        condition |= Q(**{f'{field}__{lookup}': value})
+    return condition
+
+
+def search_licenses(query, fields=FIELDS, match=PREFIX, queryset=None):
+    queryset = BotLicense.objects.all() if queryset is None else queryset
+    condition = search_filter(query, fields, match)
+    return queryset.none() if condition is None else queryset.filter(condition)
@@ -0,0 +1,201 @@
+"""
+Seat-limited activations.
+
+A license with ``max_seats`` > 0 runs on up to that many accounts at once.
+Each account holds its seat as a ``LicenseActivation`` row, unique per
+``(license, account_id)``, and ``BotLicense.seats_used`` counts those rows.
+
+Seats are claimed with one conditional statement:
+
+    UPDATE ... SET seats_used = seats_used + 1 WHERE id = %s AND seats_used < max_seats
+
+It holds the license row lock only until the claim's short transaction
+commits, and the counter can never pass the limit. Hundreds of EAs starting
+at once therefore get exactly ``max_seats`` seats between them without a
+read-modify-write. The activation row is inserted in the same transaction. If
+the same account won a seat in a concurrent request, the unique constraint
+rejects the insert and the extra seat is given back. Every path locks the
+license row before touching its activations, so claims, releases and reclaims
+cannot deadlock each other.
+
+EAs keep their seat by validating. ``has_seat`` is one indexed lookup and
+refreshes ``heartbeat_at`` at most every ``HEARTBEAT_INTERVAL`` seconds. A
+seat whose heartbeat is older than ``STALE_AFTER`` seconds belongs to an EA
+that stopped. When a license is full, the next account that activates takes
+over such a seat, and ``manage.py reclaim_seats`` releases them in bulk.
+Seats are read from the primary, so an EA is seated as soon as its activation
+commits.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BotLicense, LicenseActivation
+
+
+class SeatError(Exception):
+    pass
+
+
+def _config():
+    return getattr(settings, 'LICENSE_SEATS', {})
+
+
+def _stale_before(now):
+    return now - timedelta(seconds=_config().get('STALE_AFTER', 900))
+
+
+def _heartbeat_before(now):
+    return now - timedelta(seconds=_config().get('HEARTBEAT_INTERVAL', 60))
+
+
+def _lock_license(license_id):
+    return BotLicense.objects.select_for_update().filter(pk=license_id).values_list('pk', flat=True).first()
+
+
+def _add_seats(license_id, delta, below_limit=False):
+    """``seats_used += delta`` in one statement; the new count, or ``None`` if no row matched."""
+    connection = connections[router.db_for_write(BotLicense)]
+    if not connection.features.can_return_columns_from_insert:
+        # No UPDATE ... RETURNING on this backend.
+        licenses = BotLicense.objects.filter(pk=license_id)
+        if below_limit:
+            licenses = licenses.filter(seats_used__lt=F('max_seats'))
+        if not licenses.update(seats_used=F('seats_used') + delta):
+            return None
+        return BotLicense.objects.filter(pk=license_id).values_list('seats_used', flat=True).first()
+    sql = 'UPDATE {} SET seats_used = seats_used + %s WHERE id = %s'.format(
+        connection.ops.quote_name(BotLicense._meta.db_table),
+    )
+    if below_limit:
+        sql += ' AND seats_used < max_seats'
+    with connection.cursor() as cursor:
+        cursor.execute(sql + ' RETURNING seats_used', [delta, license_id])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _claim(license_id):
+    return _add_seats(license_id, 1, below_limit=True)
+
+
+def _take_stale_seat(license_id, now):
+    """Delete one stale activation of the license, whose seat passes to the caller."""
+    stale = LicenseActivation.objects.filter(license_id=license_id, heartbeat_at__lt=_stale_before(now))
+    for pk in stale.order_by('heartbeat_at').values_list('pk', flat=True)[:5]:
+        # A concurrent reclaim may have deleted it already.
+        if stale.filter(pk=pk).delete()[0]:
+            return True
+    return False
+
+
+def activate_seat(license, account_id, now=None):
+    """
+    Give ``account_id`` a seat of ``license``; returns ``(claimed, seats_used)``.
+
+    An account that already holds a seat keeps it and only refreshes its
+    heartbeat; ``seats_used`` is then ``license.seats_used`` as loaded. Raises
+    ``SeatError`` when every seat belongs to a live EA and
+    ``BotLicense.DoesNotExist`` if the license has been deleted.
+    """
+    now = now or timezone.now()
+    held = LicenseActivation.objects.filter(license_id=license.pk, account_id=account_id)
+    if held.update(heartbeat_at=now):
+        return False, license.seats_used
+
+    with transaction.atomic():
+        seats_used = _claim(license.pk)
+        if seats_used is None:
+            # Full: lock the license and retry, in case a seat was released,
+            # before taking over one whose EA stopped sending heartbeats.
+            if _lock_license(license.pk) is None:
+                raise BotLicense.DoesNotExist
+            seats_used = _claim(license.pk)
+            if seats_used is None:
+                if not _take_stale_seat(license.pk, now):
+                    raise SeatError(f'All {license.max_seats} seats of this license are in use.')
+                # A seat taken over leaves the count where it was, at the limit.
+                seats_used = license.max_seats
+        try:
+            with transaction.atomic():
+                LicenseActivation.objects.create(
+                    license_id=license.pk, account_id=account_id, activated_at=now, heartbeat_at=now,
+                )
+        except IntegrityError:
+            # The account was seated by a concurrent request; give this seat back.
+            seats_used = _add_seats(license.pk, -1)
+            held.update(heartbeat_at=now)
+            return False, seats_used
+    return True, seats_used
+
+
+def release_seat(license, account_id):
+    """Free the seat ``account_id`` holds on ``license``; the new ``seats_used``, or ``None`` if it held none."""
+    with transaction.atomic():
+        _lock_license(license.pk)
+        released = LicenseActivation.objects.filter(license_id=license.pk, account_id=account_id).delete()[0]
+        return _add_seats(license.pk, -released) if released else None
+
+
+def reclaim_stale_seats(now=None):
+    """Release every seat whose heartbeat is older than ``STALE_AFTER``; returns how many were released."""
+    now = now or timezone.now()
+    stale_before = _stale_before(now)
+    license_ids = list(
+        LicenseActivation.objects.filter(heartbeat_at__lt=stale_before)
+        .values_list('license_id', flat=True).distinct()
+    )
+    reclaimed = 0
+    for license_id in license_ids:
+        with transaction.atomic():
+            _lock_license(license_id)
+            released = LicenseActivation.objects.filter(
+                license_id=license_id, heartbeat_at__lt=stale_before,
+            ).delete()[0]
+            if released:
+                BotLicense.objects.filter(pk=license_id).update(seats_used=F('seats_used') - released)
+        reclaimed += released
+    return reclaimed
+
+
+def has_seat(license_key, account_id, now=None):
+    """Whether ``account_id`` holds a seat of the license, refreshing its heartbeat when due."""
+    now = now or timezone.now()
+    activations = LicenseActivation.objects.using(DEFAULT_DB_ALIAS)
+    row = activations.filter(
+        license__license_key=license_key, account_id=account_id,
+    ).values_list('pk', 'heartbeat_at').first()
+    if row is None:
+        return False
+    if row[1] >= _heartbeat_before(now):
+        return True
+    # Zero rows means the seat was reclaimed since the lookup.
+    return bool(activations.filter(pk=row[0]).update(heartbeat_at=now))
+
+
+def seated_pairs(pairs, now=None):
+    """The ``(license_key, account_id)`` pairs from ``pairs`` that hold a seat, in one query."""
+    pairs = {
+        (key, account) for key, account in pairs if isinstance(key, str) and isinstance(account, str) and account
+    }
+    if not pairs:
+        return set()
+    now = now or timezone.now()
+    activations = LicenseActivation.objects.using(DEFAULT_DB_ALIAS)
+    rows = activations.filter(
+        license__license_key__in={key for key, _ in pairs},
+        account_id__in={account for _, account in pairs},
+    ).values_list('pk', 'license__license_key', 'account_id', 'heartbeat_at')
+    seated, due = set(), []
+    heartbeat_before = _heartbeat_before(now)
+    for pk, license_key, account_id, heartbeat_at in rows:
+        if (license_key, account_id) in pairs:
+            seated.add((license_key, account_id))
+            if heartbeat_at < heartbeat_before:
+                due.append(pk)
+    if due:
+        activations.filter(pk__in=due).update(heartbeat_at=now)
+    return seated
@@ -28,8 +28,8 @@ class LicenseSerializer(serializers.ModelSerializer):
     class Meta:
         model = BotLicense
         fields = ['id', 'license_key', 'product', 'product_id', 'account_id', 
-                  'is_active', 'created_at', 'expires_at', 'expiry_date']
-        read_only_fields = ['id', 'license_key', 'created_at', 'is_active']
+                  'is_active', 'created_at', 'expires_at', 'expiry_date', 'max_seats', 'seats_used']
+        read_only_fields = ['id', 'license_key', 'created_at', 'is_active', 'seats_used']
         extra_kwargs = {
             'expires_at': {'read_only': True}
         }
@@ -0,0 +1,121 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from . import changes
+from .cache import license_cache
+from .keyfilter import key_filter
+from .models import BotLicense, LicenseStats, Product
+from .versions import LICENSE_STATS, LICENSES, PRODUCTS, bump
+from .stats import apply_transitions, license_state
+
+
+def _affected_keys(instance):
+    loaded = getattr(instance, '_loaded_values', {})
+    return {instance.license_key, loaded.get('license_key')}
+
+
+@receiver(post_save, sender=BotLicense)
+@receiver(post_delete, sender=BotLicense)
+def invalidate_license_cache(sender, instance, **kwargs):
+    keys = _affected_keys(instance)
+    license_cache.invalidate(*keys)
+    if kwargs['signal'] is post_save:
+        key_filter.add(instance.license_key)
+    # A concurrent reader may re-cache the old row before this transaction
+    # commits, so drop the keys once more after commit.
+    transaction.on_commit(lambda: license_cache.invalidate(*keys))
+
+
+def _stored_state(instance):
+    row = BotLicense.objects.filter(pk=instance.pk).values_list('product_id', 'is_active', 'expires_at').first()
+    return license_state(*row) if row else None
+
+
+@receiver(pre_save, sender=BotLicense)
+@receiver(pre_delete, sender=BotLicense)
+def remember_license_state(sender, instance, **kwargs):
+    # Read the stored row rather than trusting the instance, which may be
+    # stale if another request changed the license since it was loaded,
+    # unless the caller loaded it under a row lock (see ``lock_license_state``).
+    locked = instance.__dict__.pop('_locked_state', None)
+    if locked is not None:
+        instance._stats_state = locked
+    else:
+        instance._stats_state = _stored_state(instance) if instance.pk is not None else None
+
+
+def lock_license_state(instance):
+    """Mark ``instance``, just loaded with ``select_for_update``, as current for its next save."""
+    instance._locked_state = license_state(instance.product_id, instance.is_active, instance.expires_at)
+
+
+@receiver(post_save, sender=BotLicense)
+def update_license_stats(sender, instance, created, **kwargs):
+    after = license_state(instance.product_id, instance.is_active, instance.expires_at)
+    apply_transitions([(None if created else instance._stats_state, after)])
+
+
+@receiver(post_delete, sender=BotLicense)
+def remove_license_stats(sender, instance, **kwargs):
+    apply_transitions([(instance._stats_state, None)])
+
+
+# Sent by bot_license.bulk, whose bulk_create/bulk_update calls skip the model
+# signals above. Arguments: license_keys (updated), created_keys and the
+# stats transitions for both.
+licenses_bulk_changed = Signal()
+
+
+@receiver(licenses_bulk_changed, sender=BotLicense)
+def apply_bulk_changes(sender, license_keys, created_keys, transitions, **kwargs):
+    license_cache.invalidate(*license_keys)
+    for license_key in created_keys:
+        key_filter.add(license_key)
+    apply_transitions(transitions)
+    transaction.on_commit(lambda: license_cache.invalidate(*license_keys))
+    changes.record_licenses(created_keys, license_keys)
+    bump(LICENSES)
+
+
+@receiver(post_save, sender=Product)
+def create_product_stats(sender, instance, created, **kwargs):
+    if created:
+        LicenseStats.objects.get_or_create(product=instance)
+
+
+@receiver(post_save, sender=BotLicense)
+@receiver(post_delete, sender=BotLicense)
+def record_license_change(sender, instance, **kwargs):
+    action = changes.DELETED if kwargs['signal'] is post_delete else (
+        changes.CREATED if kwargs['created'] else changes.UPDATED
+    )
+    changes.record(changes.LICENSE, action, [(instance.pk, changes.license_data(instance))])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def record_product_change(sender, instance, **kwargs):
+    action = changes.DELETED if kwargs['signal'] is post_delete else (
+        changes.CREATED if kwargs['created'] else changes.UPDATED
+    )
+    changes.record(changes.PRODUCT, action, [(instance.pk, changes.product_data(instance))])
+
+
+# Registered last: a version bump holds its row lock until commit, so it is
+# the final statement of each write.
+@receiver(post_save, sender=BotLicense)
+@receiver(post_delete, sender=BotLicense)
+def bump_license_version(sender, **kwargs):
+    bump(LICENSES)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def bump_product_version(sender, **kwargs):
+    bump(PRODUCTS)
+
+
+@receiver(post_save, sender=LicenseStats)
+def bump_stats_version(sender, **kwargs):
+    bump(LICENSE_STATS)
@@ -0,0 +1,117 @@
+"""
+Incrementally maintained license counters for the dashboard.
+
+Every ``BotLicense`` change is reduced to a before/after ``LicenseState`` and
+the difference is applied to the product's ``LicenseStats`` row with ``F()``
+updates. Expiry is a function of time rather than of writes, so
+``reconcile_stats`` (the ``reconcile_stats`` management command) recomputes
+the counters from the licenses table on a schedule.
+"""
+from collections import defaultdict
+from typing import NamedTuple
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import BotLicense, LicenseStats, Product
+
+
+class LicenseState(NamedTuple):
+    product_id: int
+    is_active: bool
+    expired: bool
+
+
+def license_state(product_id, is_active, expires_at, now=None):
+    now = now or timezone.now()
+    return LicenseState(product_id, bool(is_active), expires_at is not None and expires_at < now)
+
+
+def apply_transitions(transitions):
+    """
+    Apply ``(before, after)`` ``LicenseState`` pairs to the counters.
+
+    ``before`` is ``None`` for created licenses and ``after`` is ``None`` for
+    deleted ones. Deltas are summed per product first, so a batch costs one
+    ``UPDATE`` per affected product. Products are updated in id order, the
+    order ``reconcile_stats`` locks them in.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0])
+    for before, after in transitions:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is None:
+                continue
+            delta = deltas[state.product_id]
+            delta[0] += sign
+            delta[1] += sign * state.is_active
+            delta[2] += sign * state.expired
+
+    for product_id, (total, active, expired) in sorted(deltas.items()):
+        if total or active or expired:
+            LicenseStats.objects.filter(product_id=product_id).update(
+                total_licenses=F('total_licenses') + total,
+                active_licenses=F('active_licenses') + active,
+                expired_licenses=F('expired_licenses') + expired,
+                updated_at=timezone.now(),
+            )
+
+
+def reconcile_stats(now=None):
+    """
+    Recompute every product's counters from the licenses table; returns rows changed.
+
+    The counter rows are locked before the licenses are counted. A writer
+    whose delta is already applied has committed its license by the time the
+    lock is granted, so the count includes it; one that comes later waits and
+    adds its delta to the recomputed value. Either way no delta is lost.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        existing = {stats.product_id: stats for stats in LicenseStats.objects.select_for_update().order_by('product_id')}
+        counts = {
+            row['product_id']: row
+            for row in BotLicense.objects.values('product_id').annotate(
+                total=Count('id'),
+                active=Count('id', filter=Q(is_active=True)),
+                expired=Count('id', filter=Q(expires_at__lt=now)),
+            )
+        }
+
+        changed = []
+        for product_id in Product.objects.values_list('id', flat=True):
+            row = counts.get(product_id, {'total': 0, 'active': 0, 'expired': 0})
+            values = (row['total'], row['active'], row['expired'])
+            stats = existing.get(product_id)
+            if stats is None:
+                stats = LicenseStats(product_id=product_id)
+            elif (stats.total_licenses, stats.active_licenses, stats.expired_licenses) == values:
+                continue
+            stats.total_licenses, stats.active_licenses, stats.expired_licenses = values
+            stats.updated_at = now
+            changed.append(stats)
+
+        for stats in changed:
+            stats.save()
+    return len(changed)
+
+
+def dashboard_stats():
+    """Totals, per-product breakdown and the products themselves from a single query."""
+    rows = list(LicenseStats.objects.select_related('product'))
+    totals = {
+        'total_products': len(rows),
+        'active_licenses': sum(row.active_licenses for row in rows),
+        'expired_licenses': sum(row.expired_licenses for row in rows),
+    }
+    breakdown = [
+        {
+            'product_id': row.product_id,
+            'name': row.product.name,
+            'total_licenses': row.total_licenses,
+            'active_licenses': row.active_licenses,
+            'expired_licenses': row.expired_licenses,
+        }
+        for row in sorted(rows, key=lambda row: row.product_id)
+    ]
+    return totals, breakdown, [row.product for row in rows]
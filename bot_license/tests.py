@@ -1,3 +1,1402 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
+
+from asgiref.sync import async_to_sync, sync_to_async
+
+from django.core.cache import caches
+from django.core.management import call_command
+from django.conf import settings
+from django.db import DatabaseError, connection, connections
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.renderers import JSONRenderer
+
+from .async_views import AsyncChangeFeedView, AsyncEAValidate, AsyncLicenseDetailsView, AsyncVerifyLicenseView
+from .benchmarks import SCENARIOS, compare, run_benchmarks, run_serialization_benchmark, seed
+from .bulk import run_operations
+from .cache import LicenseCache, license_cache
+from .changes import compact
+from .events import EventBuffer, event_buffer
+from .expiry import sweep_expired
+from .imports import process_import
+from .keyfilter import key_filter
+from .leases import LeaseError, generate_private_key, lease_public_key, verify_lease
+from .licensetable import export_table, license_table
+from .metrics import registry
+from .pagination import ApproximateCountPaginator
+from .projections import license_rows, license_values, product_rows, product_table
+from .renderers import FastJSONRenderer
+from .routers import ReplicaRouter, replica_health, replica_reads
+from . import seats
+from .serializers import LicenseSerializer, ProductSerializer
+from .throttling import TokenBucket, validation_throttle
+from .warmup import warm_up_process, warm_up_worker
+from .versions import LICENSES, bump
+from .validation import acheck_license
+from .utils import KEY_SPACE, key_for_index, key_space_usage, mint_license_keys, permute_index
+from .models import (
+    BotLicense, ChangeEvent, ExpirySweep, LicenseActivation, LicenseImport, LicenseStats, Product, ValidationEvent,
+)
+
+
+def setUpModule():
+    # Events are flushed explicitly; a writer thread would commit outside the
+    # test transaction.
+    event_buffer.background = False
+
+
+def tearDownModule():
+    event_buffer.discard()
+    event_buffer.background = True
+
+
+class LicenseTestCase(TestCase):
+
+    def setUp(self):
+        replica_health.reset()
+        license_cache.clear()
+        license_cache.reset_stats()
+        event_buffer.discard()
+        key_filter.reset()
+        validation_throttle.reset()
+        product_table.reset()
+        self.product = Product.objects.create(name='Scalper', version='1.0')
+        self.license = BotLicense.objects.create(
+            license_key='TXCT-AAAA', product=self.product, account_id='1001'
+        )
+
+
+class LicenseCacheTests(LicenseTestCase):
+
+    def test_validate_is_served_from_cache_after_first_lookup(self):
+        payload = {'license_key': 'TXCT-AAAA', 'account_id': '1001'}
+        response = self.client.post('/ea/validate/', payload)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = self.client.post('/ea/validate/', payload)
+        self.assertEqual(response.json(), {'valid': 'License is valid.'})
+        self.assertEqual(license_cache.stats()['hits'], 1)
+        self.assertEqual(license_cache.stats()['misses'], 1)
+
+    def test_save_invalidates_cached_snapshot(self):
+        self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA'})
+        self.license.expires_at = timezone.now() - timedelta(days=1)
+        self.license.save()
+
+        response = self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {'valid': 'License has expired.'})
+
+    def test_revoke_invalidates_cached_snapshot(self):
+        self.assertTrue(license_cache.get('TXCT-AAAA').is_active)
+        self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertFalse(license_cache.get('TXCT-AAAA').is_active)
+
+    def test_unknown_keys_are_not_cached(self):
+        self.assertIsNone(license_cache.get('TXCT-ZZZZ'))
+        BotLicense.objects.create(license_key='TXCT-ZZZZ', product=self.product, account_id='1002')
+        self.assertIsNotNone(license_cache.get('TXCT-ZZZZ'))
+
+    def test_non_string_keys_are_unknown(self):
+        for key in (['TXCT-AAAA'], {'key': 'TXCT-AAAA'}):
+            self.assertIsNone(license_cache.get(key))
+            self.assertIsNone(async_to_sync(license_cache.aget)(key))
+            body = json.dumps({'license_key': key, 'account_id': '1001'})
+            for fast_path in (True, False):
+                with override_settings(EA_FAST_PATH=fast_path):
+                    response = self.client.post('/ea/validate/', body, content_type='application/json')
+                self.assertEqual((response.status_code, response.json()), (404, {'valid': 'Invalid license key.'}))
+            response = self.client.post('/license/verify/', body, content_type='application/json')
+            self.assertEqual(response.status_code, 404)
+
+    def test_lru_eviction_and_ttl(self):
+        cache = LicenseCache(max_entries=1, ttl=60)
+        BotLicense.objects.create(license_key='TXCT-BBBB', product=self.product, account_id='1002')
+        cache.get('TXCT-AAAA')
+        cache.get('TXCT-BBBB')
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['size'], 1)
+
+        expiring = LicenseCache(ttl=0)
+        expiring.get('TXCT-AAAA')
+        expiring.get('TXCT-AAAA')
+        self.assertEqual(expiring.stats()['expirations'], 1)
+        self.assertEqual(expiring.stats()['hits'], 0)
+
+
+    def test_invalidation_reaches_other_processes_through_the_shared_cache(self):
+        caches['default'].clear()
+        self.addCleanup(caches['default'].clear)
+        worker, other = (LicenseCache(cache_alias='default', check_interval=0) for _ in range(2))
+        BotLicense.objects.create(license_key='TXCT-BBBB', product=self.product, account_id='1002')
+        self.assertTrue(worker.get('TXCT-AAAA').is_active)
+        self.assertTrue(worker.get('TXCT-BBBB').is_active)
+
+        BotLicense.objects.filter(license_key='TXCT-AAAA').update(is_active=False)
+        other.invalidate('TXCT-AAAA')
+        self.assertFalse(worker.get('TXCT-AAAA').is_active)
+        # Only the logged key was dropped.
+        self.assertEqual(worker.stats()['remote_invalidations'], 1)
+        self.assertEqual(worker.stats()['hits'], 0)
+        worker.get('TXCT-BBBB')
+        self.assertEqual(worker.stats()['hits'], 1)
+
+    def test_invalidation_reaches_other_processes_through_the_table_version(self):
+        worker = LicenseCache(check_interval=0)
+        self.assertTrue(worker.get('TXCT-AAAA').is_active)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertFalse(worker.get('TXCT-AAAA').is_active)
+
+
+class BatchValidateTests(LicenseTestCase):
+
+    def test_batch_matches_single_validation_semantics(self):
+        BotLicense.objects.create(
+            license_key='TXCT-BBBB', product=self.product, account_id='1002',
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        items = [
+            {'license_key': 'TXCT-AAAA', 'account_id': '1001'},
+            {'license_key': 'TXCT-AAAA', 'account_id': '9999'},
+            {'license_key': 'TXCT-BBBB', 'account_id': '1002'},
+            {'license_key': 'TXCT-ZZZZ', 'account_id': '1003'},
+            {'account_id': '1004'},
+        ]
+        key_filter.refresh()
+        with self.assertNumQueries(1):
+            response = self.client.post('/ea/validate/batch/', {'licenses': items}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()['results']
+        for item, result in zip(items, results):
+            single = self.client.post('/ea/validate/', item)
+            self.assertEqual(result['status'], single.status_code)
+            self.assertEqual(result['valid'], single.json()['valid'])
+
+    def test_non_string_keys_fail_per_item(self):
+        items = [
+            {'license_key': ['TXCT-AAAA'], 'account_id': '1001'},
+            {'license_key': {'key': 'TXCT-AAAA'}, 'account_id': '1001'},
+            {'license_key': 'TXCT-AAAA', 'account_id': '1001'},
+        ]
+        response = self.client.post('/ea/validate/batch/', items, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(result['status'], result['valid']) for result in response.json()['results']],
+            [(400, 'License key must be a string.')] * 2 + [(200, 'License is valid.')]
+        )
+
+    def test_batch_size_is_bounded(self):
+        items = [{'license_key': 'TXCT-AAAA'}] * 5001
+        response = self.client.post('/ea/validate/batch/', items, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class LeaseTests(LicenseTestCase):
+
+    def validate(self, **extra):
+        data = {'license_key': 'TXCT-AAAA', 'account_id': '1001', 'lease': '1', **extra}
+        return self.client.post('/ea/validate/', data)
+
+    def test_lease_round_trip(self):
+        response = self.validate()
+        self.assertEqual(response.status_code, 200)
+        claims = verify_lease(response.json()['lease'], license_key='TXCT-AAAA', account_id='1001')
+        self.assertEqual(claims['p'], self.product.id)
+
+        with self.assertRaises(LeaseError):
+            verify_lease(response.json()['lease'], account_id='9999')
+        with self.assertRaises(LeaseError):
+            verify_lease(response.json()['lease'], now=claims['exp'])
+        with self.assertRaises(LeaseError):
+            verify_lease(response.json()['lease'] + 'x')
+
+    def test_leases_verify_with_the_public_key_only(self):
+        token = self.validate().json()['lease']
+        public_key = lease_public_key()
+        self.assertEqual(verify_lease(token, public_key=public_key)['k'], 'TXCT-AAAA')
+
+        stdout = io.StringIO()
+        call_command('lease_keys', stdout=stdout)
+        self.assertEqual(stdout.getvalue().strip(), public_key)
+
+        # A lease from another signing key is rejected.
+        with override_settings(LICENSE_LEASE={**settings.LICENSE_LEASE, 'PRIVATE_KEY': generate_private_key()}):
+            forged = self.validate().json()['lease']
+        with self.assertRaises(LeaseError):
+            verify_lease(forged, public_key=public_key)
+
+    def test_lease_is_capped_by_license_expiry(self):
+        self.license.expires_at = timezone.now() + timedelta(seconds=30)
+        self.license.save()
+        claims = verify_lease(self.validate().json()['lease'])
+        self.assertEqual(claims['exp'], int(self.license.expires_at.timestamp()))
+
+    def test_revoked_license_gets_no_lease(self):
+        self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertIsNone(self.validate().json()['lease'])
+
+    def test_lease_only_when_requested(self):
+        response = self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(response.json(), {'valid': 'License is valid.'})
+
+
+class KeyAllocatorTests(LicenseTestCase):
+
+    def test_permutation_is_a_bijection(self):
+        sample = range(0, KEY_SPACE, 997)
+        self.assertEqual(len({permute_index(i) for i in sample}), len(sample))
+        self.assertTrue(all(0 <= permute_index(i) < KEY_SPACE for i in sample))
+
+    def test_mint_many_keys_without_per_key_probes(self):
+        mint_license_keys(1)
+        # savepoint, locked read, collision check, counter update, release
+        with self.assertNumQueries(5):
+            keys = mint_license_keys(500)
+        self.assertEqual(len(set(keys)), 500)
+        self.assertTrue(all(key.startswith('TXCT-') and len(key) == 9 for key in keys))
+        self.assertEqual(key_space_usage()['allocated'], 501)
+
+    def test_mint_skips_existing_keys(self):
+        first = key_for_index(0)
+        BotLicense.objects.create(license_key=first, product=self.product, account_id='1002')
+        keys = mint_license_keys(2)
+        self.assertNotIn(first, keys)
+        self.assertEqual(keys, [key_for_index(1), key_for_index(2)])
+
+    def test_create_license_uses_allocator(self):
+        response = self.client.post('/license/create/', {'product_id': self.product.id, 'account_id': '1005'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['license_key'], key_for_index(0))
+
+
+class LicenseListingTests(LicenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        other = Product.objects.create(name='Grid', version='2.0')
+        now = timezone.now()
+        BotLicense.objects.bulk_create([
+            BotLicense(
+                license_key=f'TXCT-{i:04d}', product=other if i % 2 else self.product,
+                account_id=str(2000 + i), is_active=i % 3 != 0,
+                expires_at=now + timedelta(days=i),
+            )
+            for i in range(30)
+        ])
+
+    def test_query_count_is_constant_per_page(self):
+        # Load the product table; after that products come from memory.
+        self.client.get('/licenses/', {'page_size': 1})
+        for page_size in (5, 25):
+            # The page itself plus the table-version lookup for the ETag.
+            with self.assertNumQueries(2):
+                response = self.client.get('/licenses/', {'page_size': page_size})
+            self.assertEqual(len(response.json()['results']), page_size)
+            self.assertIn('name', response.json()['results'][0]['product'])
+
+    def test_cursor_walks_every_license_once(self):
+        seen = []
+        url = '/licenses/?page_size=7'
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(item['id'] for item in data['results'])
+            url = data['next']
+        self.assertEqual(sorted(seen, reverse=True), seen)
+        self.assertEqual(len(set(seen)), BotLicense.objects.count())
+
+    def test_filters(self):
+        params = {'product': self.product.id, 'is_active': 'true', 'expires_after': timezone.now().date().isoformat(),
+                  'expires_before': (timezone.now() + timedelta(days=10)).isoformat()}
+        results = self.client.get('/licenses/', params).json()['results']
+        expected = BotLicense.objects.filter(
+            product=self.product, is_active=True,
+            expires_at__lt=timezone.now() + timedelta(days=10), expires_at__isnull=False,
+        )
+        self.assertEqual({item['license_key'] for item in results}, {lic.license_key for lic in expected})
+
+        self.assertEqual(self.client.get('/licenses/', {'is_active': 'maybe'}).status_code, 400)
+        self.assertEqual(self.client.get('/licenses/', {'expires_before': '2025-13-01'}).status_code, 400)
+
+
+class ExportTests(LicenseTestCase):
+
+    def test_ndjson_export_streams_every_license(self):
+        BotLicense.objects.create(license_key='TXCT-BBBB', product=self.product, account_id='1002')
+        response = self.client.get('/export/licenses/')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['license_key'] for row in rows], ['TXCT-AAAA', 'TXCT-BBBB'])
+        self.assertEqual(rows[0]['product_name'], 'Scalper')
+
+    def test_csv_export_and_command(self):
+        response = self.client.get('/export/products/', {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,name,version,description,created_at')
+        self.assertEqual(len(lines), 2)
+
+        out = io.StringIO()
+        call_command('export_data', 'licenses', '--format', 'csv', '--chunk-size', '1', stdout=out)
+        self.assertIn('TXCT-AAAA', out.getvalue())
+
+    def test_unknown_export_format(self):
+        self.assertEqual(self.client.get('/export/licenses/', {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/export/users/').status_code, 404)
+
+
+class DashboardStatsTests(LicenseTestCase):
+
+    def expected(self):
+        return {
+            'total_products': Product.objects.count(),
+            'active_licenses': BotLicense.objects.filter(is_active=True).count(),
+            'expired_licenses': BotLicense.objects.filter(expires_at__lt=timezone.now()).count(),
+        }
+
+    def dashboard(self):
+        data = self.client.get('/dashboard/').json()
+        return {key: data[key] for key in ('total_products', 'active_licenses', 'expired_licenses')}
+
+    def test_counters_follow_license_changes(self):
+        other = Product.objects.create(name='Grid')
+        BotLicense.objects.create(
+            license_key='TXCT-BBBB', product=other, account_id='1002',
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(self.dashboard(), self.expected())
+
+        renewed = BotLicense.objects.get(license_key='TXCT-BBBB')
+        renewed.expires_at = timezone.now() + timedelta(days=30)
+        renewed.product = self.product
+        renewed.save()
+        self.license.delete()
+        self.assertEqual(self.dashboard(), self.expected())
+
+        breakdown = {row['product_id']: row for row in self.client.get('/dashboard/').json()['products']}
+        self.assertEqual(breakdown[self.product.id]['total_licenses'], 1)
+        self.assertEqual(breakdown[other.id]['total_licenses'], 0)
+
+    def test_dashboard_is_one_query(self):
+        # The counters plus the table-version lookup for the ETag.
+        with self.assertNumQueries(2):
+            response = self.client.get('/dashboard/')
+        self.assertEqual(response.json()['recent_products'][0]['name'], 'Scalper')
+
+    def test_license_writes_commit_with_their_stats_event_and_version(self):
+        with self.assertNumQueries(7):  # savepoint, locked read, update, stats, event, version, release
+            self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(self.dashboard(), self.expected())
+
+        with mock.patch('bot_license.changes.record', side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.client.post('/license/create/', {'product_id': self.product.id, 'account_id': '2001'})
+        with mock.patch('bot_license.versions.TableVersion.objects.filter', side_effect=DatabaseError), \
+                self.assertRaises(DatabaseError):
+            self.client.post('/license/activate/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(BotLicense.objects.count(), 1)
+        self.assertFalse(BotLicense.objects.get().is_active)
+        self.assertEqual(self.dashboard(), self.expected())
+
+    def test_reconcile_picks_up_expiry(self):
+        BotLicense.objects.filter(pk=self.license.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.dashboard()['expired_licenses'], 0)
+        call_command('reconcile_stats', stdout=io.StringIO())
+        self.assertEqual(self.dashboard(), self.expected())
+
+
+class AsyncViewTests(LicenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.factory = AsyncRequestFactory()
+
+    async def validate(self, data, content_type='application/x-www-form-urlencoded'):
+        if content_type == 'application/json':
+            request = self.factory.post('/ea/validate/', data, content_type=content_type)
+        else:
+            request = self.factory.post('/ea/validate/', urlencode(data), content_type=content_type)
+        return await AsyncEAValidate.as_view()(request)
+
+    async def test_responses_match_sync_views(self):
+        cases = [
+            {'license_key': 'TXCT-AAAA', 'account_id': '1001'},
+            {'license_key': 'TXCT-AAAA', 'account_id': '9999'},
+            {'license_key': 'TXCT-ZZZZ'},
+            {'account_id': '1001'},
+        ]
+        for data in cases:
+            expected = await sync_to_async(self.client.post)('/ea/validate/', data)
+            for content_type in ('application/json', 'application/x-www-form-urlencoded'):
+                response = await self.validate(data, content_type)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.content, expected.content)
+
+        expected = await sync_to_async(self.client.get)('/license/TXCT-AAAA/')
+        response = await AsyncLicenseDetailsView.as_view()(self.factory.get('/'), license_key='TXCT-AAAA')
+        self.assertEqual(json.loads(response.content), expected.json())
+
+    async def test_non_string_keys_are_unknown(self):
+        for key in (['TXCT-AAAA'], {'key': 'TXCT-AAAA'}):
+            data = {'license_key': key, 'account_id': '1001'}
+            response = await self.validate(data, 'application/json')
+            self.assertEqual((response.status_code, json.loads(response.content)), (404, {'valid': 'Invalid license key.'}))
+            request = self.factory.post('/license/verify/', data, content_type='application/json')
+            response = await AsyncVerifyLicenseView.as_view()(request)
+            self.assertEqual(response.status_code, 404)
+
+    async def test_malformed_json_matches_sync_views(self):
+        for url, view in (('/ea/validate/', AsyncEAValidate), ('/license/verify/', AsyncVerifyLicenseView)):
+            expected = await sync_to_async(self.client.post)(url, '{"license_key": ', content_type='application/json')
+            request = self.factory.post(url, '{"license_key": ', content_type='application/json')
+            response = await view.as_view()(request)
+            self.assertEqual(response.status_code, expected.status_code)
+            self.assertEqual(json.loads(response.content), expected.json())
+            self.assertTrue(expected.json()['detail'].startswith('JSON parse error - '))
+
+    async def test_many_validations_in_flight_on_one_worker(self):
+        keys = [f'TXCT-{i:04d}' for i in range(200)]
+        await BotLicense.objects.abulk_create([
+            BotLicense(license_key=key, product_id=self.product.id, account_id='1001') for key in keys
+        ])
+        delay = 0.05
+
+        async def slow_check(license, account):
+            # Stands in for a slow database round trip inside the view.
+            await asyncio.sleep(delay)
+            return await acheck_license(license, account)
+
+        started = time.monotonic()
+        with mock.patch('bot_license.async_views.acheck_license', slow_check):
+            responses = await asyncio.gather(
+                *(self.validate({'license_key': key, 'account_id': '1001'}) for key in keys)
+            )
+        elapsed = time.monotonic() - started
+        self.assertEqual({response.status_code for response in responses}, {200})
+        # Run one after another, the delays alone would take len(keys) * delay.
+        self.assertLess(elapsed, len(keys) * delay / 4)
+
+
+class BenchmarkTests(TestCase):
+
+    def test_benchmark_reports_every_scenario(self):
+        product_ids, pairs = seed(products=2, licenses=40)
+        self.assertEqual(BotLicense.objects.count(), 40)
+
+        results = run_benchmarks(product_ids, pairs, requests=5, concurrency=1, query_samples=2)
+        self.assertEqual(set(results), set(SCENARIOS))
+        for metrics in results.values():
+            self.assertEqual(metrics['requests'], 5)
+            self.assertEqual(metrics['errors'], 0)
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertLessEqual(results['ea_validate']['queries_per_request'], 1)
+
+    def test_compare_flags_regressions(self):
+        baseline = {'ea_validate': {'p95_ms': 10.0, 'throughput_rps': 1000.0}}
+        current = {'ea_validate': {'p95_ms': 12.0, 'throughput_rps': 950.0}}
+        self.assertEqual(compare(current, baseline, 10), [('ea_validate', 'p95_ms', 10.0, 12.0, 20.0)])
+        self.assertEqual(compare(current, baseline, 25), [])
+
+
+class MetricsTests(LicenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+
+    def test_metrics_record_route_status_and_queries(self):
+        self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA'})
+        self.client.post('/ea/validate/', {'license_key': 'TXCT-ZZZZ'})
+        body = self.client.get('/metrics/').content.decode()
+
+        self.assertIn('licenser_http_requests_total{route="ea/validate/",method="POST",status="200"} 1', body)
+        self.assertIn('licenser_http_requests_total{route="ea/validate/",method="POST",status="404"} 1', body)
+        self.assertIn('licenser_db_queries_per_request_sum{route="ea/validate/",method="POST"} 2', body)
+        self.assertIn('licenser_http_request_duration_seconds_count{route="ea/validate/",method="POST"} 2', body)
+        self.assertIn('licenser_license_cache_hits', body)
+
+    def test_metrics_are_private(self):
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn(f'licenser_worker_info{{pid="{os.getpid()}"}} 1', body)
+        # Scrapers configured with the bare path are redirected to the canonical one.
+        self.assertRedirects(self.client.get('/metrics'), '/metrics/', status_code=301)
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='93.184.216.34').status_code, 403)
+        # The trusted proxy hop is the client, not a private address it was forwarded from.
+        self.assertEqual(
+            self.client.get('/metrics/', HTTP_X_FORWARDED_FOR='10.0.0.1, 93.184.216.34').status_code, 403,
+        )
+
+        with override_settings(METRICS={'TOKEN': 'scrape-secret'}):
+            self.assertEqual(self.client.get('/metrics/').status_code, 403)
+            self.assertEqual(self.client.get('/metrics/', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            response = self.client.get('/metrics/', REMOTE_ADDR='93.184.216.34', HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+
+    def test_health_reports_database(self):
+        data = self.client.get('/health/').json()
+        self.assertEqual(data['status'], 'healthy')
+        self.assertEqual(data['database']['status'], 'ok')
+
+    def test_pool_telemetry(self):
+        stats = {'pool_min': 2, 'pool_max': 10, 'pool_size': 4, 'pool_available': 1, 'requests_waiting': 0,
+                 'requests_num': 40, 'requests_wait_ms': 12}
+        pool = mock.Mock(get_stats=mock.Mock(return_value=stats))
+        options = {**connections.settings['default'].get('OPTIONS', {}), 'pool': {}}
+        with mock.patch.dict(connections.settings['default'], {'OPTIONS': options}), \
+                mock.patch.object(connections['default'], 'pool', pool, create=True):
+            body = self.client.get('/metrics/').content.decode()
+            data = self.client.get('/health/').json()['database_pools']['default']
+        self.assertEqual(body.count('# TYPE licenser_db_pool_checkouts gauge'), 1)
+        self.assertIn('licenser_db_pool_checkouts{alias="default"} 40', body)
+        self.assertEqual((data['saturation'], data['wait_ms'], data['timeouts']), (0.3, 12, 0))
+
+
+class ValidationEventTests(LicenseTestCase):
+
+    def test_validations_are_buffered_and_flushed_in_batches(self):
+        unknown = event_buffer.stats()['unknown']
+        self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA', 'account_id': '1001'})
+        self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA', 'account_id': '1001'},
+                         HTTP_X_FORWARDED_FOR='203.0.113.7', REMOTE_ADDR='203.0.113.7')
+        self.client.post('/license/verify/', {'license_key': 'TXCT-AAAA', 'account_id': '1002'})
+        self.client.post('/ea/validate/', {'license_key': 'TXCT-NOPE-TOO-LONG'})
+        self.assertEqual(ValidationEvent.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(event_buffer.flush(), 3)
+        # The unknown key is counted, not stored.
+        self.assertFalse(ValidationEvent.objects.filter(status_code=404).exists())
+        self.assertEqual(event_buffer.stats()['unknown'], unknown + 1)
+        self.assertIn(f'licenser_validation_events_unknown {unknown + 1}\n', self.client.get('/metrics/').content.decode())
+
+        data = self.client.get('/license/TXCT-AAAA/activity/').json()
+        self.assertEqual(data['validation_count'], 3)
+        accounts = {row['account_id']: row for row in data['accounts']}
+        self.assertEqual(accounts['1001']['validation_count'], 2)
+        self.assertEqual(accounts['1001']['distinct_ips'], 2)
+
+    def test_multi_hop_forwarded_for_logs_the_router_hop(self):
+        self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA'}, HTTP_X_FORWARDED_FOR='10.1.1.1, 203.0.113.7')
+        event_buffer.flush()
+        self.assertEqual(ValidationEvent.objects.get().ip_address, '203.0.113.7')
+
+    def test_events_past_retention_are_pruned(self):
+        now = timezone.now()
+        ValidationEvent.objects.bulk_create([
+            ValidationEvent(license_key='TXCT-AAAA', endpoint='ea-validate', status_code=200,
+                            created_at=now - timedelta(days=days))
+            for days in (90, 45, 31, 2, 0)
+        ])
+        with override_settings(VALIDATION_EVENTS={**settings.VALIDATION_EVENTS, 'RETENTION_DAYS': 30}):
+            out = io.StringIO()
+            call_command('prune_validation_events', stdout=out)
+        self.assertIn('3 event(s) deleted', out.getvalue())
+        self.assertEqual(ValidationEvent.objects.count(), 2)
+
+    def test_unknown_keys_are_counted_and_sampled(self):
+        buffer = EventBuffer(background=False, unknown_sample_every=3)
+        for n in range(7):
+            buffer.record(f'TXCT-{n:04d}', '1001', '127.0.0.1', 'ea-validate', 404)
+        self.assertEqual((buffer.stats()['unknown'], buffer.stats()['buffered']), (7, 2))
+        buffer.stop()
+        self.assertEqual(
+            list(ValidationEvent.objects.order_by('id').values_list('license_key', flat=True)), ['TXCT-0002', 'TXCT-0005']
+        )
+
+    def test_overflow_is_dropped_and_counted(self):
+        buffer = EventBuffer(max_buffered=2, background=False)
+        for _ in range(5):
+            buffer.record('TXCT-AAAA', '1001', '127.0.0.1', 'ea-validate', 200)
+        self.assertEqual(buffer.stats()['buffered'], 2)
+        self.assertEqual(buffer.stats()['dropped'], 3)
+        buffer.stop()
+        self.assertEqual(buffer.stats()['flushed'], 2)
+
+
+class KeyFilterTests(LicenseTestCase):
+
+    def test_unknown_keys_are_rejected_without_queries(self):
+        key_filter.refresh()
+        for url in ('/ea/validate/', '/license/verify/'):
+            with self.assertNumQueries(0):
+                response = self.client.post(url, {'license_key': 'TXCT-ZZZZ'})
+            self.assertEqual(response.status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/license/TXCT-ZZZZ/').status_code, 404)
+        self.assertEqual(key_filter.stats()['rejected'], 3)
+        self.assertEqual(key_filter.stats()['false_positive_rate'], 0.0)
+
+    def test_new_licenses_pass_the_filter(self):
+        key_filter.refresh()
+        BotLicense.objects.create(license_key='TXCT-ZZZZ', product=self.product, account_id='1002')
+        BotLicense.objects.create(license_key='LEGACY', product=self.product, account_id='1003')
+        self.assertEqual(self.client.post('/ea/validate/', {'license_key': 'TXCT-ZZZZ'}).status_code, 200)
+        self.assertEqual(self.client.post('/ea/validate/', {'license_key': 'LEGACY'}).status_code, 200)
+
+    def test_licenses_from_other_workers_are_picked_up_by_refresh(self):
+        key_filter.refresh()
+        BotLicense.objects.bulk_create([BotLicense(license_key='TXCT-YYYY', product=self.product, account_id='1')])
+        self.assertFalse(key_filter.might_exist('TXCT-YYYY'))
+        key_filter._last_refresh -= key_filter.refresh_interval
+        self.assertTrue(key_filter.might_exist('TXCT-YYYY'))
+
+
+class ThrottleTests(LicenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Freeze the buckets' clock so no tokens are refilled between requests.
+        self.enterContext(mock.patch('bot_license.throttling.time', mock.Mock(monotonic=mock.Mock(return_value=0.0))))
+
+    def test_token_bucket_refills(self):
+        bucket = TokenBucket(rate=1, burst=2)
+        self.assertEqual(bucket.consume('a', now=0), 0)
+        self.assertEqual(bucket.consume('a', now=0), 0)
+        self.assertEqual(bucket.consume('a', now=0), 1.0)
+        self.assertEqual(bucket.consume('a', now=1), 0)
+        self.assertEqual(bucket.consume('b', now=1), 0)
+
+    def test_validation_endpoints_are_throttled_per_key(self):
+        burst = validation_throttle.by_key.burst
+        for _ in range(int(burst)):
+            self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA'})
+        response = self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(self.client.post('/ea/validate/', {'license_key': 'TXCT-BBBB'}).status_code, 404)
+
+    def test_rotating_forwarded_for_does_not_escape_the_ip_bucket(self):
+        self.addCleanup(setattr, validation_throttle.by_ip, 'burst', validation_throttle.by_ip.burst)
+        validation_throttle.by_ip.burst = 5
+        codes = []
+        for n in range(8):
+            for url in ('/ea/validate/', '/license/verify/'):
+                # The router appends the real client address after whatever the client sent.
+                codes.append(self.client.post(
+                    url, {'license_key': f'TXCT-{n:04d}'}, HTTP_X_FORWARDED_FOR=f'198.51.100.{n}, 203.0.113.9',
+                ).status_code)
+        self.assertEqual(codes.count(429), len(codes) - 5)
+        self.assertEqual(len(validation_throttle.by_ip._buckets), 1)
+
+
+class FastPathTests(LicenseTestCase):
+
+    def post_both_ways(self, data, **kwargs):
+        fast = self.client.post('/ea/validate/', data, **kwargs)
+        with override_settings(EA_FAST_PATH=False):
+            full = self.client.post('/ea/validate/', data, **kwargs)
+        return fast, full
+
+    def test_fast_path_matches_drf_view(self):
+        self.license.expires_at = timezone.now() - timedelta(days=1)
+        BotLicense.objects.create(license_key='TXCT-CCCC', product=self.product, account_id='1002')
+        self.license.save()
+        cases = [
+            {},
+            {'license_key': 'TXCT-CCCC', 'account_id': '1002'},
+            {'license_key': 'TXCT-CCCC', 'account_id': '9999'},
+            {'license_key': 'TXCT-AAAA', 'account_id': '1001'},
+            {'license_key': 'TXCT-ZZZZ'},
+        ]
+        for data in cases:
+            for kwargs in ({}, {'content_type': 'application/json'}):
+                body = json.dumps(data) if kwargs else data
+                fast, full = self.post_both_ways(body, **kwargs)
+                self.assertEqual((fast.status_code, fast.json()), (full.status_code, full.json()))
+                self.assertNotIn('Vary', fast)
+        form = urlencode({'license_key': 'TXCT-CCCC', 'account_id': '1002'})
+        fast, full = self.post_both_ways(form, content_type='application/x-www-form-urlencoded')
+        self.assertEqual((fast.status_code, fast.content), (full.status_code, full.content))
+
+    def test_cached_validation_runs_no_queries(self):
+        self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA', 'account_id': '1001'})
+        with self.assertNumQueries(0):
+            response = self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA', 'account_id': '1001'})
+        self.assertEqual(response.json(), {'valid': 'License is valid.'})
+        self.assertEqual(event_buffer.stats()['buffered'], 2)
+
+    def test_lease_requests_fall_through_to_drf(self):
+        response = self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA', 'account_id': '1001', 'lease': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('lease', response.json())
+
+
+class BulkOperationTests(LicenseTestCase):
+
+    def bulk(self, operations):
+        return self.client.post('/licenses/bulk/', {'operations': operations}, content_type='application/json')
+
+    def test_mixed_operations_report_per_item_results(self):
+        license_cache.get('TXCT-AAAA')
+        response = self.bulk([
+            {'op': 'create', 'product_id': self.product.id, 'account_id': '2001'},
+            {'op': 'create', 'product_id': 999, 'account_id': '2002'},
+            {'op': 'revoke', 'license_key': 'TXCT-AAAA'},
+            {'op': 'extend', 'license_key': 'TXCT-AAAA', 'days': 30},
+            {'op': 'reassign', 'license_key': 'TXCT-ZZZZ', 'account_id': '2003'},
+            {'op': 'explode'},
+        ])
+        data = response.json()
+        self.assertEqual([result['status'] for result in data['results']], [201, 404, 200, 200, 404, 400])
+        self.assertEqual((data['succeeded'], data['failed']), (3, 3))
+
+        created = data['results'][0]['license_key']
+        self.assertTrue(BotLicense.objects.filter(license_key=created, account_id='2001').exists())
+        self.assertTrue(key_filter.might_exist(created))
+        self.license.refresh_from_db()
+        self.assertFalse(self.license.is_active)
+        self.assertGreater(self.license.expires_at, timezone.now() + timedelta(days=29))
+        self.assertFalse(license_cache.get('TXCT-AAAA').is_active)
+
+        stats = LicenseStats.objects.get(product=self.product)
+        self.assertEqual((stats.total_licenses, stats.active_licenses), (2, 1))
+
+    def test_large_batch_takes_a_handful_of_queries(self):
+        operations = [{'op': 'create', 'product_id': self.product.id, 'account_id': str(i)} for i in range(1000)]
+        operations.append({'op': 'activate', 'license_key': 'TXCT-AAAA'})
+        mint_license_keys(1)
+        with CaptureQueriesContext(connection) as captured:
+            results = run_operations(operations)
+        # bulk_create batches by the backend's parameter limit (9 license and 6
+        # change event INSERTs on SQLite); events and the version bump are part
+        # of the batch's transaction.
+        self.assertLessEqual(len(captured), 30)
+        self.assertTrue(all(result['status'] < 400 for result in results))
+        self.assertEqual(BotLicense.objects.count(), 1001)
+        self.assertEqual(LicenseStats.objects.get(product=self.product).total_licenses, 1001)
+
+        keys = [result['license_key'] for result in results[:1000]]
+        results = run_operations([{'op': 'reassign', 'license_key': key, 'account_id': 'reseller'} for key in keys])
+        self.assertEqual({result['status'] for result in results}, {200})
+        self.assertEqual(BotLicense.objects.filter(account_id='reseller').count(), 1000)
+
+    def test_rows_are_locked_in_key_order(self):
+        keys = ['TXCT-AAAA', 'TXCT-BBBB', 'TXCT-CCCC']
+        for key in keys[1:]:
+            BotLicense.objects.create(license_key=key, product=self.product, account_id='1001')
+        with CaptureQueriesContext(connection) as captured:
+            run_operations([{'op': 'revoke', 'license_key': key} for key in reversed(keys)], chunk_size=2)
+        queries = [query['sql'] for query in captured]
+        # The rows are locked before the first write.
+        first_write = next(n for n, sql in enumerate(queries) if sql.startswith('UPDATE'))
+        locked = [sql for sql in queries[:first_write] if '"bot_license_botlicense"."license_key" IN' in sql]
+        self.assertEqual(len(locked), 2)
+        self.assertTrue(all('ORDER BY "bot_license_botlicense"."license_key" ASC' in sql for sql in locked))
+        self.assertEqual([key for sql in locked for key in keys if f"'{key}'" in sql], keys)
+
+    def test_management_command_reads_operations_file(self):
+        path = self.enterContext(tempfile.TemporaryDirectory()) + '/ops.json'
+        with open(path, 'w') as out:
+            json.dump([{'op': 'revoke', 'license_key': 'TXCT-AAAA'}], out)
+        stdout = io.StringIO()
+        call_command('bulk_licenses', path, stdout=stdout, stderr=io.StringIO())
+        self.assertEqual(json.loads(stdout.getvalue())[0]['is_active'], False)
+
+
+class ExpirySweepTests(LicenseTestCase):
+
+    def test_sweep_deactivates_each_expiry_once(self):
+        now = timezone.now()
+        BotLicense.objects.filter(pk=self.license.pk).update(expires_at=now - timedelta(hours=1))
+        for key, hours in (('TXCT-BBBB', -2), ('TXCT-CCCC', -3), ('TXCT-DDDD', 5)):
+            BotLicense.objects.create(
+                license_key=key, product=self.product, account_id='1', expires_at=now + timedelta(hours=hours)
+            )
+        license_cache.get('TXCT-AAAA')
+
+        self.assertEqual(sweep_expired(now=now, chunk_size=2), 3)
+        self.assertFalse(license_cache.get('TXCT-AAAA').is_active)
+        self.assertEqual(list(BotLicense.objects.filter(is_active=True).values_list('license_key', flat=True)), ['TXCT-DDDD'])
+        self.assertEqual(LicenseStats.objects.get(product=self.product).active_licenses, 1)
+        sweep = ExpirySweep.objects.get()
+        self.assertEqual((sweep.last_expires_at, sweep.deactivated), (now - timedelta(hours=1), 3))
+
+        # A renewed license is left alone until its new expiry passes.
+        self.client.post('/licenses/bulk/', [
+            {'op': 'extend', 'license_key': 'TXCT-AAAA', 'days': 1}, {'op': 'activate', 'license_key': 'TXCT-AAAA'},
+        ], content_type='application/json')
+        self.assertEqual(sweep_expired(now=now), 0)
+        self.assertEqual(sweep_expired(now=now + timedelta(days=2)), 2)
+
+    def test_expiry_moved_behind_the_last_sweep_is_swept(self):
+        now = timezone.now()
+        BotLicense.objects.filter(pk=self.license.pk).update(expires_at=now - timedelta(hours=1))
+        self.assertEqual(sweep_expired(now=now), 1)
+
+        # Backdated to before the license the last sweep stopped at.
+        late = BotLicense.objects.create(
+            license_key='TXCT-BBBB', product=self.product, account_id='1', expires_at=now + timedelta(days=1)
+        )
+        late.expires_at = now - timedelta(days=3)
+        late.save()
+        self.assertEqual(sweep_expired(now=now), 1)
+        late.refresh_from_db()
+        self.assertFalse(late.is_active)
+
+    def test_renewal_does_not_reactivate(self):
+        now = timezone.now()
+        BotLicense.objects.filter(pk=self.license.pk).update(expires_at=now - timedelta(hours=1))
+        sweep_expired(now=now)
+        self.client.post('/licenses/bulk/', [
+            {'op': 'extend', 'license_key': 'TXCT-AAAA', 'days': 30},
+        ], content_type='application/json')
+        self.license.refresh_from_db()
+        self.assertFalse(self.license.is_active)
+        self.assertGreater(self.license.expires_at, now)
+
+    def test_expiring_soon_listing(self):
+        now = timezone.now()
+        BotLicense.objects.create(
+            license_key='TXCT-BBBB', product=self.product, account_id='1', expires_at=now + timedelta(days=3)
+        )
+        BotLicense.objects.create(
+            license_key='TXCT-CCCC', product=self.product, account_id='1', expires_at=now + timedelta(days=30)
+        )
+        data = self.client.get('/licenses/expiring/').json()
+        self.assertEqual([row['license_key'] for row in data['results']], ['TXCT-BBBB'])
+        data = self.client.get('/licenses/expiring/', {'days': 60}).json()
+        self.assertEqual([row['license_key'] for row in data['results']], ['TXCT-BBBB', 'TXCT-CCCC'])
+
+        stdout = io.StringIO()
+        call_command('export_data', 'expiring', stdout=stdout)
+        self.assertEqual(json.loads(stdout.getvalue())['license_key'], 'TXCT-BBBB')
+
+
+class ConditionalGetTests(LicenseTestCase):
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_reads_are_not_modified(self):
+        # The license details ETag needs the row as well as the products version.
+        for url, queries in (('/products/', 1), ('/licenses/', 1), ('/dashboard/', 1), ('/license/TXCT-AAAA/', 2)):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('no-cache', response['Cache-Control'])
+            with self.assertNumQueries(queries):
+                self.assertEqual(self.revalidate(url, response).status_code, 304)
+
+    def test_license_details_etag_covers_only_that_license(self):
+        BotLicense.objects.create(license_key='TXCT-BBBB', product=self.product, account_id='1002')
+        details = self.client.get('/license/TXCT-AAAA/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/license/revoke/', {'license_key': 'TXCT-BBBB'})
+        self.assertEqual(self.revalidate('/license/TXCT-AAAA/', details).status_code, 304)
+
+        factory = AsyncRequestFactory()
+        view = AsyncLicenseDetailsView.as_view()
+        response = async_to_sync(view)(factory.get('/'), license_key='TXCT-AAAA')
+        self.assertEqual(response['ETag'], details['ETag'])
+        revalidated = async_to_sync(view)(
+            factory.get('/', headers={'if-none-match': details['ETag']}), license_key='TXCT-AAAA',
+        )
+        self.assertEqual(revalidated.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(self.revalidate('/license/TXCT-AAAA/', details).status_code, 200)
+        response = async_to_sync(view)(
+            factory.get('/', headers={'if-none-match': details['ETag']}), license_key='TXCT-AAAA',
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_writes_change_the_etag(self):
+        products = self.client.get('/products/')
+        licenses = self.client.get('/licenses/')
+        details = self.client.get('/license/TXCT-AAAA/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(self.revalidate('/products/', products).status_code, 304)
+        self.assertEqual(self.revalidate('/licenses/', licenses).status_code, 200)
+        self.assertFalse(self.revalidate('/license/TXCT-AAAA/', details).json()['is_active'])
+
+        dashboard = self.client.get('/dashboard/')
+        BotLicense.objects.filter(pk=self.license.pk).update(expires_at=timezone.now() - timedelta(seconds=1))
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('reconcile_stats', stdout=io.StringIO())
+        self.assertEqual(self.revalidate('/dashboard/', dashboard).json()['expired_licenses'], 1)
+
+
+class ReplicaRoutingTests(LicenseTestCase):
+
+    @override_settings(DATABASE_REPLICAS=['replica9'])
+    def test_reads_use_healthy_replicas_until_a_write(self):
+        router = ReplicaRouter()
+        replica_health.mark('replica9', True)
+        self.assertEqual(router.db_for_read(BotLicense), 'default')
+        with replica_reads():
+            self.assertEqual(router.db_for_read(BotLicense), 'replica9')
+            self.assertEqual(router.db_for_write(BotLicense), 'default')
+            self.assertEqual(router.db_for_read(BotLicense), 'default')
+
+        replica_health.mark('replica9', False)
+        with replica_reads():
+            self.assertEqual(router.db_for_read(BotLicense), 'default')
+        self.assertEqual(replica_health.failovers, 1)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'no read replica configured')
+class ReplicaIntegrationTests(TransactionTestCase):
+    # Replicas are test mirrors of the default database, so committed rows are
+    # visible through them.
+    databases = '__all__'
+
+    def setUp(self):
+        replica_health.reset()
+        license_cache.clear()
+        key_filter.reset()
+        product = Product.objects.create(name='Scalper')
+        BotLicense.objects.create(license_key='TXCT-AAAA', product=product, account_id='1001')
+
+    def test_validation_reads_go_to_the_replica(self):
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with CaptureQueriesContext(replica) as captured:
+            response = self.client.get('/license/TXCT-AAAA/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('bot_license_botlicense' in query['sql'] for query in captured))
+
+        with CaptureQueriesContext(replica) as captured:
+            self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(len(captured), 0)
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        with replica_reads(), CaptureQueriesContext(replica) as captured:
+            self.assertTrue(BotLicense.objects.filter(license_key='TXCT-AAAA').exists())
+            BotLicense.objects.filter(license_key='TXCT-AAAA').update(account_id='2001')
+            self.assertEqual(BotLicense.objects.get(license_key='TXCT-AAAA').account_id, '2001')
+        # Only the health check and the read before the write used the replica.
+        self.assertEqual(len(captured), 2)
+
+    def test_unhealthy_replicas_fall_back_to_the_primary(self):
+        replica = connections[settings.DATABASE_REPLICAS[0]]
+        for alias in settings.DATABASE_REPLICAS:
+            replica_health.mark(alias, False)
+        with CaptureQueriesContext(replica) as captured:
+            response = self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA', 'account_id': '1001'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(captured), 0)
+        self.assertEqual(replica_health.failovers, 1)
+
+        # Cross-process invalidation checks read the primary even next to a healthy replica.
+        replica_health.reset()
+        with replica_reads(), CaptureQueriesContext(replica) as captured:
+            self.assertTrue(LicenseCache(check_interval=0).get('TXCT-AAAA').is_active)
+        self.assertTrue(any('bot_license_botlicense' in query['sql'] for query in captured))
+        self.assertFalse(any('bot_license_tableversion' in query['sql'] for query in captured))
+
+
+class LicenseTableTests(LicenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.path = self.enterContext(tempfile.TemporaryDirectory()) + '/licenses.table'
+        BotLicense.objects.create(
+            license_key='TXCT-BBBB', product=self.product, account_id='1002',
+            expires_at=timezone.now() - timedelta(days=1)
+        )
+        self.assertEqual(export_table(self.path), 2)
+        license_table.path, license_table.check_interval = self.path, 0
+        license_table.reset()
+        key_filter.refresh()
+        self.addCleanup(setattr, license_table, 'path', None)
+        self.addCleanup(license_table.reset)
+
+    def validate(self, key, account):
+        return self.client.post('/ea/validate/', {'license_key': key, 'account_id': account}).json()['valid']
+
+    def test_validation_is_served_from_the_table(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.validate('TXCT-AAAA', '1001'), 'License is valid.')
+            self.assertEqual(self.validate('TXCT-AAAA', '9999'), 'Account ID does not match.')
+            self.assertEqual(self.validate('TXCT-BBBB', '1002'), 'License has expired.')
+        entry = license_table.lookup('TXCT-BBBB')
+        self.assertEqual((entry.product_id, entry.is_active), (self.product.id, True))
+        self.assertEqual(license_cache.stats()['size'], 0)
+
+    def test_async_lease_without_account_rereads_the_table_entry(self):
+        request = AsyncRequestFactory().post('/ea/validate/', {'license_key': 'TXCT-AAAA', 'lease': '1'})
+        response = async_to_sync(AsyncEAValidate.as_view())(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(verify_lease(json.loads(response.content)['lease'])['a'], '1001')
+
+    def test_changes_from_other_processes_bypass_the_table_until_it_catches_up(self):
+        worker = LicenseCache(check_interval=0)
+        worker.get('TXCT-BBBB')
+        # The first check finds the mapped generation current.
+        self.assertTrue(license_table.lookup('TXCT-AAAA').is_active)
+
+        # Another process revokes the license; only the table version tells this one.
+        BotLicense.objects.filter(license_key='TXCT-AAAA').update(is_active=False)
+        bump(LICENSES)
+        worker.get('TXCT-BBBB')
+        self.assertIsNone(license_table.lookup('TXCT-AAAA'))
+        self.assertTrue(license_table.stats()['all_dirty'])
+
+        export_table(self.path)
+        self.assertFalse(license_table.lookup('TXCT-AAAA').is_active)
+        self.assertFalse(license_table.stats()['all_dirty'])
+
+    def test_changes_bypass_the_table_until_the_next_generation(self):
+        created = BotLicense.objects.create(license_key='TXCT-CCCC', product=self.product, account_id='1003')
+        self.assertIsNone(license_table.lookup('TXCT-CCCC'))
+        self.assertEqual(self.validate('TXCT-CCCC', '1003'), 'License is valid.')
+
+        self.license.account_id = '2001'
+        self.license.save()
+        self.assertIsNone(license_table.lookup('TXCT-AAAA'))
+        self.assertEqual(self.validate('TXCT-AAAA', '2001'), 'License is valid.')
+
+        export_table(self.path)
+        self.assertTrue(license_table.lookup('TXCT-AAAA').matches_account('2001'))
+        self.assertEqual(license_table.lookup(created.license_key).license_key, 'TXCT-CCCC')
+        self.assertEqual(license_table.stats()['swaps'], 2)
+
+    def test_dirty_keys_past_the_cap_bypass_the_whole_table(self):
+        self.addCleanup(setattr, license_table, 'max_dirty', license_table.max_dirty)
+        license_table.max_dirty = 3
+        license_table.mark_dirty(*(f'TXCT-{n:04d}' for n in range(4)))
+        self.assertEqual(license_table.stats()['dirty_keys'], 0)
+        self.assertIsNone(license_table.lookup('TXCT-AAAA'))
+
+        export_table(self.path)
+        self.assertEqual(license_table.lookup('TXCT-AAAA').license_key, 'TXCT-AAAA')
+        self.assertFalse(license_table.stats()['all_dirty'])
+
+
+@override_settings(CHANGE_LOG={**settings.CHANGE_LOG, 'SETTLE_SECONDS': 0, 'POLL_INTERVAL': 0.01})
+class ChangeFeedTests(LicenseTestCase):
+
+    def changes(self, after, **params):
+        return self.client.get('/changes/', {'after': after, **params})
+
+    def test_views_append_events_that_resume_from_a_sequence_number(self):
+        start = self.client.get('/changes/').json()['last_seq']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+            self.client.post('/product/create/', {'name': 'Grid'})
+            self.client.post('/license/create/', {'product_id': self.product.id, 'account_id': '2001'})
+
+        data = self.changes(start).json()
+        self.assertEqual(
+            [(event['kind'], event['action']) for event in data['events']],
+            [('license', 'updated'), ('product', 'created'), ('license', 'created')],
+        )
+        self.assertFalse(data['events'][0]['data']['is_active'])
+        self.assertEqual(data['events'][1]['data']['name'], 'Grid')
+        self.assertEqual(data['last_seq'], data['events'][-1]['seq'])
+        self.assertEqual(self.changes(data['events'][0]['seq']).json()['events'][0]['seq'], data['events'][1]['seq'])
+        self.assertEqual(self.changes(data['last_seq']).json(), {'events': [], 'last_seq': data['last_seq']})
+
+    def test_bulk_operations_are_recorded(self):
+        start = self.client.get('/changes/').json()['last_seq']
+        with self.captureOnCommitCallbacks(execute=True):
+            run_operations([
+                {'op': 'create', 'product_id': self.product.id, 'account_id': '2001'},
+                {'op': 'revoke', 'license_key': 'TXCT-AAAA'},
+            ])
+        events = self.changes(start).json()['events']
+        self.assertEqual(sorted(event['action'] for event in events), ['created', 'updated'])
+
+    def test_compaction_keeps_the_newest_event_and_reports_gaps(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                self.license.save()
+        newest = ChangeEvent.objects.latest('id').id
+        with override_settings(CHANGE_LOG={**settings.CHANGE_LOG, 'MAX_EVENTS': 1}):
+            self.assertGreater(compact(), 0)
+        self.assertEqual(list(ChangeEvent.objects.values_list('id', flat=True)), [newest])
+
+        response = self.changes(newest - 2)
+        self.assertEqual((response.status_code, response.json()['last_seq']), (410, newest))
+        self.assertEqual(self.changes(newest - 1).json()['events'][0]['seq'], newest)
+
+    def test_event_stream_is_only_served_under_asgi(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/license/revoke/', {'license_key': 'TXCT-AAAA'})
+        self.assertEqual(self.client.get('/changes/?after=0', HTTP_ACCEPT='text/event-stream').status_code, 406)
+
+        async def stream():
+            request = AsyncRequestFactory().get('/changes/', {'after': 0}, headers={'accept': 'text/event-stream'})
+            response = await AsyncChangeFeedView.as_view()(request)
+            return response, ''.join([chunk.decode() async for chunk in response.streaming_content])
+
+        with override_settings(CHANGE_LOG={**settings.CHANGE_LOG, 'STREAM_DURATION': 0.05}):
+            response, body = async_to_sync(stream)()
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: license\n', body)
+        self.assertIn('"license_key": "TXCT-AAAA"', body)
+
+
+class LicenseSearchTests(LicenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for key, account in (('TXCT-AAAB', '1001'), ('TXCT-ABCD', '100123'), ('TXCT-ZZZZ', '2001')):
+            BotLicense.objects.create(license_key=key, product=self.product, account_id=account)
+
+    def search(self, **params):
+        response = self.client.get('/licenses/search/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(license['license_key'] for license in response.json()['results'])
+
+    def test_exact_and_prefix_lookups(self):
+        self.assertEqual(self.search(q='txct-aa'), ['TXCT-AAAA', 'TXCT-AAAB'])
+        self.assertEqual(self.search(q='AB'), ['TXCT-ABCD'])
+        self.assertEqual(self.search(q='1001'), ['TXCT-AAAA', 'TXCT-AAAB', 'TXCT-ABCD'])
+        self.assertEqual(self.search(q='1001', match='exact'), ['TXCT-AAAA', 'TXCT-AAAB'])
+        self.assertEqual(self.search(q='TXCT-ZZZZ', match='exact', field='license_key'), ['TXCT-ZZZZ'])
+        self.assertEqual(self.search(q='2', field='license_key'), [])
+        self.assertEqual(self.client.get('/licenses/search/', {'q': '1', 'field': 'product'}).status_code, 400)
+        self.assertEqual(self.client.get('/licenses/search/').status_code, 400)
+
+    def test_admin_search_and_counts_are_bounded(self):
+        from django.contrib.auth.models import User
+        self.client.force_login(User.objects.create_superuser('staff', 'staff@example.com', 'pw'))
+        response = self.client.get('/admin/bot_license/botlicense/', {'q': '=2001'})
+        self.assertEqual([license.license_key for license in response.context['cl'].result_list], ['TXCT-ZZZZ'])
+
+        paginator = ApproximateCountPaginator(BotLicense.objects.filter(is_active=True).order_by('id'), 2)
+        paginator.limit = 3
+        self.assertEqual((paginator.count, paginator.num_pages), (3, 2))
+        self.assertEqual(ApproximateCountPaginator(BotLicense.objects.order_by('id'), 2).count, 4)
+
+
+class WarmupTests(LicenseTestCase):
+
+    def test_worker_warmup_loads_lookups_and_primes_recent_licenses(self):
+        self.assertEqual(set(warm_up_process()), {'routes', 'drf'})
+        ValidationEvent.objects.create(
+            license_key='TXCT-AAAA', account_id='1001', endpoint='ea-validate', status_code=200, created_at=timezone.now()
+        )
+        timings = warm_up_worker()
+        self.assertEqual(timings['licenses_primed'], 1)
+        self.assertEqual(key_filter.stats()['refreshes'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(license_cache.get('TXCT-AAAA').account_id, '1001')
+
+    def test_import_time_parsing(self):
+        from .management.commands.profile_startup import parse_import_times
+        stderr = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       250 |        250 |   django.utils\n'
+            'import time:      1000 |       1250 | django\n'
+        )
+        self.assertEqual(parse_import_times(stderr), {'django': 1.25})
+
+
+@override_settings(LICENSE_IMPORT={**settings.LICENSE_IMPORT, 'RUN_IN_WEB': False, 'CHUNK_SIZE': 2})
+class LicenseImportTests(LicenseTestCase):
+
+    def upload(self, text):
+        return self.client.post('/licenses/imports/', {'file': SimpleUploadedFile('licenses.csv', text.encode())})
+
+    def test_import_in_chunks_with_error_rows(self):
+        response = self.upload(
+            'product,account_id,expires_at\n'
+            f'{self.product.name},3001,2030-01-31\n'
+            'Unknown,3002,\n'
+            'scalper,3003,\n'
+            f'{self.product.name},,\n'
+            f'{self.product.name},3005,not-a-date\n'
+        )
+        self.assertEqual(response.status_code, 202)
+        job_id = response.json()['id']
+        self.assertEqual(response.json()['total_rows'], 5)
+
+        self.assertTrue(process_import(job_id))
+        data = self.client.get(f'/licenses/imports/{job_id}/').json()
+        self.assertEqual((data['status'], data['processed_rows'], data['progress']), ('completed', 5, 1.0))
+        self.assertEqual((data['created_licenses'], data['failed_rows']), (2, 3))
+        self.assertEqual([error['row'] for error in data['errors']], [2, 4, 5])
+        imported = BotLicense.objects.get(account_id='3001')
+        self.assertEqual(imported.expires_at.date().isoformat(), '2030-01-31')
+        self.assertTrue(key_filter.might_exist(imported.license_key))
+        self.assertEqual(LicenseStats.objects.get(product=self.product).total_licenses, 3)
+
+    def test_abandoned_import_resumes_from_the_last_chunk(self):
+        job_id = self.upload(
+            'product_id,account_id\n' + ''.join(f'{self.product.id},40{n}\n' for n in range(5))
+        ).json()['id']
+        # A runner created the first chunk and then died.
+        BotLicense.objects.bulk_create([
+            BotLicense(license_key=f'TXCT-RES{n}', product=self.product, account_id=f'40{n}') for n in range(2)
+        ])
+        LicenseImport.objects.filter(pk=job_id).update(
+            status=LicenseImport.RUNNING, processed_rows=2, heartbeat_at=timezone.now(),
+        )
+        self.assertFalse(process_import(job_id))
+
+        LicenseImport.objects.filter(pk=job_id).update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        call_command('process_imports', stdout=io.StringIO())
+        self.assertEqual(
+            sorted(BotLicense.objects.filter(account_id__startswith='40').values_list('account_id', flat=True)),
+            ['400', '401', '402', '403', '404'],
+        )
+        self.assertEqual(LicenseImport.objects.get(pk=job_id).status, LicenseImport.COMPLETED)
+
+    def test_runner_that_lost_the_job_leaves_its_status_alone(self):
+        job_id = self.upload(f'product_id,account_id\n{self.product.id},4100\n').json()['id']
+
+        def lose_job_and_crash(job_id, *args):
+            LicenseImport.objects.filter(pk=job_id).update(runner='another-runner')
+            raise RuntimeError('worker killed')
+
+        with mock.patch('bot_license.imports._import_chunk', lose_job_and_crash), \
+                self.assertLogs('bot_license.imports', 'ERROR'):
+            process_import(job_id)
+        self.assertEqual(LicenseImport.objects.get(pk=job_id).status, LicenseImport.RUNNING)
+
+    def test_rejects_files_without_the_required_columns(self):
+        response = self.upload('key,account\nTXCT-AAAA,1\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(LicenseImport.objects.exists())
+
+
+
+class ProjectionTests(LicenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.other = Product.objects.create(name='Grid\u2028Bot — «ünïcode»', description='', version='2.0')
+        BotLicense.objects.create(
+            license_key='TXCT-BBBB', product=self.other, account_id='1002',
+            expires_at=timezone.now().replace(microsecond=123456) + timedelta(days=3),
+        )
+
+    def test_output_matches_drf_serializers_byte_for_byte(self):
+        queryset = BotLicense.objects.order_by('id')
+        expected = JSONRenderer().render(LicenseSerializer(queryset, many=True).data)
+        self.assertEqual(FastJSONRenderer().render(license_rows(license_values(queryset))), expected)
+        self.assertIn(b'\\u2028', expected)
+        self.assertEqual(
+            FastJSONRenderer().render(product_rows()),
+            JSONRenderer().render(ProductSerializer(Product.objects.all(), many=True).data),
+        )
+
+    def test_products_reload_when_the_table_changes(self):
+        self.client.get('/licenses/')
+        loads = product_table.loads
+        self.client.get('/licenses/')
+        self.assertEqual(product_table.loads, loads)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.other.name = 'Renamed'
+            self.other.save()
+        names = {item['product']['name'] for item in self.client.get('/licenses/').json()['results']}
+        self.assertEqual(names, {'Scalper', 'Renamed'})
+
+    def test_serialization_benchmark_reports_both_paths(self):
+        results = run_serialization_benchmark(rows=10, repeat=1)
+        self.assertEqual(set(results), {'drf', 'fast'})
+        self.assertEqual(results['fast']['rows'], 2)
+
+
+class SeatTests(LicenseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        BotLicense.objects.filter(pk=self.license.pk).update(max_seats=2)
+
+    def activate(self, account):
+        return self.client.post('/license/activate/', {'license_key': 'TXCT-AAAA', 'account_id': account})
+
+    def validate(self, account):
+        return self.client.post('/ea/validate/', {'license_key': 'TXCT-AAAA', 'account_id': account})
+
+    def seats_used(self):
+        return BotLicense.objects.values_list('seats_used', flat=True).get(pk=self.license.pk)
+
+    def test_accounts_share_a_limited_number_of_seats(self):
+        self.assertEqual(self.validate('2001').json()['valid'], 'License is not activated for this account.')
+        self.assertEqual(self.activate('2001').status_code, 200)
+        self.assertEqual(self.activate('2001').json()['seats_used'], 1)
+        self.assertEqual(self.activate('2002').status_code, 200)
+        self.assertEqual(self.activate('2003').status_code, 409)
+        self.assertEqual(self.validate('2001').status_code, 200)
+        self.assertEqual(self.validate('2003').status_code, 403)
+
+        released = self.client.post('/license/deactivate/', {'license_key': 'TXCT-AAAA', 'account_id': '2002'})
+        self.assertEqual(released.json()['seats_used'], 1)
+        self.assertEqual(self.activate('2003').status_code, 200)
+        self.assertEqual(self.seats_used(), LicenseActivation.objects.count())
+
+    def test_stale_seats_are_taken_over_and_reclaimed(self):
+        self.activate('2001')
+        self.activate('2002')
+        LicenseActivation.objects.filter(account_id='2001').update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.activate('2003').status_code, 200)
+        self.assertEqual(self.validate('2001').status_code, 403)
+
+        LicenseActivation.objects.update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        out = io.StringIO()
+        call_command('reclaim_seats', stdout=out)
+        self.assertIn('2 stale seat(s)', out.getvalue())
+        self.assertEqual(self.seats_used(), 0)
+
+    def test_validation_refreshes_heartbeats_when_due(self):
+        self.activate('2001')
+        LicenseActivation.objects.update(heartbeat_at=timezone.now() - timedelta(minutes=5))
+        with self.assertNumQueries(2):
+            self.assertTrue(seats.has_seat('TXCT-AAAA', '2001'))
+        with self.assertNumQueries(1):
+            self.assertTrue(seats.has_seat('TXCT-AAAA', '2001'))
+
+    def test_account_seated_by_a_concurrent_request_gives_the_seat_back(self):
+        claim = seats._claim
+
+        def racing_claim(license_id):
+            # Another request seats the same account between our check and our claim.
+            LicenseActivation.objects.create(license_id=license_id, account_id='2001')
+            BotLicense.objects.filter(pk=license_id).update(seats_used=1)
+            return claim(license_id)
+
+        with mock.patch.object(seats, '_claim', racing_claim):
+            self.assertEqual(seats.activate_seat(self.license, '2001'), (False, 1))
+        self.assertEqual(self.seats_used(), 1)
+
+    def test_activation_answers_from_the_claim(self):
+        self.activate('2001')
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.activate('2002').json()['seats_used'], 2)
+        # Only the license lookup reads; the count comes back from the claim.
+        self.assertEqual(sum(query['sql'].startswith('SELECT') for query in captured), 1)
+        with mock.patch.object(seats, '_lock_license', return_value=None):
+            self.assertEqual(self.activate('2003').status_code, 404)
+
+    async def test_async_validation_checks_seats(self):
+        await sync_to_async(self.activate)('2001')
+        for account, code in (('2001', 200), ('2002', 403)):
+            request = AsyncRequestFactory().post(
+                '/ea/validate/', urlencode({'license_key': 'TXCT-AAAA', 'account_id': account}),
+                content_type='application/x-www-form-urlencoded',
+            )
+            self.assertEqual((await AsyncEAValidate.as_view()(request)).status_code, code)
+
+    def test_batch_checks_every_seat_in_one_query(self):
+        self.activate('2001')
+        items = [{'license_key': 'TXCT-AAAA', 'account_id': account} for account in ('2001', '2002', '1001')]
+        license_cache.get('TXCT-AAAA')
+        with self.assertNumQueries(1):
+            response = self.client.post('/ea/validate/batch/', {'licenses': items}, content_type='application/json')
+        self.assertEqual([result['status'] for result in response.json()['results']], [200, 403, 403])
+
+    def test_single_seat_licenses_toggle_is_active(self):
+        BotLicense.objects.filter(pk=self.license.pk).update(max_seats=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/license/deactivate/', {'license_key': 'TXCT-AAAA', 'account_id': '1001'})
+        self.assertEqual(response.json()['detail'], 'License has been deactivated.')
+        self.assertFalse(license_cache.get('TXCT-AAAA').is_active)
+        self.assertEqual(LicenseStats.objects.get(product=self.product).active_licenses, 0)
 
-# Create your tests here.
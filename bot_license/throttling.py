@@ -0,0 +1,122 @@
+import ipaddress
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+
+def client_ip(request):
+    """
+    The client's address as recorded by the nearest trusted proxy, or ``None`` if it is not an IP.
+
+    Each of the ``TRUSTED_PROXY_HOPS`` proxies in front of the app (Heroku's
+    router is one) appends the address it was connected from to
+    ``X-Forwarded-For``, so the client is that many entries from the right.
+    Entries further left were sent by the client and are ignored. Without
+    trusted proxies, or when the header is shorter than that, ``REMOTE_ADDR``
+    is used.
+    """
+    address = request.META.get('REMOTE_ADDR')
+    hops = getattr(settings, 'TRUSTED_PROXY_HOPS', 0)
+    if hops:
+        forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+        if len(forwarded) >= hops:
+            address = forwarded[-hops]
+    try:
+        return str(ipaddress.ip_address(address))
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """
+    Per-identity token buckets refilled at ``rate`` tokens per second up to ``burst``.
+
+    At most ``max_tracked`` identities are remembered; the least recently
+    seen are forgotten first, which only ever gives them a fresh bucket.
+    """
+
+    def __init__(self, rate, burst, max_tracked=100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_tracked = max_tracked
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, ident, now=None):
+        """Take one token; returns 0 if allowed, otherwise seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(ident, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / self.rate
+            self._buckets[ident] = (tokens, now)
+            if len(self._buckets) > self.max_tracked:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class ValidationThrottle:
+    """Per-IP and per-license-key token buckets shared by the validation endpoints."""
+
+    def __init__(self, ip_rate=50, ip_burst=200, key_rate=10, key_burst=50, max_tracked=100000, enabled=True):
+        self.enabled = enabled
+        self.by_ip = TokenBucket(ip_rate, ip_burst, max_tracked)
+        self.by_key = TokenBucket(key_rate, key_burst, max_tracked)
+        self.throttled = 0
+
+    def check(self, ip, license_key=None):
+        """Returns ``None`` if the request may proceed, else the seconds to wait."""
+        if not self.enabled:
+            return None
+        wait = self.by_ip.consume(ip)
+        if not wait and license_key:
+            wait = self.by_key.consume(str(license_key))
+        if wait:
+            self.throttled += 1
+            return wait
+        return None
+
+    def reset(self):
+        self.by_ip.reset()
+        self.by_key.reset()
+        self.throttled = 0
+
+
+def _build_throttle():
+    config = getattr(settings, 'VALIDATION_THROTTLE', {})
+    return ValidationThrottle(
+        ip_rate=config.get('IP_RATE', 50),
+        ip_burst=config.get('IP_BURST', 200),
+        key_rate=config.get('KEY_RATE', 10),
+        key_burst=config.get('KEY_BURST', 50),
+        max_tracked=config.get('MAX_TRACKED', 100000),
+        enabled=config.get('ENABLED', True),
+    )
+
+
+validation_throttle = _build_throttle()
+
+
+class ValidationRateThrottle(BaseThrottle):
+    """DRF throttle class backed by ``validation_throttle``."""
+
+    def allow_request(self, request, view):
+        license_key = view.kwargs.get('license_key')
+        if license_key is None and isinstance(request.data, dict):
+            license_key = request.data.get('license_key')
+        self._wait = validation_throttle.check(client_ip(request) or '', license_key)
+        return self._wait is None
+
+    def wait(self):
+        return self._wait
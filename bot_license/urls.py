@@ -1,17 +1,48 @@
+from django.conf import settings
 from django.urls import path
-from .views import CreateLicenseView, CreateProductView, RevokeLicenseView, VerifyLIcenseView, LicenseDetailsView, AllLicensesView, AllProductsView, DashboardView, HealthCheckView, EAValidate, ActivateLicense, DeactivateLicense
+from .views import CreateLicenseView, CreateProductView, RevokeLicenseView, VerifyLIcenseView, LicenseDetailsView, LicenseActivityView, AllLicensesView, BulkLicenseView, LicenseImportView, LicenseImportStatusView, LicenseSearchView, ExpiringLicensesView, AllProductsView, DashboardView, KeySpaceView, ChangeFeedView, ExportView, HealthCheckView, MetricsView, EAValidate, BatchEAValidate, ActivateLicense, DeactivateLicense
 
 urlpatterns = [
     path('product/create/', CreateProductView.as_view(), name='create-product'),
     path('license/create/', CreateLicenseView.as_view(), name='create-license'),
     path('license/verify/', VerifyLIcenseView.as_view(), name='verify-license'),
     path('license/revoke/', RevokeLicenseView.as_view(), name='revoke-license'),
+    # Before license/<str:license_key>/, which would otherwise swallow them.
+    path('license/activate/', ActivateLicense.as_view(), name='activate-license'),
+    path('license/deactivate/', DeactivateLicense.as_view(), name='deactivate-license'),
     path('license/<str:license_key>/', LicenseDetailsView.as_view(), name='license-details'),
+    path('license/<str:license_key>/activity/', LicenseActivityView.as_view(), name='license-activity'),
     path('licenses/', AllLicensesView.as_view(), name='all-licenses'),
+    path('licenses/bulk/', BulkLicenseView.as_view(), name='bulk-licenses'),
+    path('licenses/imports/', LicenseImportView.as_view(), name='license-imports'),
+    path('licenses/imports/<int:pk>/', LicenseImportStatusView.as_view(), name='license-import-status'),
+    path('licenses/search/', LicenseSearchView.as_view(), name='search-licenses'),
+    path('licenses/expiring/', ExpiringLicensesView.as_view(), name='expiring-licenses'),
     path('products/', AllProductsView.as_view(), name='all-products'),
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('keyspace/', KeySpaceView.as_view(), name='key-space'),
+    path('changes/', ChangeFeedView.as_view(), name='change-feed'),
+    path('export/<str:table>/', ExportView.as_view(), name='export'),
     path('health/', HealthCheckView.as_view(), name='health-check'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('ea/validate/', EAValidate.as_view(), name='ea-validate-license'),
-    path('license/activate/', ActivateLicense.as_view(), name='activate-license'),
-    path('license/deactivate/', DeactivateLicense.as_view(), name='deactivate-license'),
-]
\ No newline at end of file
+    path('ea/validate/batch/', BatchEAValidate.as_view(), name='ea-validate-batch'),
+]
+
+if settings.ASYNC_VIEWS:
+    from .async_views import (
+        AsyncChangeFeedView, AsyncEAValidate, AsyncHealthCheckView, AsyncLicenseDetailsView, AsyncVerifyLicenseView,
+    )
+
+    async_views = {
+        'verify-license': AsyncVerifyLicenseView,
+        'license-details': AsyncLicenseDetailsView,
+        'health-check': AsyncHealthCheckView,
+        'ea-validate-license': AsyncEAValidate,
+        'change-feed': AsyncChangeFeedView,
+    }
+    urlpatterns = [
+        path(str(pattern.pattern), async_views[pattern.name].as_view(), name=pattern.name)
+        if pattern.name in async_views else pattern
+        for pattern in urlpatterns
+    ]
@@ -1,24 +1,110 @@
-import secrets
+import hashlib
 import string
-from .models import BotLicense
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import BotLicense, KeyAllocator
+
+
+KEY_PREFIX = 'TXCT-'
+KEY_CHARS = string.ascii_uppercase + string.digits
+KEY_LENGTH = 4
+HALF_SPACE = len(KEY_CHARS) ** (KEY_LENGTH // 2)
+KEY_SPACE = HALF_SPACE * HALF_SPACE
+FEISTEL_ROUNDS = 6
+ALLOCATOR_NAME = 'license_key'
+CHECK_CHUNK_SIZE = 900
+
+
+@lru_cache(maxsize=2)
+def _round_tables(secret):
+    """Precompute the Feistel round function for every half-block value."""
+    tables = []
+    for round_number in range(FEISTEL_ROUNDS):
+        table = []
+        for value in range(HALF_SPACE):
+            digest = hashlib.blake2b(
+                f'{round_number}:{value}'.encode(), key=secret.encode()[:64], digest_size=8
+            ).digest()
+            table.append(int.from_bytes(digest, 'big') % HALF_SPACE)
+        tables.append(table)
+    return tables
+
+
+def _permutation_secret():
+    return getattr(settings, 'LICENSE_KEY_PERMUTATION_SECRET', None) or settings.SECRET_KEY
+
+
+def permute_index(index, secret=None):
+    """
+    Map ``index`` in ``[0, KEY_SPACE)`` to a unique position in the key space.
+
+    A keyed Feistel network over two base-36 halves is a bijection, so
+    consecutive indices give distinct, unpredictable keys without probing.
+    """
+    tables = _round_tables(secret or _permutation_secret())
+    left, right = divmod(index, HALF_SPACE)
+    for table in tables:
+        left, right = right, (left + table[right]) % HALF_SPACE
+    return left * HALF_SPACE + right
+
+
+def key_for_index(index, secret=None):
+    value = permute_index(index, secret)
+    chars = []
+    for _ in range(KEY_LENGTH):
+        value, digit = divmod(value, len(KEY_CHARS))
+        chars.append(KEY_CHARS[digit])
+    return KEY_PREFIX + ''.join(reversed(chars))
+
+
+def mint_license_keys(count):
+    """
+    Reserve ``count`` unused license keys.
+
+    Keys are taken from a persistent counter walked through ``permute_index``,
+    so each call costs a locked counter update plus one ``license_key__in``
+    query per ``CHECK_CHUNK_SIZE`` keys to skip keys that predate the
+    allocator (e.g. old random keys).
+    """
+    if count < 1:
+        return []
+
+    with transaction.atomic():
+        allocator, _ = KeyAllocator.objects.select_for_update().get_or_create(name=ALLOCATOR_NAME)
+        index = allocator.next_index
+        keys = []
+        while len(keys) < count:
+            needed = count - len(keys)
+            if index + needed > KEY_SPACE:
+                raise ValueError("License key space is exhausted")
+            candidates = [key_for_index(i) for i in range(index, index + needed)]
+            index += needed
+            taken = set()
+            for start in range(0, len(candidates), CHECK_CHUNK_SIZE):
+                taken.update(BotLicense.objects.filter(
+                    license_key__in=candidates[start:start + CHECK_CHUNK_SIZE]
+                ).values_list('license_key', flat=True))
+            keys.extend(key for key in candidates if key not in taken)
+
+        allocator.next_index = index
+        allocator.save(update_fields=['next_index', 'updated_at'])
+    return keys
 
 
 def generate_license_key():
+    return mint_license_keys(1)[0]
+
 
-    def generate_segment():
-        """Generate a 4-character alphanumeric segment"""
-        chars = string.ascii_uppercase + string.digits
-        return ''.join(secrets.choice(chars) for _ in range(4))
-    
-    # Keep generating until we find a unique key
-    max_attempts = 100
-    for _ in range(max_attempts):
-        # Generate the license key
-        segment = generate_segment()
-        license_key = f"TXCT-{segment}"
-        
-        # Check if this key already exists
-        if not BotLicense.objects.filter(license_key=license_key).exists():
-            return license_key
-    
-    raise ValueError("Unable to generate a unique license key after maximum attempts")
\ No newline at end of file
+def key_space_usage():
+    allocated = KeyAllocator.objects.filter(name=ALLOCATOR_NAME).values_list('next_index', flat=True).first() or 0
+    issued = BotLicense.objects.count()
+    return {
+        'capacity': KEY_SPACE,
+        'allocated': allocated,
+        'issued': issued,
+        'remaining': KEY_SPACE - allocated,
+        'used_ratio': round(allocated / KEY_SPACE, 6),
+    }
@@ -0,0 +1,40 @@
+from asgiref.sync import sync_to_async
+from rest_framework import status
+
+from .seats import has_seat
+
+
+LICENSE_KEY_REQUIRED = ('License key is required.', status.HTTP_400_BAD_REQUEST)
+LICENSE_KEY_NOT_STRING = ('License key must be a string.', status.HTTP_400_BAD_REQUEST)
+INVALID_LICENSE_KEY = ('Invalid license key.', status.HTTP_404_NOT_FOUND)
+ACCOUNT_MISMATCH = ('Account ID does not match.', status.HTTP_403_FORBIDDEN)
+LICENSE_EXPIRED = ('License has expired.', status.HTTP_403_FORBIDDEN)
+NO_SEAT = ('License is not activated for this account.', status.HTTP_403_FORBIDDEN)
+LICENSE_VALID = ('License is valid.', status.HTTP_200_OK)
+
+
+def check_license(license, account=None, seat_check=None):
+    """
+    Apply the EA validation rules to a license snapshot.
+
+    Returns a ``(message, status_code)`` pair; ``license`` is ``None`` when the
+    key does not exist. Seat-limited licenses accept any account holding a
+    seat instead of their ``account_id``; ``seat_check(license_key, account)``
+    decides that and defaults to ``seats.has_seat``, the only database access.
+    """
+    if license is None:
+        return INVALID_LICENSE_KEY
+    if account and not license.seat_limited and not license.matches_account(account):
+        return ACCOUNT_MISMATCH
+    if license.expired():
+        return LICENSE_EXPIRED
+    if account and license.seat_limited and not (seat_check or has_seat)(license.license_key, account):
+        return NO_SEAT
+    return LICENSE_VALID
+
+
+async def acheck_license(license, account=None):
+    """``check_license`` for async callers; only seat lookups leave the event loop."""
+    if license is not None and account and license.seat_limited:
+        return await sync_to_async(check_license)(license, account)
+    return check_license(license, account)
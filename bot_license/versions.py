@@ -0,0 +1,92 @@
+"""
+Change versions for conditional GETs.
+
+Each ``TableVersion`` row counts writes to one group of tables. The row is
+bumped inside the writing transaction by the model signals in
+``bot_license.signals`` and by ``licenses_bulk_changed``, so a version moves
+exactly when the writes it covers become visible. ``conditional`` turns the versions a view depends
+on into an ``ETag`` and ``Last-Modified`` pair. It reads them with a single
+primary-key query, so an ``If-None-Match`` hit is answered with 304 before the
+view's own queries or serializers run.
+"""
+from functools import wraps
+
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .models import TableVersion
+
+
+PRODUCTS = 'products'
+LICENSES = 'licenses'
+LICENSE_STATS = 'license_stats'
+
+
+def bump(*names):
+    """
+    Advance the versions of ``names`` in the current transaction.
+
+    The version rows stay locked until the transaction commits, so writers
+    call this after the writes it covers, as their last statements.
+    """
+    now = timezone.now()
+    for name in names:
+        if not TableVersion.objects.filter(name=name).update(version=F('version') + 1, updated_at=now):
+            TableVersion.objects.get_or_create(name=name, defaults={'version': 1, 'updated_at': now})
+
+
+def current(request, names):
+    """``{name: (version, updated_at)}`` for ``names``, read once per request."""
+    cached = getattr(request, '_table_versions', None)
+    if cached is None or not cached.keys() >= set(names):
+        rows = dict.fromkeys(names, (0, None))
+        rows.update(
+            (name, (version, updated_at))
+            for name, version, updated_at in TableVersion.objects.filter(name__in=names)
+            .values_list('name', 'version', 'updated_at')
+        )
+        cached = request._table_versions = {**(cached or {}), **rows}
+    return {name: cached[name] for name in names}
+
+
+def conditional(*names, precheck=None, etag_func=None):
+    """
+    Method decorator adding ``ETag``/``Last-Modified`` from the versions of ``names``.
+
+    Responses also carry ``Cache-Control: no-cache`` so browsers revalidate
+    with ``If-None-Match`` instead of reusing or refetching blindly. A
+    ``precheck(request, *args, **kwargs)`` that returns a response short-cuts
+    the view before the version query, e.g. for keys that cannot exist. An
+    ``etag_func(request, *args, **kwargs)`` replaces the version ``ETag`` for
+    views that depend on single rows rather than whole tables; their
+    responses carry no ``Last-Modified``.
+    """
+    def etag(request, *args, **kwargs):
+        versions = current(request, names)
+        return '-'.join(str(versions[name][0]) for name in names)
+
+    def last_modified(request, *args, **kwargs):
+        stamps = [updated_at for _, updated_at in current(request, names).values() if updated_at is not None]
+        return max(stamps) if stamps else None
+
+    def decorator(view):
+        if etag_func is not None:
+            conditional_view = condition(etag_func=etag_func)(view)
+        else:
+            conditional_view = condition(etag_func=etag, last_modified_func=last_modified)(view)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if precheck is not None:
+                response = precheck(request, *args, **kwargs)
+                if response is not None:
+                    return response
+            response = conditional_view(request, *args, **kwargs)
+            patch_cache_control(response, no_cache=True)
+            return response
+        return wrapper
+
+    return method_decorator(decorator, name='get')
@@ -1,16 +1,61 @@
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework import status
+from datetime import datetime, timedelta
 from django.utils import timezone
 from .serializers import LicenseSerializer, ProductSerializer
-from .models import BotLicense, Product
-from .utils import generate_license_key
-from django.http import JsonResponse
+from .projections import (
+    LICENSE_FIELDS, license_etag, license_rows, license_values, product_row, product_rows, products_version,
+)
+from .renderers import FastJSONRenderer
+from .models import BotLicense, LicenseImport, ValidationEvent
+from .utils import generate_license_key, key_space_usage
+from .cache import license_cache
+from .validation import LICENSE_KEY_NOT_STRING, LICENSE_KEY_REQUIRED, check_license
+from .seats import SeatError, activate_seat, release_seat, seated_pairs
+from .signals import lock_license_state
+from .leases import issue_lease
+from .pagination import ExpiryCursorPagination, LicenseCursorPagination
+from .exports import EXPORTS, FORMATS, stream_export
+from .stats import dashboard_stats
+from .metrics import check_database, pool_stats, registry, scrape_allowed
+from .events import event_buffer, record_validation
+from .keyfilter import key_filter
+from .licensetable import license_table
+from .throttling import ValidationRateThrottle, validation_throttle
+from .bulk import run_operations
+from .imports import InvalidImport, create_import, job_status, start_import
+from .expiry import expiring_soon
+from .versions import LICENSE_STATS, LICENSES, PRODUCTS, conditional
+from .routers import replica_health, use_replicas
+from .search import FIELDS, MATCHES, PREFIX, search_licenses
+from .changes import ChangeLogGap, events_after, last_seq, serialize
+from django.db import transaction
+from django.db.models import Count, Max
+from rest_framework.exceptions import ValidationError
+from django.utils.dateparse import parse_date, parse_datetime
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 
 
+def parse_query_datetime(value, param):
+    try:
+        parsed = parse_datetime(value)
+        day = parse_date(value) if parsed is None else None
+    except ValueError:
+        parsed = day = None
+    if parsed is None:
+        if day is None:
+            raise ValidationError({param: 'Must be an ISO 8601 date or datetime.'})
+        parsed = datetime.combine(day, datetime.min.time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
 
 class CreateProductView(APIView):
     def post(self, request):
@@ -25,52 +70,97 @@ class CreateLicenseView(APIView):
     def post(self, request):
         serializer = LicenseSerializer(data=request.data)
         if serializer.is_valid():
-            license = serializer.save()
+            # One transaction for the row, its stats delta, change event and version bump.
+            with transaction.atomic():
+                license = serializer.save()
             return Response(LicenseSerializer(license).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+@method_decorator(use_replicas, name='dispatch')
 class VerifyLIcenseView(APIView):
+    throttle_classes = [ValidationRateThrottle]
     def post(self, request):
         license_key = request.data.get('license_key')
         account = request.data.get('account_id')
 
-        try:
-            license = BotLicense.objects.get(license_key=license_key)
-        except BotLicense.DoesNotExist:
-            return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
-
-        if license.expired():
-            return Response({'detail': 'License has expired.'}, status=status.HTTP_403_FORBIDDEN)
-
+        license = license_cache.get(license_key)
+        if license is None:
+            response = Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
+        elif license.expired():
+            response = Response({'detail': 'License has expired.'}, status=status.HTTP_403_FORBIDDEN)
+        else:
+            response = Response({'detail': 'License is valid.'}, status=status.HTTP_200_OK)
 
-        return Response({'detail': 'License is valid.'}, status=status.HTTP_200_OK)
+        record_validation(request, license_key, account, 'license-verify', response.status_code)
+        return response
     
 
 class RevokeLicenseView(APIView):
     def post(self, request):
         license_key = request.data.get('license_key')
 
-        try:
-            license = BotLicense.objects.get(license_key=license_key)
-        except BotLicense.DoesNotExist:
+        if not set_license_active(license_key, False):
             return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
 
-        license.is_active = False
-        license.save()
-
         return Response({'detail': 'License has been revoked.'}, status=status.HTTP_200_OK)
 
 
+def reject_unknown_key(request, license_key):
+    if not key_filter.might_exist(license_key):
+        return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
+
+
+def license_details_row(request, license_key):
+    """The license's ``values(*LICENSE_FIELDS)`` row, or ``None``, read once per request."""
+    if not hasattr(request, '_license_row'):
+        request._license_row = BotLicense.objects.values(*LICENSE_FIELDS).filter(license_key=license_key).first()
+    return request._license_row
+
+
+def license_details_etag(request, license_key):
+    row = license_details_row(request, license_key)
+    return license_etag(row, products_version(request)) if row is not None else None
+
+
+@method_decorator(use_replicas, name='dispatch')
+@conditional(precheck=reject_unknown_key, etag_func=license_details_etag)
 class LicenseDetailsView(APIView):
+    """
+    One license. Its ``ETag`` covers only this row and the products, so
+    writes to other licenses do not invalidate a client's copy.
+    """
+    throttle_classes = [ValidationRateThrottle]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
     def get(self, request, license_key):
-        try:
-            license = BotLicense.objects.get(license_key=license_key)
-        except BotLicense.DoesNotExist:
+        row = license_details_row(request, license_key)
+        if row is None:
             return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = LicenseSerializer(license)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(license_rows([row], request)[0], status=status.HTTP_200_OK)
+
+
+class LicenseActivityView(APIView):
+    """Validation count and last sighting per account, from the validation event log."""
+
+    def get(self, request, license_key):
+        accounts = list(
+            ValidationEvent.objects.filter(license_key=license_key)
+            .values('account_id')
+            .annotate(
+                validation_count=Count('id'),
+                last_seen=Max('created_at'),
+                distinct_ips=Count('ip_address', distinct=True),
+            )
+            .order_by('-last_seen')
+        )
+        return Response({
+            'license_key': license_key,
+            'validation_count': sum(row['validation_count'] for row in accounts),
+            'last_seen': accounts[0]['last_seen'] if accounts else None,
+            'accounts': accounts,
+        }, status=status.HTTP_200_OK)
 
 
 class IssueLicenseView(APIView):
@@ -83,108 +173,450 @@ class IssueLicenseView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
 
+@method_decorator(use_replicas, name='dispatch')
+@conditional(PRODUCTS)
 class AllProductsView(APIView):
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def get(self, request):
-        products = Product.objects.all()
-        serializer = ProductSerializer(products, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return Response(product_rows(), status=status.HTTP_200_OK)
 
 
+@method_decorator(use_replicas, name='dispatch')
+@conditional(LICENSES, PRODUCTS)
 class AllLicensesView(APIView):
+    """
+    Cursor-paginated license listing.
 
-    def get(self, request):
+    Optional filters: ``product`` (id), ``is_active`` (true/false) and
+    ``expires_after`` / ``expires_before`` (ISO 8601 date or datetime).
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_queryset(self, request):
         licenses = BotLicense.objects.all()
-        serializer = LicenseSerializer(licenses, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        params = request.query_params
+
+        if params.get('product'):
+            if not params['product'].isdigit():
+                raise ValidationError({'product': 'Must be a product id.'})
+            licenses = licenses.filter(product_id=int(params['product']))
 
+        if params.get('is_active'):
+            value = params['is_active'].lower()
+            if value not in ('true', 'false', '1', '0'):
+                raise ValidationError({'is_active': 'Must be true or false.'})
+            licenses = licenses.filter(is_active=value in ('true', '1'))
 
+        for param, lookup in (('expires_after', 'expires_at__gte'), ('expires_before', 'expires_at__lt')):
+            if params.get(param):
+                licenses = licenses.filter(**{lookup: parse_query_datetime(params[param], param)})
+
+        return licenses
+
+    def get(self, request):
+        paginator = LicenseCursorPagination()
+        page = paginator.paginate_queryset(license_values(self.get_queryset(request)), request, view=self)
+        return paginator.get_paginated_response(license_rows(page, request))
+
+
+@method_decorator(use_replicas, name='dispatch')
+@conditional(LICENSES, PRODUCTS)
+class LicenseSearchView(APIView):
+    """
+    Licenses whose key or account starts with (or, with ``match=exact``, equals) ``?q=``.
+
+    ``field`` narrows the search to ``license_key`` or ``account_id``.
+    Results are cursor-paginated like the full listing.
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request):
+        params = request.query_params
+        query = params.get('q', '').strip()
+        if not query:
+            raise ValidationError({'q': 'This parameter is required.'})
+        match = params.get('match', PREFIX)
+        if match not in MATCHES:
+            raise ValidationError({'match': 'Must be exact or prefix.'})
+        fields = FIELDS
+        if params.get('field'):
+            if params['field'] not in FIELDS:
+                raise ValidationError({'field': 'Must be license_key or account_id.'})
+            fields = (params['field'],)
+
+        paginator = LicenseCursorPagination()
+        page = paginator.paginate_queryset(license_values(search_licenses(query, fields, match)), request, view=self)
+        return paginator.get_paginated_response(license_rows(page, request))
+
+
+@method_decorator(use_replicas, name='dispatch')
+class ExpiringLicensesView(APIView):
+    """Active licenses expiring within ``?days=`` (default from settings), soonest first."""
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request):
+        days = request.query_params.get('days', str(settings.EXPIRY_SWEEP['REMIND_WITHIN_DAYS']))
+        if not days.isdigit():
+            raise ValidationError({'days': 'Must be a whole number of days.'})
+        paginator = ExpiryCursorPagination()
+        licenses = license_values(expiring_soon(timedelta(days=int(days))))
+        page = paginator.paginate_queryset(licenses, request, view=self)
+        return paginator.get_paginated_response(license_rows(page, request))
+
+
+@method_decorator(use_replicas, name='dispatch')
+@conditional(PRODUCTS, LICENSES, LICENSE_STATS)
 class DashboardView(APIView):
+    """
+    Dashboard counters served from ``LicenseStats`` in a single query.
+
+    Expired counts advance with time, so they are as fresh as the last
+    ``reconcile_stats`` run for licenses that expired without being saved.
+    """
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def get(self, request):
-        total_products = Product.objects.count()
-        
-        active_licenses = BotLicense.objects.filter(is_active=True).count()
-        
-        now = timezone.now()
-        expired_licenses = BotLicense.objects.filter(
-            expires_at__lt=now
-        ).count()
-        
-        recent_products = Product.objects.order_by('-created_at')[:5]
-        products_data = ProductSerializer(recent_products, many=True).data
-        
+        totals, breakdown, products = dashboard_stats()
+
+        recent_products = sorted(
+            products, key=lambda product: (product.created_at is not None, product.created_at, product.id),
+            reverse=True
+        )[:5]
+        products_data = [product_row(product) for product in recent_products]
+
         return Response({
-            'total_products': total_products,
-            'active_licenses': active_licenses,
-            'expired_licenses': expired_licenses,
-            'recent_products': products_data
+            **totals,
+            'recent_products': products_data,
+            'products': breakdown,
         }, status=status.HTTP_200_OK)
     
 
+class KeySpaceView(APIView):
+
+    def get(self, request):
+        return Response(key_space_usage(), status=status.HTTP_200_OK)
+
+
+class ExportView(View):
+    """Stream a full table dump; ``?format=ndjson`` (default) or ``?format=csv``."""
+
+    def get(self, request, table):
+        if table not in EXPORTS:
+            return JsonResponse({'detail': 'Unknown export.'}, status=404)
+        fmt = request.GET.get('format', 'ndjson')
+        if fmt not in FORMATS:
+            return JsonResponse({'detail': 'Format must be ndjson or csv.'}, status=400)
+
+        response = StreamingHttpResponse(stream_export(table, fmt), content_type=FORMATS[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{table}.{fmt}"'
+        return response
+
+
+class ChangeFeedView(View):
+    """
+    License and product changes after ``?after=`` (or ``Last-Event-ID``).
+
+    A short poll: it answers at once with the settled events after the
+    position, and clients call it again on a timer. Without a position the
+    current ``last_seq`` is returned, to resume from after loading the lists.
+    Server-sent event streams are only served under ASGI, by
+    ``AsyncChangeFeedView``; here they would hold a sync worker for minutes.
+    """
+
+    def get(self, request):
+        after = request.GET.get('after') or request.headers.get('Last-Event-ID')
+        if after is not None and not after.isdigit():
+            return JsonResponse({'detail': 'after must be a sequence number.'}, status=400)
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            return JsonResponse(
+                {'detail': 'Event streams are only served by the ASGI process; poll with ?after= instead.'},
+                status=406,
+            )
+        if after is None:
+            return JsonResponse({'events': [], 'last_seq': last_seq()})
+        return change_poll(int(after))
+
+
+def change_poll(after):
+    """The JSON answer to a poll from ``after``: its events, or 410 if it was compacted away."""
+    try:
+        events = events_after(after)
+    except ChangeLogGap as gap:
+        return JsonResponse(
+            {'detail': 'Position has been compacted; reload and resume from last_seq.', 'last_seq': gap.last_seq},
+            status=410,
+        )
+    return JsonResponse({
+        'events': [serialize(event) for event in events],
+        'last_seq': events[-1].id if events else after,
+    })
+
+
 class HealthCheckView(View):
     def get(self, request):
+        database = check_database()
+        healthy = database['status'] == 'ok'
         return JsonResponse({
-            'status': 'healthy',
+            'status': 'healthy' if healthy else 'unhealthy',
             'service': 'TxxCrypt License Manager',
-            'version': '1.0.0'
-        })
+            'version': '1.0.0',
+            'database': database,
+            'database_pools': pool_stats(),
+            'license_cache': license_cache.stats(),
+            'validation_events': event_buffer.stats(),
+            'key_filter': key_filter.stats(),
+            'license_table': license_table.stats(),
+            'throttled_requests': validation_throttle.throttled,
+            'read_replicas': replica_health.stats(),
+        }, status=200 if healthy else 503)
+
+
+class MetricsView(View):
+    """This worker's metrics, for scrapers holding the metrics token or on the private network."""
+
+    def get(self, request):
+        if not scrape_allowed(request):
+            return JsonResponse({'detail': 'Metrics require the metrics token.'}, status=403)
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
+@method_decorator(use_replicas, name='dispatch')
 @method_decorator(csrf_exempt, name='dispatch')
 class EAValidate(APIView):
+    throttle_classes = [ValidationRateThrottle]
 
     def post (self, request):
         license_key = request.data.get('license_key') or request.POST.get('license_key')
         account = request.data.get('account_id') or request.POST.get('account_id')
 
         if not license_key:
-            return Response({'valid': 'License key is required.'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'valid': LICENSE_KEY_REQUIRED[0]}, status=LICENSE_KEY_REQUIRED[1])
+
+        license = license_cache.get(license_key)
+        message, code = check_license(license, account)
+        record_validation(request, license_key, account, 'ea-validate', code)
+        data = {'valid': message}
+
+        lease_requested = request.data.get('lease') or request.POST.get('lease')
+        if code == status.HTTP_200_OK and str(lease_requested).lower() in ('1', 'true', 'yes'):
+            lease = issue_lease(license, account)
+            data['lease'], data['lease_expires_at'] = lease if lease else (None, None)
+
+        return Response(data, status=code)
+
+
+@method_decorator(use_replicas, name='dispatch')
+@method_decorator(csrf_exempt, name='dispatch')
+class BatchEAValidate(APIView):
+    """
+    Validate many ``(license_key, account_id)`` pairs in one request.
+
+    Accepts ``{"licenses": [{"license_key": ..., "account_id": ...}, ...]}``
+    (or the bare list) and answers each item with the same message and status
+    code ``EAValidate`` would return for it.
+    """
+    throttle_classes = [ValidationRateThrottle]
+
+
+    def post(self, request):
+        items = request.data.get('licenses') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of licenses.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = settings.EA_BATCH_MAX_ITEMS
+        if len(items) > max_items:
+            return Response(
+                {'detail': f'At most {max_items} licenses can be validated per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        pairs = []
+        for item in items:
+            if not isinstance(item, dict):
+                return Response({'detail': 'Each license must be an object.'}, status=status.HTTP_400_BAD_REQUEST)
+            pairs.append((item.get('license_key'), item.get('account_id')))
+
+        licenses = license_cache.get_many(
+            [license_key for license_key, _ in pairs if isinstance(license_key, str)],
+            chunk_size=settings.EA_BATCH_CHUNK_SIZE
+        )
+
+        # Every seat in the batch is looked up with one query.
+        seated = seated_pairs(
+            (license_key, account) for license_key, account in pairs
+            if isinstance(license_key, str) and license_key in licenses and licenses[license_key].seat_limited
+        )
+
+        results = []
+        for license_key, account in pairs:
+            if not license_key:
+                message, code = LICENSE_KEY_REQUIRED
+            elif not isinstance(license_key, str):
+                message, code = LICENSE_KEY_NOT_STRING
+            else:
+                message, code = check_license(
+                    licenses.get(license_key), account, seat_check=lambda key, account_id: (key, account_id) in seated,
+                )
+                record_validation(request, license_key, account, 'ea-validate-batch', code)
+            results.append({
+                'license_key': license_key,
+                'account_id': account,
+                'valid': message,
+                'status': code,
+            })
+
+        return Response({'count': len(results), 'results': results}, status=status.HTTP_200_OK)
+
+
+class BulkLicenseView(APIView):
+    """
+    Create, revoke, activate, extend or reassign many licenses in one transaction.
+
+    Accepts ``{"operations": [...]}`` (or the bare list); see
+    ``bot_license.bulk`` for the operation format. Every operation gets its own
+    result, and invalid ones do not stop the rest.
+    """
+
+    def post(self, request):
+        items = request.data.get('operations') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of operations.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_items = settings.LICENSE_BULK_MAX_OPERATIONS
+        if len(items) > max_items:
+            return Response(
+                {'detail': f'At most {max_items} operations can be run per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        results = run_operations(items)
+        failed = sum(1 for result in results if result['status'] >= 400)
+        return Response({
+            'count': len(results),
+            'succeeded': len(results) - failed,
+            'failed': failed,
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+class LicenseImportView(APIView):
+    """
+    Upload a CSV of licenses (multipart field ``file``) to import in the background.
 
+    Responds 202 with the job; poll ``licenses/imports/<id>/`` for progress.
+    ``GET`` lists the most recent jobs.
+    """
+
+    def get(self, request):
+        jobs = LicenseImport.objects.defer('source').order_by('-id')[:50]
+        return Response([job_status(job, max_errors=0) for job in jobs], status=status.HTTP_200_OK)
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload the CSV as the "file" field.'}, status=status.HTTP_400_BAD_REQUEST)
+        max_bytes = settings.LICENSE_IMPORT['MAX_BYTES']
+        if upload.size > max_bytes:
+            return Response({'detail': f'File must be at most {max_bytes} bytes.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            job = create_import(upload.read(), upload.name)
+        except InvalidImport as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        if settings.LICENSE_IMPORT['RUN_IN_WEB']:
+            start_import(job)
+        response = Response(job_status(job), status=status.HTTP_202_ACCEPTED)
+        response['Location'] = f'/licenses/imports/{job.pk}/'
+        return response
+
+
+class LicenseImportStatusView(APIView):
+
+    def get(self, request, pk):
         try:
-            license = BotLicense.objects.get(license_key=license_key)
-        except BotLicense.DoesNotExist:
-            return Response({'valid': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
-        
-        if account and license.account_id != account:
-            return Response({'valid': 'Account ID does not match.'}, status=status.HTTP_403_FORBIDDEN)
+            job = LicenseImport.objects.defer('source').get(pk=pk)
+        except LicenseImport.DoesNotExist:
+            return Response({'detail': 'Unknown import.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job_status(job), status=status.HTTP_200_OK)
+
 
-        if license.expired():
-            return Response({'valid': 'License has expired.'}, status=status.HTTP_403_FORBIDDEN)
+def set_license_active(license_key, is_active):
+    """Set ``is_active`` under a row lock; ``False`` if the license does not exist."""
+    with transaction.atomic():
+        license = BotLicense.objects.select_for_update().filter(license_key=license_key).first()
+        if license is None:
+            return False
+        if license.is_active != is_active:
+            lock_license_state(license)
+            license.is_active = is_active
+            # Only this field, so concurrent edits to the others are kept.
+            license.save(update_fields=['is_active'])
+    return True
 
 
-        return Response({'valid': 'License is valid.'}, status=status.HTTP_200_OK)
+def seat_status(license, account, detail, seats_used):
+    return {'detail': detail, 'account_id': account, 'max_seats': license.max_seats, 'seats_used': seats_used}
+
 
 @method_decorator(csrf_exempt, name='dispatch')
 class ActivateLicense(APIView):
-     
-     def post(self, request):
-         license_key = request.data.get('license_key')
+    """
+    Re-enable a license or, with ``account_id`` on a seat-limited license, seat that account.
 
-         try:
-             license = BotLicense.objects.get(license_key=license_key)
-         except BotLicense.DoesNotExist:
-             return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
+    Seats are claimed atomically (see ``bot_license.seats``); a license whose
+    seats all belong to live EAs answers 409.
+    """
 
-         if not license.is_active:
-             license.is_active = True
-             license.save()
+    def post(self, request):
+        license_key = request.data.get('license_key')
+        account = request.data.get('account_id')
+
+        license = BotLicense.objects.filter(license_key=license_key).only(
+            'pk', 'is_active', 'max_seats', 'seats_used',
+        ).first()
+        if license is None:
+            return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
+
+        if account and license.seat_limited:
+            if not license.is_active:
+                return Response({'detail': 'License is not active.'}, status=status.HTTP_403_FORBIDDEN)
+            try:
+                _, seats_used = activate_seat(license, account)
+            except BotLicense.DoesNotExist:
+                return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
+            except SeatError as exc:
+                return Response(
+                    seat_status(license, account, str(exc), license.seats_used), status=status.HTTP_409_CONFLICT,
+                )
+            return Response(
+                seat_status(license, account, 'License has been activated.', seats_used), status=status.HTTP_200_OK,
+            )
+
+        if not set_license_active(license_key, True):
+            return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'detail': 'License has been activated.'}, status=status.HTTP_200_OK)
 
-         return Response({'detail': 'License has been activated.'}, status=status.HTTP_200_OK)
 
 @method_decorator(csrf_exempt, name='dispatch')
 class DeactivateLicense(APIView):
-     
-     def post(self, request):
-         license_key = request.data.get('license_key')
+    """Disable a license or, with ``account_id`` on a seat-limited license, free that account's seat."""
 
-         try:
-             license = BotLicense.objects.get(license_key=license_key)
-         except BotLicense.DoesNotExist:
-             return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
+    def post(self, request):
+        license_key = request.data.get('license_key')
+        account = request.data.get('account_id')
 
-         if license.is_active:
-             license.is_active = False
-             license.save()
+        license = BotLicense.objects.filter(license_key=license_key).only('pk', 'max_seats').first()
+        if license is None:
+            return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
 
-         return Response({'detail': 'License has been deactivated.'}, status=status.HTTP_200_OK)
\ No newline at end of file
+        if account and license.seat_limited:
+            seats_used = release_seat(license, account)
+            if seats_used is None:
+                return Response({'detail': 'Account holds no seat of this license.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(
+                seat_status(license, account, 'License has been deactivated.', seats_used), status=status.HTTP_200_OK,
+            )
+
+        if not set_license_active(license_key, False):
+            return Response({'detail': 'Invalid license key.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'detail': 'License has been deactivated.'}, status=status.HTTP_200_OK)
@@ -0,0 +1,108 @@
+"""
+Boot-time warmup, so a new worker does not pay its setup cost on user requests.
+
+``warm_up_process`` builds what every request needs without touching the
+database: the URL resolver and its compiled patterns, the views behind the
+hot routes, and DRF's renderers and parsers. It runs when
+``licenser.wsgi``/``licenser.asgi`` is imported. With gunicorn's
+``preload_app`` that happens once in the master, and the workers inherit the
+result when they fork.
+
+``warm_up_worker`` runs in each worker after it has loaded the application
+and before it accepts connections (gunicorn's ``post_worker_init`` hook in
+``gunicorn.conf.py``). Connections must not be shared across ``fork``, so
+this is where the database is first touched. It connects every alias, or
+opens its pool, then loads the issued-key filter, maps the license table and
+primes ``license_cache`` with the most recently validated licenses.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, get_resolver
+
+from .cache import license_cache
+from .keyfilter import key_filter
+from .licensetable import license_table
+from .metrics import check_database
+from .models import ValidationEvent
+from .utils import KEY_PREFIX
+
+
+logger = logging.getLogger(__name__)
+
+WARM_PATHS = (
+    '/ea/validate/', '/ea/validate/batch/', '/license/verify/', f'/license/{KEY_PREFIX}AAAA/',
+    '/licenses/', '/products/', '/dashboard/', '/health/',
+)
+
+
+def _timed(timings, name, step, *args):
+    started = time.perf_counter()
+    result = step(*args)
+    timings[name] = round((time.perf_counter() - started) * 1000, 3)
+    return result
+
+
+def _resolve_routes():
+    resolver = get_resolver()
+    for path in WARM_PATHS:
+        try:
+            resolver.resolve(path)
+        except Resolver404:
+            pass
+
+
+def _load_drf():
+    from rest_framework.settings import api_settings
+
+    for classes in (api_settings.DEFAULT_RENDERER_CLASSES, api_settings.DEFAULT_PARSER_CLASSES,
+                    api_settings.DEFAULT_AUTHENTICATION_CLASSES, api_settings.DEFAULT_PERMISSION_CLASSES):
+        for cls in classes:
+            cls()
+
+
+def warm_up_process():
+    """Build routes and framework state; never touches the database. Returns step timings in ms."""
+    timings = {}
+    _timed(timings, 'routes', _resolve_routes)
+    _timed(timings, 'drf', _load_drf)
+    logger.info('Process warmup: %s', timings)
+    return timings
+
+
+def _connect_databases():
+    return {alias: check_database(alias)['status'] for alias in connections}
+
+
+def _prime_license_cache(count):
+    keys = list(
+        ValidationEvent.objects.order_by('-id').values_list('license_key', flat=True)[:count * 4]
+    )
+    primed = len(license_cache.get_many(list(dict.fromkeys(keys))[:count]))
+    license_cache.reset_stats()
+    return primed
+
+
+def warm_up_worker():
+    """Connect to the databases and load the shared lookups. Returns step timings in ms."""
+    config = getattr(settings, 'WARMUP', {})
+    timings = {}
+    statuses = _timed(timings, 'databases', _connect_databases)
+    try:
+        if key_filter.enabled:
+            _timed(timings, 'key_filter', key_filter.refresh)
+        if license_table.enabled:
+            _timed(timings, 'license_table', license_table.lookup, f'{KEY_PREFIX}AAAA')
+        if config.get('PRIME_LICENSES'):
+            timings['licenses_primed'] = _timed(
+                timings, 'license_cache', _prime_license_cache, config['PRIME_LICENSES']
+            )
+    except Exception:
+        # Everything warmed here is also loaded lazily, so a worker that cannot
+        # warm up (e.g. the database is still starting) serves requests cold.
+        logger.exception('Worker warmup failed after %s; continuing cold.', timings)
+        return timings
+    logger.info('Worker warmup: %s (databases: %s)', timings, statuses)
+    return timings
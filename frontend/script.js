@@ -12,13 +12,15 @@ let stats = {
 };
 
 // Initialize
-document.addEventListener('DOMContentLoaded', () => {
+document.addEventListener('DOMContentLoaded', async () => {
     setupNavigation();
     setupForms();
-    loadDashboardStats();
-    loadProducts();
-    loadLicenses();
+    // Take the change feed position before loading, so nothing written while
+    // the lists load is missed once the feed is subscribed.
+    const lastSeq = await fetchChangePosition();
+    await Promise.all([loadDashboardStats(), loadProducts(), loadLicenses()]);
     updateDashboard();
+    subscribeToChanges(lastSeq);
 });
 
 // Navigation
@@ -114,9 +116,19 @@ async function loadProducts() {
 // Load Licenses
 async function loadLicenses() {
     try {
-        const response = await fetch(`${API_BASE_URL}/licenses/`);
+        // The listing is cursor-paginated; follow `next` until the last page.
+        const loaded = [];
+        let url = `${API_BASE_URL}/licenses/?page_size=1000`;
+        let response;
+        while (url) {
+            response = await fetch(url);
+            if (!response.ok) break;
+            const page = await response.json();
+            loaded.push(...page.results);
+            url = page.next;
+        }
         if (response.ok) {
-            licensesList = await response.json();
+            licensesList = loaded;
             renderLicenses(licensesList);
             stats.activeLicenses = licensesList.filter(l => l.is_active).length;
             stats.expiredLicenses = licensesList.filter(l => {
@@ -132,6 +144,92 @@ async function loadLicenses() {
     }
 }
 
+// Change feed: apply license/product deltas instead of refetching the lists
+const CHANGE_POLL_INTERVAL = 5000;
+let changeFeed = null;
+let dashboardRefresh = null;
+
+async function fetchChangePosition() {
+    try {
+        const response = await fetch(`${API_BASE_URL}/changes/`);
+        if (response.ok) return (await response.json()).last_seq;
+    } catch (error) {
+        console.error('Error reading change feed position:', error);
+    }
+    return null;
+}
+
+// Poll on a timer rather than holding a connection open, so the dashboard
+// never pins a server worker; each poll returns straight away.
+function subscribeToChanges(lastSeq) {
+    if (lastSeq === null) return;
+    clearTimeout(changeFeed);
+    changeFeed = setTimeout(() => pollChanges(lastSeq), CHANGE_POLL_INTERVAL);
+}
+
+async function pollChanges(lastSeq) {
+    let nextSeq = lastSeq;
+    try {
+        // Skip polls while the tab is hidden; the next visible poll catches up.
+        if (!document.hidden) {
+            const response = await fetch(`${API_BASE_URL}/changes/?after=${lastSeq}`);
+            const data = await response.json();
+            if (response.status === 410) {
+                // Our position was compacted away: reload everything once.
+                await Promise.all([loadDashboardStats(), loadProducts(), loadLicenses()]);
+                nextSeq = data.last_seq;
+            } else if (response.ok) {
+                data.events.forEach(change => {
+                    if (change.kind === 'license') applyLicenseChange(change);
+                    else if (change.kind === 'product') applyProductChange(change);
+                });
+                nextSeq = data.last_seq;
+            }
+        }
+    } catch (error) {
+        console.error('Error polling change feed:', error);
+    }
+    subscribeToChanges(nextSeq);
+}
+
+function applyLicenseChange(change) {
+    const index = licensesList.findIndex(l => l.id === change.id);
+    if (change.action === 'deleted') {
+        if (index !== -1) licensesList.splice(index, 1);
+    } else {
+        const { product_id, ...fields } = change.data;
+        const license = { ...fields, product: products.find(p => p.id === product_id) || null };
+        if (index === -1) licensesList.unshift(license);
+        else licensesList[index] = license;
+    }
+    renderLicenses(licensesList);
+    scheduleDashboardRefresh();
+}
+
+function applyProductChange(change) {
+    const index = products.findIndex(p => p.id === change.id);
+    if (change.action === 'deleted') {
+        if (index !== -1) products.splice(index, 1);
+    } else if (index === -1) {
+        products.push(change.data);
+    } else {
+        products[index] = change.data;
+    }
+    updateProductDropdown();
+    stats.totalProducts = products.length;
+    scheduleDashboardRefresh();
+}
+
+// Coalesce a burst of changes into one dashboard request; the ETag keeps it
+// cheap when nothing the counters depend on changed.
+function scheduleDashboardRefresh() {
+    if (dashboardRefresh) return;
+    dashboardRefresh = setTimeout(() => {
+        dashboardRefresh = null;
+        loadDashboardStats();
+    }, 1000);
+}
+
 // Render Licenses into a table
 function renderLicenses(licenses) {
     const container = document.getElementById('licenses-list');
@@ -206,7 +304,7 @@ async function revokeLicense(license_key) {
         const data = await response.json();
         if (response.ok) {
             showToast('License revoked', 'success');
-            loadLicenses();
+            if (!changeFeed) loadLicenses();
         } else {
             showResponse('licenses-response', 'error', 'Error Revoking License', data);
             showToast(data.detail || 'Failed to revoke license', 'error');
@@ -276,8 +374,10 @@ async function handleCreateProduct(e) {
         if (response.ok) {
             showResponse('product-response', 'success', 'Product Created Successfully!', data);
             document.getElementById('create-product-form').reset();
-            loadProducts();
-            loadDashboardStats(); 
+            if (!changeFeed) {
+                loadProducts();
+                loadDashboardStats();
+            }
             showToast('Product created successfully!', 'success');
         } else {
             showResponse('product-response', 'error', 'Error Creating Product', data);
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for the ``web`` and ``asgi`` processes in the Procfile.
+
+With ``preload_app`` (GUNICORN_PRELOAD, on by default) the master imports
+Django, the URLconf and DRF once, and workers fork with all of it already
+loaded. ``post_worker_init`` then connects each worker to the database and
+loads the license lookups before it accepts its first request; see
+``bot_license.warmup``. Preloading means a deploy needs a full restart, not a
+HUP, to pick up new code.
+"""
+import os
+
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+
+def post_worker_init(worker):
+    from django.conf import settings
+
+    if settings.WARMUP['ENABLED']:
+        from bot_license.warmup import warm_up_worker
+
+        warm_up_worker()
@@ -3,6 +3,10 @@ ASGI config for licenser project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Run it with uvicorn workers under gunicorn (see the ``asgi`` process in the
+Procfile). Unless ASYNC_VIEWS is set explicitly, the hot read endpoints are
+served by the async views in ``bot_license.async_views``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -12,5 +16,13 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'licenser.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.WARMUP['ENABLED']:
+    from bot_license.warmup import warm_up_process
+
+    warm_up_process()
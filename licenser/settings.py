@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import copy
 import os
+import sys
 import dotenv
 
 dotenv.load_dotenv()
@@ -50,6 +52,8 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    'bot_license.metrics.MetricsMiddleware',
+    'bot_license.fastpath.FastPathMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -101,6 +105,234 @@ DATABASES = {
     }
 }
 
+# Connection reuse. With DATABASE_POOL_ENABLED (the default) each worker
+# process keeps a psycopg 3 pool per alias: MIN_SIZE..MAX_SIZE connections,
+# each retired after MAX_LIFETIME seconds or MAX_IDLE idle seconds, checked
+# with a round trip on checkout, and TIMEOUT seconds to wait for a free one.
+# Workers x MAX_SIZE x aliases must fit in the server's max_connections.
+# With pooling off, connections persist for CONN_MAX_AGE seconds instead
+# (keep that at 0 under ASGI, where each request may run on a new thread).
+DATABASE_POOL = {
+    'ENABLED': os.environ.get('DATABASE_POOL_ENABLED', '1') == '1',
+    'MIN_SIZE': int(os.environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+    'MAX_SIZE': int(os.environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+    'MAX_LIFETIME': float(os.environ.get('DATABASE_POOL_MAX_LIFETIME', 1800)),
+    'MAX_IDLE': float(os.environ.get('DATABASE_POOL_MAX_IDLE', 300)),
+    'TIMEOUT': float(os.environ.get('DATABASE_POOL_TIMEOUT', 5)),
+    'CHECK': os.environ.get('DATABASE_POOL_CHECK', '1') == '1',
+}
+
+if DATABASE_POOL['ENABLED']:
+    DATABASES['default']['OPTIONS'] = {'pool': {
+        'min_size': DATABASE_POOL['MIN_SIZE'],
+        'max_size': DATABASE_POOL['MAX_SIZE'],
+        'max_lifetime': DATABASE_POOL['MAX_LIFETIME'],
+        'max_idle': DATABASE_POOL['MAX_IDLE'],
+        'timeout': DATABASE_POOL['TIMEOUT'],
+    }}
+    # Django passes ConnectionPool.check_connection to the pool when health
+    # checks are on; it must not be repeated in the pool options.
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = DATABASE_POOL['CHECK']
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('CONN_MAX_AGE', 60))
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Read replicas: DATABASE_REPLICA_HOSTS is a comma-separated list of hosts
+# mirroring the primary, added as replica1, replica2, ... Validation, listing
+# and dashboard reads go to them (bot_license.routers); everything else, and
+# anything after a write in the same request, uses the primary.
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{_index}'] = {
+        **copy.deepcopy(DATABASES['default']), 'HOST': _host.strip(), 'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_index}')
+
+# The test suite always runs with a replica mirroring the test database, so
+# replica routing, read-your-writes pinning and fallbacks are exercised.
+if sys.argv[1:2] == ['test'] and not DATABASE_REPLICAS:
+    DATABASES['replica1'] = {**copy.deepcopy(DATABASES['default']), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append('replica1')
+
+DATABASE_ROUTERS = ['bot_license.routers.ReplicaRouter']
+
+# Seconds between health checks of each replica; unhealthy replicas are
+# skipped and reads fall back to the primary.
+REPLICA_HEALTH = {
+    'CHECK_INTERVAL': float(os.environ.get('REPLICA_HEALTH_CHECK_INTERVAL', 10)),
+}
+
+
+# License snapshot cache used by the EA validation endpoints.
+# Set LICENSE_CACHE_BACKEND to a CACHES alias to share snapshots between workers.
+# Every INVALIDATION_CHECK_INTERVAL seconds each worker reads the invalidation
+# sequence (from that cache, else the licenses TableVersion) and drops entries
+# other workers invalidated, which bounds how long a revoked key validates.
+
+LICENSE_CACHE = {
+    'MAX_ENTRIES': int(os.environ.get('LICENSE_CACHE_MAX_ENTRIES', 50000)),
+    'TTL': float(os.environ.get('LICENSE_CACHE_TTL', 30)),
+    'DJANGO_CACHE': os.environ.get('LICENSE_CACHE_BACKEND') or None,
+    'INVALIDATION_CHECK_INTERVAL': float(os.environ.get('LICENSE_CACHE_INVALIDATION_CHECK_INTERVAL', 1)),
+}
+
+# Memory-mapped license table shared by the workers on a host
+# (bot_license.licensetable). Set LICENSE_TABLE_PATH and run
+# `manage.py export_license_table --loop` next to the web workers to enable it.
+LICENSE_TABLE = {
+    'PATH': os.environ.get('LICENSE_TABLE_PATH') or None,
+    'CHECK_INTERVAL': float(os.environ.get('LICENSE_TABLE_CHECK_INTERVAL', 2)),
+    'EXPORT_INTERVAL': float(os.environ.get('LICENSE_TABLE_EXPORT_INTERVAL', 5)),
+    'MAX_DIRTY': int(os.environ.get('LICENSE_TABLE_MAX_DIRTY', 10000)),
+}
+
+# Upper bound on items per /ea/validate/batch/ call, and keys per lookup query.
+EA_BATCH_MAX_ITEMS = int(os.environ.get('EA_BATCH_MAX_ITEMS', 5000))
+EA_BATCH_CHUNK_SIZE = int(os.environ.get('EA_BATCH_CHUNK_SIZE', 900))
+
+# Upper bound on operations per /licenses/bulk/ call.
+LICENSE_BULK_MAX_OPERATIONS = int(os.environ.get('LICENSE_BULK_MAX_OPERATIONS', 5000))
+
+
+# Background CSV imports (bot_license.imports): rows per transaction, upload
+# size cap, error rows kept per job, and seconds without a heartbeat before a
+# running job is considered abandoned and resumed by another runner. The
+# `imports` process (`manage.py process_imports --loop`) runs pending jobs and
+# resumes abandoned ones. RUN_IN_WEB also starts uploads on a thread in the
+# web worker, which a worker restart interrupts; leave it off unless the
+# imports process is running too.
+LICENSE_IMPORT = {
+    'CHUNK_SIZE': int(os.environ.get('LICENSE_IMPORT_CHUNK_SIZE', 1000)),
+    'MAX_BYTES': int(os.environ.get('LICENSE_IMPORT_MAX_BYTES', 20 * 1024 * 1024)),
+    'MAX_ERRORS': int(os.environ.get('LICENSE_IMPORT_MAX_ERRORS', 1000)),
+    'STALE_AFTER': float(os.environ.get('LICENSE_IMPORT_STALE_AFTER', 60)),
+    'RUN_IN_WEB': os.environ.get('LICENSE_IMPORT_RUN_IN_WEB', '0') == '1',
+    'INTERVAL': float(os.environ.get('LICENSE_IMPORT_INTERVAL', 5)),
+}
+
+
+# Seat-limited licenses (bot_license.seats): validations refresh a seat's
+# heartbeat at most every HEARTBEAT_INTERVAL seconds, and a seat silent for
+# STALE_AFTER seconds can be taken by another account or released by
+# `manage.py reclaim_seats --loop`, which runs every INTERVAL seconds.
+LICENSE_SEATS = {
+    'HEARTBEAT_INTERVAL': float(os.environ.get('LICENSE_SEAT_HEARTBEAT_INTERVAL', 60)),
+    'STALE_AFTER': float(os.environ.get('LICENSE_SEAT_STALE_AFTER', 900)),
+    'INTERVAL': float(os.environ.get('LICENSE_SEAT_RECLAIM_INTERVAL', 300)),
+}
+
+
+# Expiry sweeper (manage.py sweep_expired): licenses deactivated per
+# transaction, seconds between runs with --loop, and the renewal reminder
+# window used by /licenses/expiring/ and the "expiring" export.
+EXPIRY_SWEEP = {
+    'CHUNK_SIZE': int(os.environ.get('EXPIRY_SWEEP_CHUNK_SIZE', 1000)),
+    'INTERVAL': float(os.environ.get('EXPIRY_SWEEP_INTERVAL', 60)),
+    'REMIND_WITHIN_DAYS': int(os.environ.get('EXPIRY_REMIND_WITHIN_DAYS', 7)),
+}
+
+
+# Change feed served at /changes/ (bot_license.changes). Events are kept for
+# RETENTION_DAYS and at most MAX_EVENTS; `manage.py compact_change_log --loop`
+# trims the rest. Only events older than SETTLE_SECONDS are served, so
+# concurrent commits cannot appear out of sequence order. Under WSGI the feed
+# is a short poll; the server-sent event stream (POLL_INTERVAL,
+# HEARTBEAT_INTERVAL, STREAM_DURATION) is only served by the ASGI process.
+CHANGE_LOG = {
+    'RETENTION_DAYS': int(os.environ.get('CHANGE_LOG_RETENTION_DAYS', 7)),
+    'MAX_EVENTS': int(os.environ.get('CHANGE_LOG_MAX_EVENTS', 100000)),
+    'SETTLE_SECONDS': float(os.environ.get('CHANGE_LOG_SETTLE_SECONDS', 1)),
+    'POLL_INTERVAL': float(os.environ.get('CHANGE_LOG_POLL_INTERVAL', 1)),
+    'HEARTBEAT_INTERVAL': float(os.environ.get('CHANGE_LOG_HEARTBEAT_INTERVAL', 15)),
+    'STREAM_DURATION': float(os.environ.get('CHANGE_LOG_STREAM_DURATION', 300)),
+    'COMPACT_INTERVAL': float(os.environ.get('CHANGE_LOG_COMPACT_INTERVAL', 3600)),
+}
+
+
+# Signed offline leases returned by /ea/validate/ when the EA sends lease=1.
+# TTL bounds how long a revoked license can keep running offline. PRIVATE_KEY
+# is a base64url Ed25519 seed (`manage.py lease_keys --generate`) that never
+# leaves the server; EA builds embed the public key from `manage.py
+# lease_keys`. Unset, the key is derived from SECRET_KEY.
+LICENSE_LEASE = {
+    'PRIVATE_KEY': os.environ.get('LICENSE_LEASE_PRIVATE_KEY'),
+    'TTL': int(os.environ.get('LICENSE_LEASE_TTL', 300)),
+}
+
+
+# Key for the permutation that license keys are drawn from. Changing it only
+# reorders future keys; already issued keys are skipped when minting.
+LICENSE_KEY_PERMUTATION_SECRET = os.environ.get('LICENSE_KEY_PERMUTATION_SECRET')
+
+
+# Boot-time warmup (bot_license.warmup): licenser.wsgi/asgi build routes and
+# framework state on import, and gunicorn.conf.py connects the databases and
+# loads the lookups in each worker before it accepts traffic, priming the
+# license cache with the PRIME_LICENSES most recently validated licenses.
+WARMUP = {
+    'ENABLED': os.environ.get('WARMUP_ENABLED', '1') == '1',
+    'PRIME_LICENSES': int(os.environ.get('WARMUP_PRIME_LICENSES', 1000)),
+}
+
+
+# Serve the hot read endpoints with async views. licenser/asgi.py turns this
+# on by default; under WSGI the DRF views are used.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '0') == '1'
+
+# Answer POST /ea/validate/ from bot_license.fastpath without the rest of the
+# middleware stack and DRF. Lease requests always take the DRF view.
+EA_FAST_PATH = os.environ.get('EA_FAST_PATH', '1') == '1'
+
+
+# Write-behind log of validations (bot_license.events). Events are kept for
+# RETENTION_DAYS; `manage.py prune_validation_events --loop` deletes older
+# ones every PRUNE_INTERVAL seconds. Attempts with unknown keys are only
+# counted, except every UNKNOWN_SAMPLE_EVERY-th one (0 stores none).
+VALIDATION_EVENTS = {
+    'ENABLED': os.environ.get('VALIDATION_EVENTS_ENABLED', '1') == '1',
+    'MAX_BUFFERED': int(os.environ.get('VALIDATION_EVENTS_MAX_BUFFERED', 10000)),
+    'BATCH_SIZE': int(os.environ.get('VALIDATION_EVENTS_BATCH_SIZE', 500)),
+    'FLUSH_INTERVAL': float(os.environ.get('VALIDATION_EVENTS_FLUSH_INTERVAL', 2)),
+    'RETENTION_DAYS': int(os.environ.get('VALIDATION_EVENTS_RETENTION_DAYS', 30)),
+    'PRUNE_INTERVAL': float(os.environ.get('VALIDATION_EVENTS_PRUNE_INTERVAL', 3600)),
+    'UNKNOWN_SAMPLE_EVERY': int(os.environ.get('VALIDATION_EVENTS_UNKNOWN_SAMPLE_EVERY', 0)),
+}
+
+
+# Negative-lookup filter for never-issued license keys (bot_license.keyfilter).
+LICENSE_KEY_FILTER = {
+    'ENABLED': os.environ.get('LICENSE_KEY_FILTER_ENABLED', '1') == '1',
+    'REFRESH_INTERVAL': float(os.environ.get('LICENSE_KEY_FILTER_REFRESH_INTERVAL', 5)),
+}
+
+# Proxies in front of the app that append to X-Forwarded-For; Heroku's router
+# is one. Client IPs for throttling and the validation log are read that many
+# entries from the right; 0 uses REMOTE_ADDR and ignores the header.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 1))
+
+REST_FRAMEWORK = {
+    'NUM_PROXIES': TRUSTED_PROXY_HOPS,
+}
+
+# Token buckets for the validation endpoints: sustained requests per second
+# and burst size, per client IP and per license key.
+VALIDATION_THROTTLE = {
+    'ENABLED': os.environ.get('VALIDATION_THROTTLE_ENABLED', '1') == '1',
+    'IP_RATE': float(os.environ.get('VALIDATION_THROTTLE_IP_RATE', 50)),
+    'IP_BURST': int(os.environ.get('VALIDATION_THROTTLE_IP_BURST', 200)),
+    'KEY_RATE': float(os.environ.get('VALIDATION_THROTTLE_KEY_RATE', 10)),
+    'KEY_BURST': int(os.environ.get('VALIDATION_THROTTLE_KEY_BURST', 50)),
+    'MAX_TRACKED': int(os.environ.get('VALIDATION_THROTTLE_MAX_TRACKED', 100000)),
+}
+
+# /metrics/ (bot_license.metrics). With TOKEN set, scrapers send
+# `Authorization: Bearer <token>`; without it only private and loopback client
+# addresses are answered. Counters are per worker process, so scrape each
+# worker and sum across the `pid` label.
+METRICS = {
+    'TOKEN': os.environ.get('METRICS_TOKEN') or None,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators